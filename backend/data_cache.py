@@ -0,0 +1,219 @@
+"""
+Bounded, memory-accounted cache for loaded artifacts.
+
+Entries are tied to the files they were loaded from and revalidated on
+every lookup by (mtime, size) stamp, with a content hash for small files
+so a touched-but-identical file does not force a reload. Least recently
+used entries are evicted once the byte budget is exceeded.
+"""
+import hashlib
+import mmap
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+HASH_MAX_BYTES = 8 * 1024 * 1024        # hash files up to this size on change
+_SAMPLE = 64                            # elements sampled from long containers
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+    except FileNotFoundError:
+        return None
+    return h.hexdigest()
+
+
+def _is_mapped(arr: np.ndarray) -> bool:
+    base = arr
+    while isinstance(base, np.ndarray):
+        if isinstance(base, np.memmap):
+            return True
+        base = base.base
+    return isinstance(base, mmap.mmap)
+
+
+def estimate_bytes(obj, _depth: int = 0) -> int:
+    """
+    Approximate resident size of a cached value. Memory-mapped arrays count
+    as free (the OS can drop their pages); long containers are sampled.
+    """
+    if isinstance(obj, np.ndarray):
+        if _is_mapped(obj):
+            return 0
+        if obj.dtype == object:
+            return obj.nbytes + sum(estimate_bytes(v, _depth + 1) for v in obj[:_SAMPLE]) \
+                * max(len(obj), 1) // max(min(len(obj), _SAMPLE), 1)
+        return obj.nbytes
+    if isinstance(obj, pd.DataFrame):
+        total = sys.getsizeof(obj.index) if not isinstance(obj.index, pd.RangeIndex) else 0
+        for _, col in obj.items():
+            total += estimate_bytes(col, _depth + 1)
+        return total
+    if isinstance(obj, pd.Series):
+        values = obj.array
+        if isinstance(values, pd.Categorical):
+            return estimate_bytes(values.codes, _depth + 1) + int(values.categories.memory_usage(deep=True))
+        arr = obj.to_numpy() if obj.dtype != object else obj.to_numpy(dtype=object)
+        return estimate_bytes(arr, _depth + 1)
+    if isinstance(obj, (bytes, bytearray, str)):
+        return sys.getsizeof(obj)
+    if _depth > 8:
+        return sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        items = list(obj.items())
+        sample = items[:_SAMPLE]
+        per = sum(estimate_bytes(k, _depth + 1) + estimate_bytes(v, _depth + 1) for k, v in sample)
+        return sys.getsizeof(obj) + per * len(items) // max(len(sample), 1)
+    if isinstance(obj, (list, tuple)):
+        step = max(len(obj) // _SAMPLE, 1)
+        sample = obj[::step][:_SAMPLE]
+        per = sum(estimate_bytes(v, _depth + 1) for v in sample)
+        return sys.getsizeof(obj) + per * len(obj) // max(len(sample), 1)
+    if hasattr(obj, "__dict__"):
+        return sys.getsizeof(obj) + estimate_bytes(vars(obj), _depth + 1)
+    return sys.getsizeof(obj)
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "sources", "stamps", "hashes")
+
+    def __init__(self, value, nbytes, sources, stamps, hashes):
+        self.value = value
+        self.nbytes = nbytes
+        self.sources = sources
+        self.stamps = stamps
+        self.hashes = hashes
+
+
+class DataCache:
+    """LRU cache with a byte budget and file-change invalidation."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _still_valid(self, entry: _Entry) -> bool:
+        for i, path in enumerate(entry.sources):
+            stamp = _file_stamp(path)
+            if stamp == entry.stamps[i]:
+                continue
+            # touched but maybe unchanged: small files are compared by content
+            if (stamp is None or entry.hashes[i] is None or stamp[1] > HASH_MAX_BYTES
+                    or _file_hash(path) != entry.hashes[i]):
+                return False
+            entry.stamps[i] = stamp
+        return True
+
+    def _drop(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry.nbytes
+
+    def get(self, key, default=None):
+        """Cached value if present and its source files are unchanged."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            if not self._still_valid(entry):
+                self._drop(key)
+                self.invalidations += 1
+                return default
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def put(self, key, value, sources=(), nbytes: int = None, stamps=None) -> None:
+        """
+        Cache a value loaded from `sources`. Pass the stamps taken before
+        loading: if a file has changed since (mid-load, or while it is
+        hashed here), the value is not cached, so it cannot be pinned as
+        fresh by a hash of newer content.
+        """
+        sources = [str(p) for p in sources]
+        if stamps is None:
+            stamps = [_file_stamp(p) for p in sources]
+        hashes = [_file_hash(p) if s is not None and s[1] <= HASH_MAX_BYTES else None
+                  for p, s in zip(sources, stamps)]
+        if [_file_stamp(p) for p in sources] != list(stamps):
+            return
+        if nbytes is None:
+            nbytes = estimate_bytes(value)
+        if nbytes > self.max_bytes:
+            return                                  # would evict everything else
+
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = _Entry(value, nbytes, sources, list(stamps), hashes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes and len(self._entries) > 1:
+                old_key, _ = next(iter(self._entries.items()))
+                self._drop(old_key)
+                self.evictions += 1
+
+    def get_or_load(self, key, sources, loader, nbytes: int = None):
+        """Return the cached value for key, (re)loading it when missing or stale."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is not sentinel:
+            with self._lock:
+                self.hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        stamps = [_file_stamp(p) for p in sources]
+        value = loader()
+        self.put(key, value, sources, nbytes=nbytes, stamps=stamps)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            self._drop(key)
+            return default if entry is None else entry.value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,102 @@
+"""
+Minimal stand-in for the Ollama HTTP API, for tests and offline demos.
+
+POST /api/chat answers with a canned reply, as NDJSON chunks over chunked
+transfer encoding when "stream" is true; GET /api/tags lists one model.
+Each request is recorded with the client's port, so tests can tell
+whether connections were reused.
+
+Run: python backend/fake_ollama.py [port]   (then OLLAMA_URL=http://localhost:<port>)
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"           # keep-alive, like the real server
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "llama3"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        fake = self.server.fake
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        fake.requests.append({"port": self.client_address[1], "body": request})
+        if self.path != "/api/chat":
+            return self._send_json(404, {"error": "not found"})
+        if request.get("model") not in fake.models:
+            return self._send_json(404, {"error": f"model '{request.get('model')}' not found"})
+
+        if not request.get("stream", True):
+            return self._send_json(200, {"message": {"role": "assistant", "content": "".join(fake.tokens)},
+                                         "done": True})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        chunks = [{"message": {"role": "assistant", "content": t}, "done": False} for t in fake.tokens]
+        chunks.append({"message": {"role": "assistant", "content": ""}, "done": True})
+        for chunk in chunks:
+            data = json.dumps(chunk).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+            time.sleep(fake.delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class FakeOllama:
+    """Threaded fake server; use as a context manager or start()/stop()."""
+
+    def __init__(self, tokens=("Add ", "a ", "buffer."), delay: float = 0.0, port: int = 0,
+                 models=("llama3",)):
+        self.tokens = list(tokens)
+        self.delay = delay
+        self.models = set(models)
+        self.requests = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    fake = FakeOllama(delay=0.05, port=int(sys.argv[1]) if len(sys.argv) > 1 else 11434)
+    print(f"Fake Ollama listening on {fake.url}")
+    fake._server.serve_forever()
@@ -0,0 +1,126 @@
+"""
+Resized and re-encoded variants of the result plots, cached on disk.
+
+A variant is named after its source's identity (size, mtime, inode), the
+width and the format. The name changes whenever the source file is replaced,
+so a variant is rendered once per version of its source. Variants of
+older versions are deleted when the new one is written. Widths are
+rounded up to WIDTH_STEP, so arbitrary widths cannot flood the cache.
+
+Pillow is optional and imported on first use. Without it, every request
+gets the original PNG.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp", "png": "image/png"}
+QUALITY = {"avif": 60, "webp": 80}
+WIDTH_STEP = 64
+MAX_WIDTH = 4096
+_pil = None
+
+
+def pillow():
+    """(Image, features) from Pillow, or None if it is not installed."""
+    global _pil
+    if _pil is None:
+        try:
+            from PIL import Image, features
+            _pil = (Image, features)
+        except ImportError:         # originals only
+            _pil = False
+    return _pil or None
+
+
+def available_formats() -> list:
+    """Formats variants can be encoded in, best compression first."""
+    pil = pillow()
+    if pil is None:
+        return ["png"]
+    return [f for f in ("avif", "webp") if pil[1].check(f)] + ["png"]
+
+
+def negotiate(accept: Optional[str], requested: str = "auto") -> str:
+    """
+    Output format: the requested one if it can be encoded, else (for
+    "auto") the best one the Accept header lists, else PNG.
+    """
+    formats = available_formats()
+    if requested != "auto":
+        return requested if requested in formats else "png"
+    accept = (accept or "").lower()
+    for fmt in formats[:-1]:
+        if MEDIA_TYPES[fmt] in accept:
+            return fmt
+    return "png"
+
+
+def source_tag(path: Path) -> str:
+    """Changes whenever the file is rewritten or replaced."""
+    st = os.stat(path)
+    key = f"{st.st_size}:{st.st_mtime_ns}:{st.st_ino}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+
+class ImageVariants:
+    """Variant files of source images, kept in `directory`."""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def get(self, source: Path, width: Optional[int], fmt: str):
+        """
+        (file, tag) of `source` at `width` (None: as is) in `fmt`,
+        rendering it on first use. The tag identifies the content.
+        """
+        tag = source_tag(source)
+        if pillow() is None:
+            width, fmt = None, "png"
+        if width is not None:
+            width = min(-(-width // WIDTH_STEP) * WIDTH_STEP, MAX_WIDTH)
+        if width is None and fmt == "png":
+            return source, tag
+
+        name = f"{source.stem}.{tag}.{width or 0}.{fmt}"
+        path = self.directory / name
+        if path.exists():
+            return path, name
+        with self._lock(name):
+            if not path.exists():
+                self._render(source, path, width, fmt)
+                self._drop_stale(source.stem, tag)
+        return path, name
+
+    def _render(self, source: Path, path: Path, width: Optional[int], fmt: str) -> None:
+        Image = pillow()[0]
+        with Image.open(source) as im:
+            im.load()
+            if width is not None and width < im.width:
+                im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+            tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            if fmt == "png":
+                im.save(tmp, format="PNG", optimize=True)
+            else:
+                im.save(tmp, format=fmt.upper(), quality=QUALITY[fmt])
+        os.replace(tmp, path)
+
+    def _drop_stale(self, stem: str, tag: str) -> None:
+        for old in self.directory.glob(f"{stem}.*"):
+            parts = old.name[len(stem) + 1:].split(".")
+            if len(parts) == 3 and parts[0] != tag:
+                old.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        for path in self.directory.iterdir():
+            path.unlink(missing_ok=True)
@@ -0,0 +1,169 @@
+"""
+Background jobs for long-running work (upload processing).
+
+Work runs on a small thread pool so the event loop keeps serving requests;
+each job records its stages with progress and timings for polling. An
+optional publish step runs back on the event loop, one job at a time per
+worker slot; a coroutine publish step can await blocking work (e.g. on
+the threadpool) and keep only the final swap on the loop.
+"""
+import asyncio
+import inspect
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """State of one background job, safe to read while a worker updates it."""
+
+    def __init__(self, kind: str, stages):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"              # queued | running | succeeded | failed
+        self.stage = None
+        self.stages = OrderedDict(
+            (name, {"status": "pending", "progress": 0.0, "seconds": None}) for name in stages
+        )
+        self.steps = {}                     # seconds per step within stages (read, corr, ...)
+        self.result = None
+        self.error = None
+        self.exception = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._done = asyncio.Event()
+
+    def begin(self, stage: str) -> None:
+        """Mark `stage` as running (and any earlier running stage as done)."""
+        with self._lock:
+            self._finish_stage()
+            self.status = "running"
+            self.stage = stage
+            self.stages[stage].update(status="running", progress=0.0, _t0=time.perf_counter())
+
+    def skip(self, *stages) -> None:
+        """Mark stages that turned out to be unnecessary (e.g. a reused result)."""
+        with self._lock:
+            self._finish_stage()
+            for stage in stages:
+                self.stages[stage].update(status="skipped", progress=1.0)
+
+    def progress(self, fraction: float) -> None:
+        with self._lock:
+            if self.stage is not None:
+                self.stages[self.stage]["progress"] = round(min(max(fraction, 0.0), 1.0), 4)
+
+    def _finish_stage(self, status: str = "done") -> None:
+        if self.stage is None:
+            return
+        info = self.stages[self.stage]
+        t0 = info.pop("_t0", None)
+        if t0 is not None:
+            info["seconds"] = round(time.perf_counter() - t0, 4)
+        info["status"] = status
+        if status == "done":
+            info["progress"] = 1.0
+        self.stage = None
+
+    def _settle(self, status: str, result=None, error: str = None, exception=None) -> None:
+        with self._lock:
+            self._finish_stage("done" if status == "succeeded" else "failed")
+            self.status = status
+            self.result = result
+            self.error = error
+            self.exception = exception
+            self.finished_at = time.time()
+        self._done.set()
+
+    async def wait(self) -> "Job":
+        await self._done.wait()
+        return self
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            done = sum(1 for s in self.stages.values() if s["status"] in ("done", "skipped"))
+            current = self.stages[self.stage]["progress"] if self.stage else 0.0
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "progress": round((done + current) / max(len(self.stages), 1), 4),
+                "stages": [
+                    {"name": name, **{k: v for k, v in info.items() if not k.startswith("_")}}
+                    for name, info in self.stages.items()
+                ],
+                "steps": {name: round(seconds, 4) for name, seconds in list(self.steps.items())},
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs jobs on a worker pool and keeps the most recent ones for polling.
+    At most max_workers jobs are in flight, counting their publish step, so
+    with one worker each job sees everything published before it.
+    """
+
+    def __init__(self, max_workers: int = 1, keep: int = 100, on_finish=None):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._slots = asyncio.Semaphore(max_workers)
+        self._jobs = OrderedDict()
+        self._tasks = set()
+        self.keep = keep
+        self.on_finish = on_finish              # called with each settled job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def submit(self, kind: str, stages, work, publish=None) -> Job:
+        """
+        Start `work(job)` on the pool and return the job at once. When it
+        succeeds, `publish(job, output)` runs on the event loop (awaited if
+        it is a coroutine) and its return value becomes the job result.
+        Must be called from the loop.
+        """
+        job = Job(kind, stages)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.finished:
+                break
+            self._jobs.popitem(last=False)
+
+        task = asyncio.get_running_loop().create_task(self._run(job, work, publish))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(self, job: Job, work, publish) -> None:
+        try:
+            async with self._slots:
+                output = await asyncio.get_running_loop().run_in_executor(self._pool, work, job)
+                result = publish(job, output) if publish is not None else output
+                if inspect.isawaitable(result):
+                    result = await result
+        except asyncio.CancelledError:
+            job._settle("failed", error="cancelled")
+            raise
+        except Exception as e:
+            print(f"Job {job.kind} {job.id} failed: {e}")
+            job._settle("failed", error=str(e), exception=e)
+        else:
+            job._settle("succeeded", result=result)
+        finally:
+            if job.finished and self.on_finish is not None:
+                try:
+                    self.on_finish(job)
+                except Exception as e:
+                    print(f"Job {job.kind} {job.id} on_finish failed: {e}")
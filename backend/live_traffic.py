@@ -0,0 +1,248 @@
+"""
+Live traffic: per-link ring buffers fed by /api/live/ingest and pushed
+to dashboards as deltas over SSE or WebSocket.
+
+Each link keeps its last WINDOW samples in one row of a preallocated 2-D
+array, so an ingested batch costs a sort by link and one slice write per
+link, with no per-sample Python work. The rolling sum (hence mean)
+is updated as samples go in, subtracting the ones they overwrite, and
+re-summed exactly once per wrap so rounding cannot drift. Peak and p95
+are taken over the window once per push tick, and only for links that
+received samples since the last tick. A burst of ingests therefore
+costs one stats pass.
+
+LiveHub ticks every PUSH_INTERVAL_S while anyone is subscribed and
+sends each subscriber a "delta" (changed links only). A subscriber that
+falls more than QUEUE_DEPTH messages behind has its backlog replaced by a
+full "snapshot", so slow clients cost bounded memory and still converge.
+"""
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
+WINDOW = 4096               # samples kept per link
+PUSH_INTERVAL_S = 0.25
+QUEUE_DEPTH = 8             # messages buffered per subscriber
+DELTA_POINTS = 64           # newest raw samples per link in each delta
+MAX_LINKS = 10_000
+
+
+class LiveTraffic:
+    """Fixed-size per-link ring buffers with rolling mean / peak / p95."""
+
+    def __init__(self, window: int = WINDOW, max_links: int = MAX_LINKS):
+        self.window = window
+        self.max_links = max_links
+        self.link_ids = []
+        self._rows = {}                                     # link id -> row
+        self._times = np.full((0, window), np.nan)
+        self._values = np.full((0, window), np.nan)
+        self._heads = np.zeros(0, dtype=np.int64)           # next write position
+        self._counts = np.zeros(0, dtype=np.int64)          # filled slots (<= window)
+        self._sums = np.zeros(0)
+        self._totals = np.zeros(0, dtype=np.int64)          # samples ever ingested
+        self._pending = np.zeros(0, dtype=np.int64)         # samples since the last delta
+        self._dirty = set()
+        self.samples = 0
+
+    def __len__(self) -> int:
+        return len(self.link_ids)
+
+    @property
+    def changed(self) -> bool:
+        """Whether any link received samples since the last delta."""
+        return bool(self._dirty)
+
+    def _grow(self, n_links: int) -> None:
+        capacity = len(self._heads)
+        if n_links <= capacity:
+            return
+        new = max(n_links, 2 * capacity, 8)
+        extra = new - capacity
+        self._times = np.vstack((self._times, np.full((extra, self.window), np.nan)))
+        self._values = np.vstack((self._values, np.full((extra, self.window), np.nan)))
+        self._heads = np.concatenate((self._heads, np.zeros(extra, dtype=np.int64)))
+        self._counts = np.concatenate((self._counts, np.zeros(extra, dtype=np.int64)))
+        self._sums = np.concatenate((self._sums, np.zeros(extra)))
+        self._totals = np.concatenate((self._totals, np.zeros(extra, dtype=np.int64)))
+        self._pending = np.concatenate((self._pending, np.zeros(extra, dtype=np.int64)))
+
+    def _codes(self, link_ids) -> np.ndarray:
+        local, uniques = pd.factorize(np.asarray(link_ids, dtype=object))
+        new = [u for u in uniques if u not in self._rows]
+        if len(self.link_ids) + len(new) > self.max_links:
+            raise ValueError(f"At most {self.max_links} live links")
+        for link_id in new:
+            self._rows[link_id] = len(self.link_ids)
+            self.link_ids.append(link_id)
+        self._grow(len(self.link_ids))
+        to_row = np.array([self._rows[u] for u in uniques], dtype=np.int64)
+        return np.where(local >= 0, to_row[np.maximum(local, 0)], -1)
+
+    def ingest(self, times, link_ids, values) -> int:
+        """
+        Append samples (arrays of equal length, in arrival order per link).
+        Samples with a missing link or a NaN value are dropped. Returns the
+        number appended.
+        """
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if not (len(times) == len(values) == len(link_ids)):
+            raise ValueError("time_seconds, link_id and aggregated_gbps must have the same length")
+        if len(values) == 0:
+            return 0
+        codes = self._codes(link_ids)
+        keep = (codes >= 0) & ~np.isnan(values)
+        if not keep.all():
+            times, values, codes = times[keep], values[keep], codes[keep]
+
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        bounds = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], bounds))
+        stops = np.concatenate((bounds, [len(codes)]))
+        W = self.window
+        for row, start, stop in zip(codes[starts].tolist(), starts.tolist(), stops.tolist()):
+            idx = order[start:stop]
+            k = len(idx)
+            if k >= W:
+                idx = idx[k - W:]
+                self._times[row] = times[idx]
+                self._values[row] = values[idx]
+                self._heads[row], self._counts[row] = 0, W
+                self._sums[row] = self._values[row].sum()
+            else:
+                head, count = int(self._heads[row]), int(self._counts[row])
+                pos = np.arange(head, head + k) % W
+                old = self._values[row, pos]
+                seg = values[idx]
+                self._sums[row] += seg.sum() - old[pos < count].sum()
+                self._times[row, pos] = times[idx]
+                self._values[row, pos] = seg
+                self._heads[row] = (head + k) % W
+                self._counts[row] = min(count + k, W)
+                if head + k >= W:                           # wrapped: re-sum exactly
+                    self._sums[row] = self._values[row].sum()
+            self._totals[row] += k
+            self._pending[row] += k
+            self._dirty.add(row)
+        self.samples += len(codes)
+        return len(codes)
+
+    def window_values(self, link_id) -> np.ndarray:
+        """Samples currently in a link's window, oldest first."""
+        row = self._rows[link_id]
+        return self._ordered(row, self._values)
+
+    def _ordered(self, row: int, data: np.ndarray) -> np.ndarray:
+        head, count = int(self._heads[row]), int(self._counts[row])
+        if count < self.window:
+            return data[row, :count].copy()
+        return np.concatenate((data[row, head:], data[row, :head]))
+
+    def _stats(self, rows: list, points: bool) -> dict:
+        if not rows:
+            return {}
+        rows = np.asarray(rows, dtype=np.int64)
+        counts = self._counts[rows]
+        full = counts == self.window
+        vals = self._values[rows]                           # unfilled slots are NaN
+        if full.all():
+            peak = vals.max(axis=1)
+            p95 = np.percentile(vals, 95, axis=1)
+        else:
+            peak = np.nanmax(vals, axis=1)
+            p95 = np.nanpercentile(vals, 95, axis=1)
+        last = (self._heads[rows] - 1) % self.window
+        out = {}
+        for i, row in enumerate(rows.tolist()):
+            entry = {
+                "t": float(self._times[row, last[i]]),
+                "last": float(self._values[row, last[i]]),
+                "mean": float(self._sums[row] / counts[i]),
+                "peak": float(peak[i]),
+                "p95": float(p95[i]),
+                "n": int(counts[i]),
+                "total": int(self._totals[row]),
+            }
+            if points:
+                n = int(min(self._pending[row], DELTA_POINTS, counts[i]))
+                pos = (self._heads[row] - np.arange(n, 0, -1)) % self.window
+                entry["points"] = [self._times[row, pos].tolist(), self._values[row, pos].tolist()]
+            out[self.link_ids[row]] = entry
+        return out
+
+    def snapshot(self) -> dict:
+        """Stats of every link."""
+        return self._stats(np.flatnonzero(self._counts[:len(self.link_ids)]).tolist(), points=False)
+
+    def take_delta(self) -> dict:
+        """Stats (and newest points) of links changed since the last call."""
+        rows = sorted(self._dirty)
+        self._dirty.clear()
+        out = self._stats(rows, points=True)
+        self._pending[rows] = 0
+        return out
+
+    def clear(self) -> None:
+        self.__init__(self.window, self.max_links)
+
+
+class LiveHub:
+    """Fans LiveTraffic deltas out to subscriber queues from one ticker task."""
+
+    def __init__(self, live: LiveTraffic, interval_s: float = PUSH_INTERVAL_S, depth: int = QUEUE_DEPTH):
+        self.live = live
+        self.interval_s = interval_s
+        self.depth = depth
+        self.seq = 0
+        self._subscribers = set()
+        self._task = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def _message(self, kind: str, links: dict) -> dict:
+        return {"type": kind, "seq": self.seq, "server_time": time.time(), "links": links}
+
+    def subscribe(self) -> asyncio.Queue:
+        """A queue that starts with a full snapshot; call unsubscribe() when done."""
+        queue = asyncio.Queue(self.depth)
+        queue.put_nowait(self._message("snapshot", self.live.snapshot()))
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self) -> None:
+        """Send pending changes now (the ticker calls this)."""
+        if not self.live.changed:
+            return
+        self.seq += 1
+        message = self._message("delta", self.live.take_delta())
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # too far behind for deltas: resync from a snapshot
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(self._message("snapshot", self.live.snapshot()))
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(self.interval_s)
+            self.publish()
+        self._task = None
+
+    async def aclose(self) -> None:
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
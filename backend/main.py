@@ -1,17 +1,43 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile
+import time
+
+_import_started = time.perf_counter()      # start of the time-to-ready clock
+
+from fastapi import FastAPI, HTTPException, File, UploadFile, Query, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 import pandas as pd
 import numpy as np
+import asyncio
+import functools
+import gzip
+import hashlib
+import io
 import json
+import os
 import shutil
+import sys
+import threading
+import uuid
 from pathlib import Path
-import httpx
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # serve at once; caches fill in the background (see /ready)
+    _warmup.start()
+    yield
+    await _warmup.aclose()
+    _profiler.stop()
+    await _live_hub.aclose()
+    await _ollama.aclose()
 
-app = FastAPI(title="Nokia Hackathon Day-3 API", version="1.0.0")
+
+app = FastAPI(title="Nokia Hackathon Day-3 API", version="1.0.0", lifespan=lifespan)
 
 # Trigger reload
 
@@ -29,135 +55,626 @@ BASE_DIR = Path(__file__).parent.parent
 RESULTS_DIR = BASE_DIR / "results"
 ARTIFACTS_DIR = BASE_DIR / "artifacts"
 
-# Cache for loaded data
-_data_cache = {}
+# Make the analysis package (src/, config.py) importable from backend/
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+import src.buffer_model as buffer_model
+from config import ANALYSIS_WINDOW_S
+from src.artifact_store import load_table, store_path, write_frame
+from src.capacity_planning import CURVE_BUFFERS_S, CURVE_LOSS_FRACS, capacity_curves, capacity_timeline
+from src.correlation_index import load_index
+from src.correlation_state import CorrelationState
+from src.ingest import CHUNK_ROWS, REQUIRED_COLUMNS, StepTimer, ingest_traffic_csv
+from src.loss_events import TOP_K, load_results as load_loss_results, read_loss_csv
+from src.snapshot_store import HashingWriter, SnapshotStore, artifact_files, file_digest
+from src.timeseries import TrafficIndex, window_traffic
+from data_cache import DataCache
+from image_variants import MEDIA_TYPES, ImageVariants, negotiate
+from jobs import Job, JobManager
+from live_traffic import LiveHub, LiveTraffic
+from metrics import CONTENT_TYPE, MetricsMiddleware, MetricsRegistry, SamplingProfiler
+from ollama_proxy import OllamaBusy, OllamaClient, compact_context, compact_history
+from warmup import WarmUp
+from wire_format import MEDIA_TYPE, decode_columns, encode_payload, wants_binary
+
+# Cache for loaded data and pre-encoded responses. Entries are dropped when
+# their source files change on disk, and least recently used ones once the
+# byte budget is spent.
+DATA_CACHE_MAX_BYTES = int(os.environ.get("DATA_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+_data_cache = DataCache(DATA_CACHE_MAX_BYTES)
+GZIP_MIN_BYTES = 1024
+
+# Metrics served at /metrics. Everything here is cheap enough to stay on;
+# the sampling profiler only runs while switched on via /api/profiler.
+_metrics = MetricsRegistry()
+_request_seconds = _metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+_requests_total = _metrics.counter(
+    "http_requests_total", "HTTP responses by route template and status", ("method", "route", "status"))
+app.add_middleware(MetricsMiddleware, seconds=_request_seconds, requests=_requests_total)
+
+for _name, _attr in (("hits", "hits"), ("misses", "misses"), ("evictions", "evictions"),
+                     ("invalidations", "invalidations")):
+    _metrics.callback(f"data_cache_{_name}_total", f"Data cache {_name}",
+                      lambda attr=_attr: getattr(_data_cache, attr), kind="counter")
+_metrics.callback("data_cache_bytes", "Bytes held by the data cache", lambda: _data_cache.nbytes)
+_metrics.callback("data_cache_max_bytes", "Byte budget of the data cache", lambda: _data_cache.max_bytes)
+_metrics.callback("data_cache_entries", "Entries in the data cache", lambda: len(_data_cache))
+
+_job_stage_seconds = _metrics.histogram(
+    "job_stage_duration_seconds", "Background job stage durations", ("kind", "stage"))
+_job_step_seconds = _metrics.histogram(
+    "job_step_duration_seconds", "Time per processing step (read, groupby, pivot, corr, writes) per job",
+    ("kind", "step"))
+_jobs_total = _metrics.counter("jobs_total", "Finished background jobs", ("kind", "status"))
+
+_bisection_steps = _metrics.histogram(
+    "capacity_bisection_steps", "Steps per capacity search (full range, or warm-started per window)", ("search",),
+    buckets=(0, 5, 10, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 80, 100, 120))
+buffer_model.bisection_observer = lambda steps, search: _bisection_steps.observe(steps, search=search)
+_curve_evaluations = _metrics.histogram(
+    "capacity_curve_evaluations", "Overflow-count evaluations per capacity_curve sweep over a (buffer, loss) grid",
+    (), buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000))
+buffer_model.curve_observer = lambda evaluations: _curve_evaluations.observe(evaluations)
+
+_ollama_seconds = _metrics.histogram(
+    "ollama_upstream_duration_seconds", "Ollama upstream latency (chat, first_byte, stream)", ("phase",))
 
-# Define critical files to backup/restore
-CRITICAL_FILES = [
-    (RESULTS_DIR / "topology.json"),
-    (RESULTS_DIR / "correlation_matrix.csv"),
-    (ARTIFACTS_DIR / "link_capacity_summary.csv"),
-    (ARTIFACTS_DIR / "link_traffic_timeseries.csv")
-]
+_profiler = SamplingProfiler()
+_metrics.callback("profiler_running", "1 while the sampling profiler is on", lambda: int(_profiler.running))
+_metrics.callback("profiler_samples_total", "Samples taken by the sampling profiler",
+                  lambda: _profiler.samples, kind="counter")
 
-# Create backups on startup if they don't exist
-for file_path in CRITICAL_FILES:
-    backup_path = file_path.with_name(f"{file_path.stem}_original{file_path.suffix}")
-    if file_path.exists() and not backup_path.exists():
-        shutil.copy2(file_path, backup_path)
-        print(f"Created backup: {backup_path.name}")
+
+def record_job(job: Job) -> None:
+    """Job stage and step durations into the metrics (on each finished job)"""
+    _jobs_total.inc(kind=job.kind, status=job.status)
+    for name, info in job.stages.items():
+        if info["seconds"] is not None:
+            _job_stage_seconds.observe(info["seconds"], kind=job.kind, stage=name)
+    for name, seconds in job.steps.items():
+        _job_step_seconds.observe(seconds, kind=job.kind, step=name)
+
+
+# Upload processing runs here, off the event loop; one worker keeps
+# concurrent uploads from competing for CPU and disk
+_jobs = JobManager(max_workers=1, on_finish=record_job)
+
+# Live traffic pushed to /api/live/ingest, kept in per-link ring buffers;
+# subscribers get deltas over SSE (/api/live/stream) or WebSocket (/api/live/ws)
+_live = LiveTraffic()
+_live_hub = LiveHub(_live)
+_metrics.callback("live_samples_total", "Samples ingested into the live ring buffers",
+                  lambda: _live.samples, kind="counter")
+_metrics.callback("live_links", "Links with live traffic", lambda: len(_live))
+_metrics.callback("live_subscribers", "Open live update streams", lambda: _live_hub.subscribers)
+
+# Pooled connection to the local Ollama server (OLLAMA_URL), shared by all chats
+_ollama = OllamaClient(observe=lambda phase, seconds: _ollama_seconds.observe(seconds, phase=phase))
 
 @app.post("/api/reset")
 async def reset_data():
-    """Restores the original datasets from backup files."""
+    """Switches back to the original dataset (the "original" snapshot)."""
     try:
-        restored_count = 0
-        for file_path in CRITICAL_FILES:
-            backup_path = file_path.with_name(f"{file_path.stem}_original{file_path.suffix}")
-            if backup_path.exists():
-                shutil.copy2(backup_path, file_path)
-        # 3. Clear all caches to ensure UI sync
-        _data_cache.clear()
-        
+        store = await run_in_threadpool(_snapshots)
+        restored_count = await _activate(store, store.ref("original"))
         return {"status": "success", "message": f"System reset complete. Restored {restored_count} files."}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Reset failed: {str(e)}")
 
 
+UPLOAD_STAGES = ["ingest", "capacity", "correlation", "topology", "snapshot", "publish"]
+APPEND_STAGES = ["append", "correlation", "snapshot", "publish"]
+LOSS_STAGES = ["pack", "cooccurrence", "snapshot", "publish"]
 
-@app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
+# Co-moment state behind correlation_matrix.csv, for appends and the window
+CORRELATION_STATE_FILE = "correlation_state.npz"
+LOSS_EVENTS_FILE = "loss_events.npz"
+# Processes for the loss-event co-occurrence (one per CPU by default)
+LOSS_EVENT_WORKERS = int(os.environ.get("LOSS_EVENT_WORKERS", os.cpu_count() or 1))
+
+# Every processed dataset is kept as an immutable, content-addressed
+# snapshot, and the live artifact files are symlinks into the HEAD one's
+# read-only tree, switched in one swap (see src/snapshot_store.py).
+# Versions beyond the newest SNAPSHOT_KEEP are dropped unless a ref points at them.
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", 10))
+# Part of the key under which an input's snapshot is remembered; bump it
+# when processing changes so re-uploads are not answered by stale results
+# (2: drops memos recorded while same-named uploads could swap inputs)
+PIPELINE_VERSION = 2
+_snapshot_stores = {}
+_snapshot_lock = threading.Lock()
+_checkout_lock = threading.Lock()
+
+
+def _upload_targets():
+    """Artifact name -> data directory ("results" / "artifacts") it lives in"""
+    return {
+        "link_traffic_timeseries.csv": "artifacts",
+        "link_capacity_summary.csv": "artifacts",
+        "correlation_matrix.csv": "results",
+        CORRELATION_STATE_FILE: "results",
+        "topology.json": "results",
+    }
+
+
+def _snapshot_roots():
+    return {"results": RESULTS_DIR, "artifacts": ARTIFACTS_DIR}
+
+
+def _artifact_files(roots: dict, targets: dict) -> dict:
+    """Snapshot path -> file for `targets` (name -> root) under `roots`"""
+    files = {}
+    for root, directory in roots.items():
+        files.update(artifact_files(directory, root, [n for n, r in targets.items() if r == root]))
+    return files
+
+
+def _snapshots() -> SnapshotStore:
     """
-    Accepts a user-uploaded traffic CSV, processes it, and updates system analysis.
-    Expected Schema: time_seconds, link_id, aggregated_gbps
+    Snapshot store of the current data directories. On first use it records
+    the shipped dataset as the "original" ref (from the *_original backups
+    where they exist) and the live files as HEAD.
     """
+    key = (RESULTS_DIR, ARTIFACTS_DIR)
+    with _snapshot_lock:                    # the warm-up and a job may both get here first
+        store = _snapshot_stores.get(key)
+        if store is None:
+            store = SnapshotStore(ARTIFACTS_DIR / "snapshots", _snapshot_roots())
+            if store.ref("original") is None:
+                live = _artifact_files(_snapshot_roots(), _upload_targets())
+                original = {}
+                for path, file in live.items():
+                    backup = file.with_name(f"{file.stem}_original{file.suffix}")
+                    original[path] = backup if backup.exists() else file
+                store.set_ref("original", store.commit(original, label="original"))
+                store.checkout(store.commit(live, label="live"))
+                print(f"Snapshot store initialised at {store.directory}")
+            _snapshot_stores[key] = store
+    return store
+
+
+def _checkout(store: SnapshotStore, version_id: str) -> int:
+    with _checkout_lock:                    # one checkout at a time
+        return store.checkout(version_id)
+
+
+async def _activate(store: SnapshotStore, version_id: str) -> int:
+    """
+    Make a snapshot live: the checkout runs on the threadpool, and only
+    the cache is dropped on the event loop, once the new files are live.
+    """
+    changed = await run_in_threadpool(_checkout, store, version_id)
+    _data_cache.clear()
+    return changed
+
+
+def _save_upload(file: UploadFile, upload_path: Path) -> str:
+    """Save an upload and return the hash of its content"""
+    tmp = upload_path.with_name(f"{upload_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "wb") as buffer:
+        writer = HashingWriter(buffer)
+        shutil.copyfileobj(file.file, writer)
+    os.replace(tmp, upload_path)
+    return writer.hexdigest()
+
+
+def _commit_staged(job: Job, store: SnapshotStore, staging: Path, targets: dict, upload_path: Path,
+                   digest: str, source_key: str, label: str, meta: dict, base: str = None) -> str:
+    """
+    Snapshot the staged artifacts (on the job pool) and remember the input
+    that made them, if the processed upload still hashes to `digest`
+    """
+    job.begin("snapshot")
     try:
-        # 1. Save File
-        upload_path = ARTIFACTS_DIR / f"user_upload_{file.filename}"
-        with open(upload_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # 2. Load Data
-        df = pd.read_csv(upload_path)
-        required_cols = {"time_seconds", "link_id", "aggregated_gbps"}
-        if not required_cols.issubset(df.columns):
-            raise HTTPException(status_code=400, detail=f"CSV must contain columns: {required_cols}")
-
-        # 3. Process Capacity Summary
-        # Group by LinkID and calculate stats
-        capacity_stats = df.groupby('link_id')['aggregated_gbps'].agg(['mean', 'max', lambda x: x.quantile(0.95)]).reset_index()
-        capacity_stats.columns = ['link_id', 'avg_gbps', 'peak_gbps', 'p95_gbps']
-        
+        files = _artifact_files({root: staging for root in _snapshot_roots()}, targets)
+        replaces = [f"{root}/{name}" for name, root in targets.items()]
+        version = store.commit(files, label=label, meta=meta, base=base, replaces=replaces)
+        if file_digest(upload_path) == digest:
+            store.remember(source_key, version)
+        else:
+            print(f"Upload {upload_path.name} changed while processing; not remembering snapshot {version}")
+        store.gc(SNAPSHOT_KEEP, protect=[version])
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return version
+
+
+def process_upload(upload_path: Path, staging: Path, job: Job, digest: str, name: str):
+    """
+    Analyse an uploaded traffic CSV into a snapshot (runs on the job pool).
+    A file that was processed before is answered from its snapshot.
+    Returns (snapshot version, reused) for publish_upload.
+    """
+    store = _snapshots()
+    source_key = f"upload-v{PIPELINE_VERSION}:{digest}"
+    version = store.lookup(source_key)
+    if version is not None:
+        job.skip(*UPLOAD_STAGES[:-1])
+        return version, True
+
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        # 1. Stream the file once: per-link stats, correlation inputs and
+        #    the timeseries artifact, in bounded memory
+        job.begin("ingest")
+        timeseries_file = staging / "link_traffic_timeseries.csv"
+        state = CorrelationState()
+        steps = StepTimer(job.steps)
+        capacity_stats, corr_matrix, unique_links = ingest_traffic_csv(
+            upload_path, timeseries_file, store_dir=store_path(timeseries_file),
+            progress=job.progress, state=state, steps=steps
+        )
+
+        # 2. Process Capacity Summary
         # Simple buffer logic
-        def calc_buffer(row):
-            burstiness = row['peak_gbps'] / (row['avg_gbps'] + 0.001)
-            savings_factor = 0.2 if burstiness > 1.5 else 0.05
-            return row['peak_gbps'] * (1 - savings_factor)
+        job.begin("capacity")
+        burstiness = capacity_stats['peak_gbps'] / (capacity_stats['avg_gbps'] + 0.001)
+        savings_factor = np.where(burstiness > 1.5, 0.2, 0.05)
 
         capacity_stats['capacity_no_buffer_gbps'] = capacity_stats['peak_gbps'] * 1.1 # 10% headroom
-        capacity_stats['capacity_with_buffer_gbps'] = capacity_stats.apply(calc_buffer, axis=1) * 1.1
-        
-        # Save Capacity CSV
-        capacity_stats.to_csv(ARTIFACTS_DIR / "link_capacity_summary.csv", index=False)
-        _data_cache.pop(str(ARTIFACTS_DIR / "link_capacity_summary.csv"), None)
-
-        # 4. Process Correlation Matrix
-        # Pivot: Time vs Link
-        pivot_df = df.pivot_table(index='time_seconds', columns='link_id', values='aggregated_gbps', fill_value=0)
-        corr_matrix = pivot_df.corr().fillna(0)
-        
-        # Save Correlation CSV
-        corr_matrix.to_csv(RESULTS_DIR / "correlation_matrix.csv")
-        _data_cache.pop(str(RESULTS_DIR / "correlation_matrix.csv"), None)
+        capacity_stats['capacity_with_buffer_gbps'] = capacity_stats['peak_gbps'] * (1 - savings_factor) * 1.1
 
-        # 5. Process Topology (Inference)
-        unique_links = df['link_id'].unique()
+        # Save Capacity CSV (+ columnar copy for memory-mapped loads)
+        capacity_file = staging / "link_capacity_summary.csv"
+        steps.restart()
+        capacity_stats.to_csv(capacity_file, index=False)
+        write_frame(capacity_stats, store_path(capacity_file), source=capacity_file)
+        steps.lap("writes")
+
+        # 3. Save Correlation CSV (pivot time x link, fill 0, Pearson)
+        job.begin("correlation")
+        steps.restart()
+        _write_correlation(corr_matrix, state, staging)
+        steps.lap("writes")
+
+        # 4. Process Topology (Inference)
+        job.begin("topology")
+        link_stats = capacity_stats.set_index('link_id')
         topology = {"links": {}}
-        
+
         for link_id in unique_links:
             # Ensure link_id is string
             l_id = str(link_id)
             topology["links"][l_id] = {
                 "cells": [f"{l_id}_cell_{i}" for i in range(1, 4)],
                 "cell_count": 3,
-                "avg_throughput_mbps": float(capacity_stats[capacity_stats['link_id'] == link_id]['avg_gbps'].iloc[0] * 1000),
-                "peak_throughput_mbps": float(capacity_stats[capacity_stats['link_id'] == link_id]['peak_gbps'].iloc[0] * 1000),
+                "avg_throughput_mbps": float(link_stats.at[link_id, 'avg_gbps'] * 1000),
+                "peak_throughput_mbps": float(link_stats.at[link_id, 'peak_gbps'] * 1000),
                 "estimated_utilization": 0.5
             }
 
-        with open(RESULTS_DIR / "topology.json", "w") as f:
+        with open(staging / "topology.json", "w") as f:
             json.dump(topology, f, indent=2)
-        _data_cache.pop(str(RESULTS_DIR / "topology.json"), None)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
 
-        # 6. Save Raw Traffic for Charts
-        df.to_csv(ARTIFACTS_DIR / "link_traffic_timeseries.csv", index=False)
-        _data_cache.pop(str(ARTIFACTS_DIR / "link_traffic_timeseries.csv"), None)
+    version = _commit_staged(job, store, staging, _upload_targets(), upload_path, digest, source_key,
+                             label=name, meta={"links": len(unique_links)})
+    return version, False
+
+
+def _write_correlation(corr_matrix: pd.DataFrame, state: CorrelationState, directory: Path) -> None:
+    """Correlation CSV (+ columnar copy) and the co-moment state it came from"""
+    corr_file = directory / "correlation_matrix.csv"
+    corr_matrix.to_csv(corr_file)
+    write_frame(corr_matrix.reset_index(), store_path(corr_file), source=corr_file)
+    state.save(directory / CORRELATION_STATE_FILE)
+
+
+async def publish_upload(job: Job, staged):
+    version, reused = staged
+    job.begin("publish")
+    store = _snapshots()
+    await _activate(store, version)
+    n_links = store.version(version)["meta"].get("links")
+    details = f"Processed {n_links} links."
+    if reused:
+        details += f" Reused snapshot {version} of an identical upload."
+    return {"status": "success", "message": "Data processed. Dashboard updated.", "details": details,
+            "snapshot": version}
+
+
+def process_correlation_append(upload_path: Path, staging: Path, job: Job, digest: str, name: str):
+    """
+    Fold a CSV of newer traffic into the persisted correlation state and
+    snapshot the updated matrix on top of the live dataset (runs on the job
+    pool). Only the new time rows are touched; history is not re-read.
+    """
+    store = _snapshots()
+    base = store.head
+    source_key = f"append-v{PIPELINE_VERSION}:{base}:{digest}"
+    version = store.lookup(source_key)
+    if version is not None:
+        job.skip(*APPEND_STAGES[:-1])
+        return version
+
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        job.begin("append")
+        state = CorrelationState.load(RESULTS_DIR / CORRELATION_STATE_FILE)
+        if state is None:
+            raise ValueError("No correlation state to append to: upload a dataset first")
+        total_bytes = max(upload_path.stat().st_size, 1)
+        late_rows = 0
+        steps = StepTimer(job.steps)
+        with open(upload_path, "rb") as src:
+            for i, chunk in enumerate(pd.read_csv(src, chunksize=CHUNK_ROWS)):
+                steps.lap("read")
+                if i == 0 and not REQUIRED_COLUMNS.issubset(chunk.columns):
+                    raise ValueError(f"CSV must contain columns: {REQUIRED_COLUMNS}")
+                late_rows += state.append(chunk)
+                steps.lap("corr")
+                job.progress(src.tell() / total_bytes)
+
+        job.begin("correlation")
+        steps.restart()
+        corr_matrix = state.matrix()
+        steps.lap("corr")
+        _write_correlation(corr_matrix, state, staging)
+        steps.lap("writes")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    meta = {**store.version(base)["meta"], "correlation_links": len(corr_matrix), "late_rows": late_rows}
+    return _commit_staged(job, store, staging, {"correlation_matrix.csv": "results", CORRELATION_STATE_FILE: "results"},
+                          upload_path, digest, source_key, label=f"{name} (append)", meta=meta, base=base)
+
+
+async def publish_correlation_append(job: Job, version):
+    job.begin("publish")
+    store = _snapshots()
+    await _activate(store, version)
+    meta = store.version(version)["meta"]
+    return {"status": "success", "message": "Correlation updated.",
+            "details": f"{meta['correlation_links']} links; {meta['late_rows']} late rows skipped.",
+            "snapshot": version}
+
+
+def process_loss_events(upload_path: Path, staging: Path, job: Job, digest: str, name: str,
+                        window: int = 1):
+    """
+    Pack a cell-level loss CSV into per-cell bitsets, score every cell pair
+    and snapshot the result on top of the live dataset (runs on the job pool).
+    """
+    store = _snapshots()
+    base = store.head
+    source_key = f"loss-v{PIPELINE_VERSION}:{base}:{window}:{digest}"
+    version = store.lookup(source_key)
+    if version is not None:
+        job.skip(*LOSS_STAGES[:-1])
+        return version
+
+    staging.mkdir(parents=True, exist_ok=True)
+    try:
+        job.begin("pack")
+        steps = StepTimer(job.steps)
+        events = read_loss_csv(upload_path, window, progress=job.progress, steps=steps)
+
+        job.begin("cooccurrence")
+        steps.restart()
+        events.save(staging / LOSS_EVENTS_FILE, workers=LOSS_EVENT_WORKERS, steps=steps)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    meta = {**store.version(base)["meta"], "loss_cells": len(events), "loss_events": int(events.counts.sum())}
+    return _commit_staged(job, store, staging, {LOSS_EVENTS_FILE: "results"}, upload_path, digest, source_key,
+                          label=f"{name} (loss events)", meta=meta, base=base)
+
+
+async def publish_loss_events(job: Job, version):
+    job.begin("publish")
+    store = _snapshots()
+    await _activate(store, version)
+    meta = store.version(version)["meta"]
+    return {"status": "success", "message": "Loss events analysed.",
+            "details": f"{meta['loss_events']} loss events over {meta['loss_cells']} cells.",
+            "snapshot": version}
 
-        # 6. Clear Cache
-        _data_cache.clear()
-        
-        return {"status": "success", "message": "Data processed. Dashboard updated.", "details": f"Processed {len(unique_links)} links."}
 
+async def _start_job(file: UploadFile, prefix: str, kind: str, stages, process, publish):
+    """
+    Save an uploaded CSV (off the event loop) and start its processing job.
+    Each job gets its own staging directory holding the upload, so two
+    uploads of the same filename cannot overwrite each other's input.
+    """
+    staging = ARTIFACTS_DIR / ".staging" / uuid.uuid4().hex
+    upload_path = staging / f"{prefix}input.csv"
+    name = Path(file.filename or "upload.csv").name
+    try:
+        staging.mkdir(parents=True)
+        digest = await run_in_threadpool(_save_upload, file, upload_path)
     except Exception as e:
+        shutil.rmtree(staging, ignore_errors=True)
         print(f"Upload Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    def run(job: Job):
+        try:
+            return process(upload_path, staging, job, digest, name)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    return _jobs.submit(kind, stages, run, publish=publish)
+
+
+async def _job_response(job: Job, response: Response, wait: bool):
+    """202 with the job id, or with wait=true the finished job's result"""
+    if not wait:
+        return {"status": "accepted", "job_id": job.id, "status_url": f"/api/jobs/{job.id}"}
+
+    await job.wait()
+    if job.status != "succeeded":
+        status_code = 400 if isinstance(job.exception, ValueError) else 500
+        raise HTTPException(status_code=status_code, detail=job.error)
+    response.status_code = 200
+    return job.result
+
+
+@app.post("/api/upload", status_code=202)
+async def upload_file(response: Response, file: UploadFile = File(...), wait: bool = False):
+    """
+    Accepts a user-uploaded traffic CSV and starts a background job that
+    processes it and updates the system analysis. Returns the job id at
+    once; poll /api/jobs/{job_id} for per-stage progress. With wait=true
+    the response is held until the job has finished.
+    Expected Schema: time_seconds, link_id, aggregated_gbps
+    """
+    job = await _start_job(file, "user_upload_", "upload", UPLOAD_STAGES, process_upload, publish_upload)
+    return await _job_response(job, response, wait)
+
+
+@app.post("/api/correlation/append", status_code=202)
+async def append_correlation(response: Response, file: UploadFile = File(...), wait: bool = False):
+    """
+    Folds a CSV of newer traffic (same schema as /api/upload) into the
+    correlation matrix without reprocessing history. Rows at or before the
+    latest already-folded timestamp are skipped. Runs as a job like uploads.
+    """
+    job = await _start_job(file, "user_append_", "correlation-append", APPEND_STAGES,
+                           process_correlation_append, publish_correlation_append)
+    return await _job_response(job, response, wait)
+
+
+@app.post("/api/loss-events", status_code=202)
+async def upload_loss_events(response: Response, file: UploadFile = File(...),
+                             window: int = Query(1, ge=1), wait: bool = False):
+    """
+    Accepts a cell-level CSV (slot_id, cell_id, loss_binary) and starts a
+    job that scores synchronized loss between every pair of cells. window
+    groups that many slots, so events a few slots apart count as shared.
+    Runs as a job like uploads; results are served by GET /api/loss-events.
+    """
+    job = await _start_job(file, "user_loss_", "loss-events", LOSS_STAGES,
+                           functools.partial(process_loss_events, window=window), publish_loss_events)
+    return await _job_response(job, response, wait)
+
+
+@app.get("/api/snapshots")
+async def list_snapshots():
+    """Stored dataset snapshots, newest first, with the refs pointing at them"""
+    try:
+        store = await run_in_threadpool(_snapshots)
+        head = store.head
+        return {
+            "head": head,
+            "refs": store.refs(),
+            "versions": [
+                {"id": v["id"], "label": v["label"], "created_at": v["created_at"], "meta": v["meta"],
+                 "files": len(v["files"]), "bytes": sum(e["size"] for e in v["files"].values()),
+                 "current": v["id"] == head}
+                for v in store.versions()
+            ],
+        }
+    except Exception as e:
+        print(f"Snapshot API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/snapshots/{version_id}/activate")
+async def activate_snapshot(version_id: str):
+    """Makes a stored snapshot the live dataset (one swap of the live link)"""
+    try:
+        store = await run_in_threadpool(_snapshots)
+        if store.version(version_id) is None:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        changed = await _activate(store, version_id)
+        return {"status": "success", "snapshot": version_id, "files_changed": changed}
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Snapshot API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background job with per-stage progress and timings"""
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+def _read_json(filepath: Path):
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
 def load_json_file(filepath: Path):
     """Load JSON file with caching"""
-    cache_key = str(filepath)
-    if cache_key not in _data_cache:
-        with open(filepath, 'r') as f:
-            _data_cache[cache_key] = json.load(f)
-    return _data_cache[cache_key]
+    return _data_cache.get_or_load(str(filepath), [filepath], lambda: _read_json(filepath))
 
 
 def load_csv_to_json(filepath: Path):
-    """Load CSV file and convert to JSON with caching"""
-    cache_key = str(filepath)
-    if cache_key not in _data_cache:
-        df = pd.read_csv(filepath)
-        _data_cache[cache_key] = df.to_dict(orient='records')
-    return _data_cache[cache_key]
+    """
+    Load CSV file as a list of records. Not cached itself: the frame is,
+    and endpoints cache the encoded response rather than the records.
+    """
+    return load_csv(filepath).to_dict(orient='records')
+
+
+def _etag_matches(if_none_match: Optional[str], *etags: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or any(etag in tags for etag in etags)
+
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+def _tagged(body: bytes):
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    gz = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    return etag, body, gz
+
+
+def _encode_json(data):
+    return _tagged(json.dumps(fix_json_values(data), ensure_ascii=False, allow_nan=False,
+                              separators=(",", ":")).encode("utf-8"))
+
+
+def encoded_body(key: str, sources: List[Path], build, binary: bool = False, float_dtype: str = "float64"):
+    """(media type, etag, body, gzipped body or None), cached per version of `sources`"""
+    if binary:
+        return (MEDIA_TYPE,) + _data_cache.get_or_load(
+            f"resp_{key}:bin:{float_dtype}", sources, lambda: _tagged(encode_payload(build(), float_dtype)))
+    return ("application/json",) + _data_cache.get_or_load(f"resp_{key}", sources, lambda: _encode_json(build()))
+
+
+def encoded_response(request: Request, key: str, sources: List[Path], build,
+                     binary: bool = False, float_dtype: str = "float64") -> Response:
+    """
+    Serve a read-only endpoint from cached, pre-encoded bytes.
+
+    The body is encoded (and gzipped) once per version of its source files;
+    every later request is a cache lookup plus a header check, and clients
+    holding the current ETag get an empty 304. With binary=True the payload
+    goes out in the columnar wire format instead of JSON. A miss parses
+    and encodes synchronously, so handlers call this on the threadpool.
+    """
+    media_type, etag, body, gz = encoded_body(key, sources, build, binary, float_dtype)
+    gz_etag = etag[:-1] + '-gz"'
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+
+    use_gzip = gz is not None and _accepts_gzip(request.headers.get("accept-encoding"))
+    headers["ETag"] = gz_etag if use_gzip else etag
+    if _etag_matches(request.headers.get("if-none-match"), etag, gz_etag):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(gz, media_type=media_type, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
 
 
 @app.get("/")
@@ -169,10 +686,23 @@ async def root():
         "endpoints": [
             "/api/topology",
             "/api/correlation",
+            "/api/correlation/window",
             "/api/capacity-summary",
+            "/api/capacity-timeline",
+            "/api/capacity-curve",
             "/api/link-traffic",
+            "/api/loss-events",
             "/api/images/{filename}",
-            "/health"
+            "/api/jobs/{job_id}",
+            "/api/snapshots",
+            "/api/live/ingest",
+            "/api/live/stream",
+            "/api/live/ws",
+            "/api/cache-stats",
+            "/api/profiler",
+            "/metrics",
+            "/health",
+            "/ready"
         ]
     }
 
@@ -183,8 +713,60 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check(response: Response):
+    """
+    Readiness probe: 503 while the start-up warm-up is filling the caches,
+    200 once it has finished. Reports each step and the time to ready.
+    """
+    if not _warmup.ready:
+        response.status_code = 503
+    return _warmup.status()
+
+
+@app.get("/api/cache-stats")
+async def cache_stats():
+    """Size and hit/miss/eviction counters of the data cache"""
+    return _data_cache.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, cache, job, capacity and Ollama metrics"""
+    return PlainTextResponse(_metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.get("/api/profiler")
+async def get_profiler(format: Literal["json", "folded"] = "json", limit: int = Query(20, ge=1, le=1000)):
+    """
+    Sampling profiler state and its most frequent stacks. format=folded
+    returns every stack as "frame;frame count" lines for flame graph tools.
+    """
+    if format == "folded":
+        return PlainTextResponse(_profiler.folded())
+    return _profiler.snapshot(limit)
+
+
+@app.post("/api/profiler")
+async def set_profiler(enabled: bool, interval_ms: float = Query(10.0, ge=1.0, le=1000.0), reset: bool = False):
+    """Switch the sampling profiler on or off at runtime (reset=true clears its samples)"""
+    if reset:
+        _profiler.reset()
+    if enabled:
+        _profiler.start(interval_ms / 1000.0)
+    else:
+        await run_in_threadpool(_profiler.stop)
+    return _profiler.snapshot(0)
+
+
+def topology_view():
+    """(cache key, source files, build) of /api/topology, shared with the warm-up"""
+    topology_file = RESULTS_DIR / "topology.json"
+    return "topology", [topology_file], lambda: load_json_file(topology_file)
+
+
 @app.get("/api/topology")
-async def get_topology():
+async def get_topology(request: Request):
     """
     Returns the inferred fronthaul network topology.
     
@@ -192,24 +774,28 @@ async def get_topology():
         JSON object with topology structure including links and their cells
     """
     try:
-        topology_file = RESULTS_DIR / "topology.json"
-        if not topology_file.exists():
+        key, sources, build = topology_view()
+        if not sources[0].exists():
             raise HTTPException(status_code=404, detail="Topology file not found")
         
         # Fix Infinity/NaN values which are not JSON compliant
-        data = load_json_file(topology_file)
-        return fix_json_values(data)
+        return await run_in_threadpool(encoded_response, request, key, sources, build)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Topology API Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error loading topology: {str(e)}")
 
 
 def load_csv(filepath: Path):
-    """Load CSV file with caching"""
-    cache_key = f"df_{filepath}"
-    if cache_key not in _data_cache:
-        _data_cache[cache_key] = pd.read_csv(filepath)
-    return _data_cache[cache_key]
+    """Load CSV artifact with caching, memory-mapped from its columnar store"""
+    return _data_cache.get_or_load(f"df_{filepath}", [filepath], lambda: load_table(filepath))
+
+
+def load_traffic_index(filepath: Path):
+    """Per-link index over the traffic timeseries, built once per load"""
+    return _data_cache.get_or_load(f"idx_{filepath}", [filepath],
+                                   lambda: TrafficIndex(load_csv(filepath)))
 
 
 def fix_json_values(obj):
@@ -218,34 +804,157 @@ def fix_json_values(obj):
         return {k: fix_json_values(v) for k, v in obj.items()}
     elif isinstance(obj, list):
         return [fix_json_values(item) for item in obj]
+    elif isinstance(obj, np.ndarray):
+        return fix_json_values(obj.tolist())
     elif isinstance(obj, float) and (math.isinf(obj) or math.isnan(obj)):
         return None  # Convert Infinity/NaN to null
     return obj
 
 
+def correlation_matrix(df: pd.DataFrame):
+    """(cells, matrix) from a correlation CSV in any of the layouts the pipeline writes."""
+    # Handle cases where the first column is the link/cell IDs
+    if "link_id" in df.columns:
+        cells = df["link_id"].astype(str).tolist()
+        matrix = df.drop(columns=["link_id"]).values
+    elif df.columns[0] == "Unnamed: 0":
+        cells = df.iloc[:, 0].astype(str).tolist()
+        matrix = df.iloc[:, 1:].values
+    else:
+        cells = df.columns.astype(str).tolist()
+        matrix = df.values
+    return cells, matrix
+
+
+def build_correlation():
+    cells, matrix = correlation_matrix(load_csv(RESULTS_DIR / "correlation_matrix.csv"))
+    return {"cells": cells, "matrix": matrix.astype(np.float64)}
+
+
+def load_correlation_index():
+    """Sparse/tiled index over correlation_matrix.csv, rebuilt once per version of it."""
+    corr_file = RESULTS_DIR / "correlation_matrix.csv"
+    return _data_cache.get_or_load(
+        f"cidx_{corr_file}", [corr_file],
+        lambda: load_index(corr_file, lambda: correlation_matrix(load_csv(corr_file))),
+        nbytes=0,
+    )
+
+
+def build_correlation_query(index, mode: str, k: int, threshold: Optional[float], limit: int,
+                            level: int, row0: int, row1: Optional[int], col0: int, col1: Optional[int]):
+    if mode == "meta":
+        return {"n": index.n, "cells": index.cells, "order": np.array(index.order),
+                "levels": index.levels, "top_k": index.top_k, "edge_min": index.edge_min}
+    if mode == "topk":
+        idx, val = index.neighbors(k)
+        return {"cells": index.cells, "k": idx.shape[1],
+                "neighbors": idx, "values": np.round(val.astype(np.float64), 6)}
+    if mode == "edges":
+        threshold = index.edge_min if threshold is None else threshold
+        i, j, v, truncated = index.edges(threshold, limit)
+        return {"cells": index.cells, "threshold": threshold, "truncated": truncated,
+                "source": i, "target": j, "value": np.round(v.astype(np.float64), 6)}
+    side = index.levels[level] if level < len(index.levels) else 0
+    row1 = min(row0 + 256, side) if row1 is None else row1
+    col1 = min(col0 + 256, side) if col1 is None else col1
+    tile = index.tile(level, row0, row1, col0, col1)
+    order = index.order
+    return {
+        "level": level, "side": side, "scale": 2 ** level,
+        "row0": row0, "row1": row1, "col0": col0, "col1": col1,
+        # cell labels only at full resolution; coarser levels average 2^level cells per side
+        "rows": [index.cells[c] for c in order[row0:row1].tolist()] if level == 0 else None,
+        "cols": [index.cells[c] for c in order[col0:col1].tolist()] if level == 0 else None,
+        "matrix": np.round(tile.astype(np.float64), 6),
+    }
+
+
+def correlation_view():
+    """(cache key, source files, build) of the dense /api/correlation"""
+    return "correlation", [RESULTS_DIR / "correlation_matrix.csv"], build_correlation
+
+
 @app.get("/api/correlation")
-async def get_correlation():
+async def get_correlation(request: Request,
+                          mode: Literal["dense", "meta", "topk", "edges", "tile"] = "dense",
+                          k: int = Query(10, ge=1),
+                          threshold: Optional[float] = Query(None, le=1.0),
+                          limit: int = Query(100_000, ge=1),
+                          level: int = Query(0, ge=0),
+                          row0: int = Query(0, ge=0), row1: Optional[int] = Query(None, ge=1),
+                          col0: int = Query(0, ge=0), col1: Optional[int] = Query(None, ge=1),
+                          format: Optional[Literal["json", "binary"]] = None,
+                          precision: Literal["float64", "float32"] = "float64"):
+    """
+    Link/cell correlation matrix.
+
+    mode=dense (default) returns the full matrix. For large cell counts the
+    other modes answer from an on-disk index instead of the dense matrix:
+      meta   cell list, cluster (dendrogram) order and tile pyramid sizes
+      topk   the k most correlated neighbours of every cell
+      edges  pairs with correlation >= threshold, strongest first, up to limit
+      tile   a rectangle of the cluster-ordered matrix at a zoom level
+
+    format=binary (or Accept: application/vnd.columnar) sends the arrays in
+    the columnar wire format, as float64 or, with precision=float32, float32.
+    """
     try:
-        df = load_csv(RESULTS_DIR / "correlation_matrix.csv")
-        # Handle cases where the first column is the link/cell IDs
-        if "link_id" in df.columns:
-            cells = df["link_id"].astype(str).tolist()
-            matrix = df.drop(columns=["link_id"]).values.tolist()
-        elif df.columns[0] == "Unnamed: 0":
-            cells = df.iloc[:, 0].astype(str).tolist()
-            matrix = df.iloc[:, 1:].values.tolist()
-        else:
-            cells = df.columns.astype(str).tolist()
-            matrix = df.values.tolist()
-             
-        return fix_json_values({"cells": cells, "matrix": matrix})
+        corr_file = RESULTS_DIR / "correlation_matrix.csv"
+        binary = wants_binary(request.headers.get("accept"), format)
+        if mode == "dense":
+            return await run_in_threadpool(encoded_response, request, *correlation_view(), binary, precision)
+        if not corr_file.exists():
+            raise HTTPException(status_code=404, detail="Correlation matrix file not found")
+
+        index = await run_in_threadpool(load_correlation_index)
+        params = (mode, k, threshold, limit, level, row0, row1, col0, col1)
+        try:
+            return await run_in_threadpool(
+                encoded_response, request, "correlation:" + ":".join(map(str, params)), [corr_file],
+                lambda: build_correlation_query(index, *params), binary, precision)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Correlation API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_correlation_window():
+    state = CorrelationState.load(RESULTS_DIR / CORRELATION_STATE_FILE)
+    df = state.matrix(window=True)
+    return {"cells": df.index.astype(str).tolist(), "matrix": df.values.tolist(), "window_s": state.window_s}
+
+
+@app.get("/api/correlation/window")
+async def get_correlation_window(request: Request):
+    """
+    Correlation over the most recent window of traffic (CORRELATION_WINDOW_S,
+    whole blocks), from the persisted co-moment state.
+    """
+    try:
+        state_file = RESULTS_DIR / CORRELATION_STATE_FILE
+        if not state_file.exists():
+            raise HTTPException(status_code=404, detail="No correlation state; upload a dataset first")
+        return await run_in_threadpool(encoded_response, request, "correlation-window", [state_file],
+                                       build_correlation_window)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Correlation API Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def capacity_summary_view():
+    """(cache key, source files, build) of /api/capacity-summary"""
+    capacity_file = ARTIFACTS_DIR / "link_capacity_summary.csv"
+    return "capacity-summary", [capacity_file], lambda: load_csv_to_json(capacity_file)
+
+
 @app.get("/api/capacity-summary")
-async def get_capacity_summary():
+async def get_capacity_summary(request: Request):
     """
     Returns link capacity summary with recommendations.
     
@@ -253,51 +962,317 @@ async def get_capacity_summary():
         JSON array with capacity metrics for each link
     """
     try:
-        capacity_file = ARTIFACTS_DIR / "link_capacity_summary.csv"
-        if not capacity_file.exists():
+        key, sources, build = capacity_summary_view()
+        if not sources[0].exists():
             raise HTTPException(status_code=404, detail="Capacity summary file not found")
         
-        return load_csv_to_json(capacity_file)
+        return await run_in_threadpool(encoded_response, request, key, sources, build)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading capacity summary: {str(e)}")
 
 
+def build_capacity_timeline(timeseries_file: Path, link_id: Optional[str],
+                            window_s: float, step_s: Optional[float]):
+    index = load_traffic_index(timeseries_file)
+    ids = index.resolve(link_id) if link_id else range(len(index.links))
+    if not ids:
+        raise KeyError(link_id)
+    links = {}
+    for i in ids:
+        times, values = index.link_arrays(i)
+        links[str(index.links[i])] = capacity_timeline(times, values, window_s, step_s)
+    return {"window_s": window_s, "step_s": step_s or window_s, "links": links}
+
+
+@app.get("/api/capacity-timeline")
+async def get_capacity_timeline(request: Request,
+                                link_id: Optional[str] = None,
+                                window_s: float = Query(ANALYSIS_WINDOW_S, gt=0),
+                                step_s: Optional[float] = Query(None, gt=0)):
+    """
+    Required capacity (with buffer) per time window, for one link or all.
+
+    Args:
+        window_s: window length in seconds (default ANALYSIS_WINDOW_S)
+        step_s: window start spacing; defaults to window_s (tumbling
+            windows), smaller values give rolling ones
+
+    Returns:
+        {"window_s", "step_s", "links": {link_id: {"start", "end", "samples",
+        "mean_gbps", "peak_gbps", "capacity_with_buffer_gbps", "bisection_steps"}}};
+        windows without samples have null capacities
+    """
+    try:
+        timeseries_file = ARTIFACTS_DIR / "link_traffic_timeseries.csv"
+        if not timeseries_file.exists():
+            raise HTTPException(status_code=404, detail="Traffic timeseries file not found")
+
+        key = f"capacity-timeline:{link_id}:{window_s!r}:{step_s!r}"
+        return await run_in_threadpool(
+            encoded_response, request, key, [timeseries_file],
+            lambda: build_capacity_timeline(timeseries_file, link_id, window_s, step_s))
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No traffic for link {link_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Capacity Timeline API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def build_capacity_curves(timeseries_file: Path, link_id: Optional[str],
+                          buffers_s: List[float], loss_fracs: List[float], tol: float):
+    index = load_traffic_index(timeseries_file)
+    ids = index.resolve(link_id) if link_id else range(len(index.links))
+    if not ids:
+        raise KeyError(link_id)
+    values = {str(index.links[i]): index.link_arrays(i)[1] for i in ids}
+    return capacity_curves(values, buffers_s, loss_fracs, tol)
+
+
+@app.get("/api/capacity-curve")
+async def get_capacity_curve(request: Request,
+                             link_id: Optional[str] = None,
+                             buffer_ms: Optional[List[float]] = Query(None),
+                             loss: Optional[List[float]] = Query(None),
+                             tol: float = Query(1e-6, ge=1e-9, le=1.0)):
+    """
+    Required capacity against buffer depth and loss target, per link.
+
+    Args:
+        buffer_ms: buffer depths in milliseconds, repeatable
+            (default 1, 2, 5, 10, 20, 50, 100, 200)
+        loss: allowed loss fractions, repeatable (default 1e-4, 1e-3, 1e-2)
+        tol: capacity precision in Gbps; coarser is faster
+
+    Returns:
+        {"buffer_s", "loss_frac", "tol", "links": {link_id: {"mean_gbps", "peak_gbps",
+        "capacity_with_buffer_gbps": [[per loss] per buffer], "evaluations"}}}
+    """
+    try:
+        timeseries_file = ARTIFACTS_DIR / "link_traffic_timeseries.csv"
+        if not timeseries_file.exists():
+            raise HTTPException(status_code=404, detail="Traffic timeseries file not found")
+
+        buffers_s = [b / 1000.0 for b in buffer_ms] if buffer_ms else list(CURVE_BUFFERS_S)
+        loss_fracs = loss or list(CURVE_LOSS_FRACS)
+        key = f"capacity-curve:{link_id}:{sorted(set(buffers_s))}:{sorted(set(loss_fracs))}:{tol!r}"
+        return await run_in_threadpool(
+            encoded_response, request, key, [timeseries_file],
+            lambda: build_capacity_curves(timeseries_file, link_id, buffers_s, loss_fracs, tol))
+    except HTTPException:
+        raise
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No traffic for link {link_id}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Capacity Curve API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def load_loss_events(filepath: Path):
+    """Loss-event results (and bitsets), loaded once per version of the file"""
+    return _data_cache.get_or_load(f"loss_{filepath}", [filepath], lambda: load_loss_results(filepath))
+
+
+def build_loss_events(loss_file: Path, cell: Optional[str], other: Optional[str],
+                      k: int, limit: int, min_cells: int):
+    data = load_loss_events(loss_file)
+    events = data["events"]
+    names = data["cells"].astype(str)
+
+    def position(cell_id):
+        hit = np.flatnonzero(names == cell_id)
+        if len(hit) == 0:
+            raise KeyError(cell_id)
+        return int(hit[0])
+
+    out = {"n_cells": len(names), "n_slots": int(data["n_slots"]), "window": int(data["window"]),
+           "events": int(events.counts.sum())}
+
+    # strongest pairs, each once, from the per-cell top-k lists (which are
+    # not symmetric: a pair may be in only one of its two cells' lists)
+    nb, shared, jac = data["neighbours"], data["shared"], data["jaccard"]
+    rows = np.repeat(np.arange(len(names)), nb.shape[1])
+    cols, s, j = nb.ravel(), shared.ravel(), jac.ravel()
+    keep = (rows != cols) & (s > 0)
+    a, b = np.minimum(rows, cols)[keep], np.maximum(rows, cols)[keep]
+    _, first = np.unique(a.astype(np.int64) * len(names) + b, return_index=True)
+    a, b, s, j = a[first], b[first], s[keep][first], j[keep][first]
+    top = np.lexsort((-s, -j))[:limit]
+    out["pairs"] = {"a": names[a[top]], "b": names[b[top]], "shared": s[top], "jaccard": j[top]}
+
+    # the `limit` most widespread synchronized windows, in time order
+    slot, n = data["sync_slot"], data["sync_cells"]
+    keep = np.flatnonzero(n >= min_cells)
+    keep = np.sort(keep[np.argsort(-n[keep], kind="stable")[:limit]])
+    out["synchronized"] = {"slot": slot[keep], "cells": n[keep], "total": int((n >= min_cells).sum())}
+
+    if cell is not None:
+        i = position(cell)
+        row = slice(0, min(k, nb.shape[1]))
+        hit = shared[i, row] > 0
+        out["cell"] = {"cell_id": cell, "events": int(events.counts[i]),
+                       "neighbours": {"cell_id": names[nb[i, row][hit]], "shared": shared[i, row][hit],
+                                      "jaccard": jac[i, row][hit]}}
+        if other is not None:
+            o = position(other)
+            co = events.pair(i, o)
+            union = int(events.counts[i] + events.counts[o]) - co
+            out["pair"] = {"a": cell, "b": other, "shared": co, "jaccard": co / union if union else 0.0}
+    return out
+
+
+@app.get("/api/loss-events")
+async def get_loss_events(request: Request,
+                          cell: Optional[str] = None,
+                          other: Optional[str] = None,
+                          k: int = Query(10, ge=1, le=TOP_K),
+                          limit: int = Query(100, ge=1, le=10_000),
+                          min_cells: int = Query(2, ge=2)):
+    """
+    Synchronized loss between cells, from the last POST /api/loss-events.
+
+    Args:
+        cell: also list this cell's strongest partners (up to k)
+        other: with cell, the exact shared-event count of that one pair
+        limit: strongest pairs and synchronized windows returned
+        min_cells: smallest number of cells losing at once to report
+
+    Returns:
+        {"n_cells", "n_slots", "window", "events",
+         "pairs": {"a", "b", "shared", "jaccard"} (best Jaccard first),
+         "synchronized": {"slot", "cells", "total"} (time order),
+         "cell": {...}, "pair": {...}}
+    """
+    try:
+        loss_file = RESULTS_DIR / LOSS_EVENTS_FILE
+        if not loss_file.exists():
+            raise HTTPException(status_code=404, detail="No loss events: POST a cell CSV to /api/loss-events")
+
+        key = f"loss-events:{cell}:{other}:{k}:{limit}:{min_cells}"
+        return await run_in_threadpool(
+            encoded_response, request, key, [loss_file],
+            lambda: build_loss_events(loss_file, cell, other, k, limit, min_cells))
+    except HTTPException:
+        raise
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"No loss events for cell {e.args[0]}")
+    except Exception as e:
+        print(f"Loss Events API Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.get("/api/link-traffic")
-async def get_link_traffic(link_id: str = None):
+async def get_link_traffic(request: Request,
+                           link_id: str = None,
+                           start: Optional[float] = None,
+                           end: Optional[float] = None,
+                           max_points: Optional[int] = Query(None, ge=2),
+                           format: Optional[Literal["json", "binary"]] = None,
+                           precision: Literal["float64", "float32"] = "float64"):
     """
     Returns time-series traffic data for a specific link or all links.
+
+    Args:
+        start, end: optional time range in seconds (inclusive)
+        max_points: optional per-link point budget; each time bucket keeps
+            its min and max sample so bursts stay visible
+        format: "binary" (or Accept: application/vnd.columnar) returns one
+            column per field in the columnar wire format; JSON by default
+        precision: float width of binary columns
     """
     try:
         timeseries_file = ARTIFACTS_DIR / "link_traffic_timeseries.csv"
         if not timeseries_file.exists():
             raise HTTPException(status_code=404, detail="Traffic timeseries file not found")
         
-        df = load_csv(timeseries_file)
-        
         if link_id:
-            link_data = df[df['link_id'] == link_id]
-            if link_data.empty:
-                # Fallback: maybe it's mixed case or has different name
-                link_data = df[df['link_id'].astype(str).str.contains(link_id, case=False)]
-            
-            return link_data.to_dict(orient='records')
-        
-        return df.to_dict(orient='records')
+            # exact name, then case-insensitive alias, then substring match
+            link_data = load_traffic_index(timeseries_file).lookup(link_id, start, end, max_points)
+        else:
+            link_data = window_traffic(load_csv(timeseries_file), start, end, max_points)
+
+        if wants_binary(request.headers.get("accept"), format):
+            return Response(encode_payload(link_data, precision), media_type=MEDIA_TYPE,
+                            headers={"Vary": "Accept"})
+        return link_data.to_dict(orient='records')
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Traffic API Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Cache lifetime of served images; after it, clients revalidate with the ETag
+IMAGE_MAX_AGE_S = 86400
+_image_variants = {}
+
+
+def _variants() -> ImageVariants:
+    """Variant cache under the current artifacts directory"""
+    directory = ARTIFACTS_DIR / "image_variants"
+    variants = _image_variants.get(directory)
+    if variants is None:
+        variants = _image_variants[directory] = ImageVariants(directory)
+    return variants
+
+
+def _byte_range(range_header: Optional[str], size: int):
+    """
+    (start, end) inclusive of a single "bytes=" range, or None to send the
+    whole file (no header, several ranges or another unit). Raises
+    ValueError when the range lies past the end of the file.
+    """
+    unit, _, spec = (range_header or "").partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        elif last:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise ValueError(f"Range {range_header} outside {size} bytes")
+    return start, min(end, size - 1)
+
+
+def _read_range(path: Path, start: int, end: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start + 1)
+
+
 @app.get("/api/images/{filename}")
-async def get_image(filename: str):
+async def get_image(request: Request, filename: str,
+                    width: Optional[int] = Query(None, ge=16),
+                    format: Literal["auto", "png", "webp", "avif"] = "auto"):
     """
     Serves image files from the results directory.
     
     Args:
         filename: Name of the image file (e.g., '08_network_topology_graph.png')
+        width: resize to about this many pixels wide (rounded up to a
+            multiple of 64, never wider than the original)
+        format: output format; "auto" picks AVIF or WebP when the Accept
+            header allows it, else PNG
     
     Returns:
-        Image file
+        Image file. Variants are rendered once per version of the source
+        and cached on disk; responses carry an ETag (304 on a match) and
+        honour single byte ranges.
     """
     try:
         # Security: Only allow PNG files
@@ -311,14 +1286,144 @@ async def get_image(filename: str):
             image_path = ARTIFACTS_DIR / filename
             if not image_path.exists():
                 raise HTTPException(status_code=404, detail="Image not found")
-        
-        return FileResponse(image_path)
+
+        fmt = negotiate(request.headers.get("accept"), format)
+        path, tag = await run_in_threadpool(_variants().get, image_path, width, fmt)
+        media_type = MEDIA_TYPES[path.suffix.lstrip(".")]
+        etag = f'"{tag}"'
+        headers = {"ETag": etag, "Accept-Ranges": "bytes",
+                   "Cache-Control": f"public, max-age={IMAGE_MAX_AGE_S}"}
+        if format == "auto":
+            headers["Vary"] = "Accept"
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        size = path.stat().st_size
+        if_range = request.headers.get("if-range")
+        try:
+            span = _byte_range(request.headers.get("range"), size) if if_range in (None, etag) else None
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if span is None:
+            return FileResponse(path, media_type=media_type, headers=headers)
+        start, end = span
+        body = await run_in_threadpool(_read_range, path, start, end)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return Response(body, status_code=206, media_type=media_type, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error serving image: {str(e)}")
 
 
+LIVE_KEEPALIVE_S = 15.0
+
+
+def ingest_live(body: bytes, content_type: str) -> int:
+    """
+    Append one batch of samples to the live buffers. The body holds
+    time_seconds / link_id / aggregated_gbps columns as JSON arrays, CSV
+    or the columnar wire format.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type == MEDIA_TYPE:
+        columns, _ = decode_columns(body)
+    elif content_type == "text/csv":
+        columns = pd.read_csv(io.BytesIO(body))
+    else:
+        columns = json.loads(body)
+    if not isinstance(columns, (dict, pd.DataFrame)) or not REQUIRED_COLUMNS.issubset(columns.keys()):
+        raise ValueError(f"Body must contain columns: {REQUIRED_COLUMNS}")
+    return _live.ingest(columns["time_seconds"], columns["link_id"], columns["aggregated_gbps"])
+
+
+@app.post("/api/live/ingest")
+async def live_ingest(request: Request):
+    """
+    Appends a batch of live samples (JSON columns, text/csv or
+    application/vnd.columnar) to the per-link ring buffers. Subscribers
+    see the change on the next push tick.
+    """
+    try:
+        accepted = ingest_live(await request.body(), request.headers.get("content-type"))
+        return {"accepted": accepted, "links": len(_live), "samples": _live.samples}
+    except (ValueError, KeyError, TypeError, pd.errors.ParserError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid live batch: {e}")
+    except Exception as e:
+        print(f"Live Ingest Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/live/snapshot")
+async def live_snapshot():
+    """Rolling mean / peak / p95 over the live window of every link"""
+    return {"window": _live.window, "samples": _live.samples, "links": _live.snapshot()}
+
+
+async def _sse_live(request: Request):
+    queue = _live_hub.subscribe()
+    try:
+        while not await request.is_disconnected():
+            try:
+                message = await asyncio.wait_for(queue.get(), LIVE_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield _sse(message["type"], **message)
+    finally:
+        _live_hub.unsubscribe(queue)
+
+
+@app.get("/api/live/stream")
+async def live_stream(request: Request):
+    """
+    Server-sent events: a `snapshot` of every link first, then a `delta`
+    with the links that changed (stats plus newest points) per push tick.
+    """
+    return StreamingResponse(_sse_live(request), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/api/live/ws")
+async def live_socket(websocket: WebSocket):
+    """
+    The same snapshot / delta messages as /api/live/stream, as JSON text
+    frames. Frames sent by the client are ingested: columnar binary
+    frames or JSON column text frames, each acknowledged with
+    {"type": "ack", "accepted": n}.
+    """
+    await websocket.accept()
+    queue = _live_hub.subscribe()
+
+    async def push():
+        while True:
+            await websocket.send_text(json.dumps(await queue.get()))
+
+    async def receive():
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                if message.get("bytes") is not None:
+                    accepted = ingest_live(message["bytes"], MEDIA_TYPE)
+                else:
+                    accepted = ingest_live(message["text"].encode(), "application/json")
+                await websocket.send_text(json.dumps({"type": "ack", "accepted": accepted}))
+            except (ValueError, KeyError, TypeError) as e:
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(e)}))
+
+    tasks = [asyncio.ensure_future(push()), asyncio.ensure_future(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # a send to a closed socket ends push() with WebSocketDisconnect
+        await asyncio.gather(*tasks, return_exceptions=True)
+        _live_hub.unsubscribe(queue)
+
+
 class ChatMessage(BaseModel):
     role: str
     content: str
@@ -327,56 +1432,76 @@ class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     model: str = "llama3"
     context_data: Optional[dict] = None
+    stream: bool = False
+
+
+SYSTEM_PROMPT = (
+    "You are an expert Network Operations Center (NOC) AI assistant for Nokia. "
+    "Your goal is to help engineers optimize fronthaul networks. "
+    "Keep answers concise, technical, and actionable. "
+)
+
+
+def chat_messages(request: ChatRequest) -> list:
+    """System prompt with the compacted context, then the trimmed conversation."""
+    system_prompt = SYSTEM_PROMPT
+    if request.context_data:
+        system_prompt += f"\n\nCURRENT SYSTEM CONTEXT (JSON):\n{compact_context(request.context_data)}"
+    history = compact_history([{"role": m.role, "content": m.content} for m in request.messages])
+    return [{"role": "system", "content": system_prompt}] + history
+
+
+def _sse(event: str = None, **data) -> bytes:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+async def _sse_tokens(stream):
+    try:
+        async for token in stream:
+            yield _sse(content=token)
+        yield _sse("done")
+    except Exception as e:
+        print(f"Ollama Stream Error: {e}")
+        yield _sse("error", detail=str(e))
+
 
 @app.post("/api/chat")
 async def chat_with_ai(request: ChatRequest):
     """
     Chat endpoint that forwards context-aware prompts to a local Ollama instance.
-    """
-    try:
-        # Construct system prompt with context
-        system_prompt = (
-            "You are an expert Network Operations Center (NOC) AI assistant for Nokia. "
-            "Your goal is to help engineers optimize fronthaul networks. "
-            "Keep answers concise, technical, and actionable. "
-        )
-        
-        if request.context_data:
-            system_prompt += f"\n\nCURRENT SYSTEM CONTEXT:\n{json.dumps(request.context_data, indent=2)}"
 
-        # Prepare messages for Ollama
-        ollama_messages = [{"role": "system", "content": system_prompt}]
-        for msg in request.messages:
-            ollama_messages.append({"role": msg.role, "content": msg.content})
+    With "stream": true the reply comes back as server-sent events as the
+    model generates it: `data: {"content": ...}` per token, then
+    `event: done` (or `event: error` if generation fails midway).
+    """
+    import httpx    # with the Ollama client, on first use
 
-        # Call Ollama API
+    try:
+        ollama_messages = chat_messages(request)
         print(f"Sending request to Ollama with model: {request.model}")
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    "http://localhost:11434/api/chat",
-                    json={
-                        "model": request.model,
-                        "messages": ollama_messages,
-                        "stream": False
-                    },
-                    timeout=60.0 
+        try:
+            if request.stream:
+                stream = await _ollama.open_stream(request.model, ollama_messages)
+                return StreamingResponse(
+                    _sse_tokens(stream), media_type="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                    background=BackgroundTask(stream.aclose),
                 )
-                print(f"Ollama Response Status: {response.status_code}")
-                response.raise_for_status()
-                result = response.json()
-                
-                return {
-                    "role": "assistant",
-                    "content": result.get("message", {}).get("content", "Error: No response from model.")
-                }
-            except httpx.ConnectError as e:
-                print(f"Ollama Connection Error: {e}")
-                raise HTTPException(status_code=503, detail=f"Could not connect to Ollama. Error: {str(e)}")
-            except Exception as e:
-                print(f"Ollama General Error: {e}")
-                raise HTTPException(status_code=500, detail=f"Ollama Error: {str(e)}")
-            
+            content = await _ollama.chat(request.model, ollama_messages)
+            return {
+                "role": "assistant",
+                "content": content or "Error: No response from model."
+            }
+        except httpx.ConnectError as e:
+            print(f"Ollama Connection Error: {e}")
+            raise HTTPException(status_code=503, detail=f"Could not connect to Ollama. Error: {str(e)}")
+        except OllamaBusy as e:
+            raise HTTPException(status_code=503, detail=f"Ollama is busy, try again shortly ({e})")
+        except Exception as e:
+            print(f"Ollama General Error: {e}")
+            raise HTTPException(status_code=500, detail=f"Ollama Error: {str(e)}")
+
     except HTTPException:
         raise
     except Exception as e:
@@ -384,6 +1509,48 @@ async def chat_with_ai(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _warm_view(view):
+    """Warm-up step that encodes an endpoint's default response, if its data exists"""
+    def step():
+        key, sources, build = view()
+        if not all(path.exists() for path in sources):
+            return False
+        encoded_body(key, sources, build)
+    return step
+
+
+def _warm_load(path_of, load):
+    def step():
+        path = path_of()
+        if not path.exists():
+            return False
+        load(path)
+    return step
+
+
+def warm_up_steps():
+    """What the lifespan warm-up loads, in order: the dashboard's first views first"""
+    return [
+        ("topology", _warm_view(topology_view)),
+        ("capacity-summary", _warm_view(capacity_summary_view)),
+        ("correlation", _warm_view(correlation_view)),
+        ("link-traffic", _warm_load(lambda: ARTIFACTS_DIR / "link_traffic_timeseries.csv", load_traffic_index)),
+        ("correlation-index", _warm_load(lambda: RESULTS_DIR / "correlation_matrix.csv",
+                                         lambda path: load_correlation_index())),
+        ("loss-events", _warm_load(lambda: RESULTS_DIR / LOSS_EVENTS_FILE, load_loss_events)),
+        ("snapshots", _snapshots),
+    ]
+
+
+# Started by the lifespan; /ready answers 200 once it is done
+_warmup = WarmUp(warm_up_steps(), started=_import_started)
+_metrics.callback("app_ready", "1 once the start-up warm-up has finished", lambda: int(_warmup.ready))
+_metrics.callback("app_time_to_ready_seconds", "Seconds from app import to warm caches (0 until ready)",
+                  lambda: _warmup.time_to_ready or 0)
+_import_seconds = time.perf_counter() - _import_started
+_metrics.callback("app_import_seconds", "Seconds main.py took to import", lambda: _import_seconds)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
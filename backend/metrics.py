@@ -0,0 +1,308 @@
+"""
+Prometheus-style metrics, kept in process and served at /metrics.
+
+Counters and fixed-bucket histograms are plain Python objects updated
+under a per-metric lock: an observation is a bisect and a few additions,
+cheap enough to leave on for every request. Values that already live
+elsewhere (cache counters, profiler state) are read by callback at scrape
+time, so they cost nothing in between. render() writes the text
+exposition format, version 0.0.4.
+
+SamplingProfiler is the deeper, opt-in view: a daemon thread that samples
+every thread's Python stack at a fixed interval while it is switched on,
+and aggregates the stacks in folded ("a;b;c count") form.
+"""
+import bisect
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds; request latencies and pipeline stages
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if len(labels) != len(self.labels) or not all(n in labels for n in self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(labels[n] for n in self.labels)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set, with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}                       # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self, **labels) -> dict:
+        """Count and sum for one label set (zeros if never observed)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return {"count": series[-1], "sum": series[-2]} if series else {"count": 0, "sum": 0.0}
+
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = self._header()
+        for key, series in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), series):
+                running += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {running}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+class Callback(_Metric):
+    """A gauge or counter whose value is read from `fn()` at scrape time."""
+
+    def __init__(self, name: str, help: str, fn, kind: str = "gauge"):
+        super().__init__(name, help)
+        self.kind = kind
+        self.fn = fn
+
+    def render(self) -> list:
+        return self._header() + [f"{self.name} {_format_value(self.fn())}"]
+
+
+class MetricsRegistry:
+    """Named metrics, rendered together in registration order."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels=()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, fn, kind: str = "gauge") -> Callback:
+        return self._add(Callback(name, help, fn, kind))
+
+    def get(self, name: str):
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:              # one broken callback must not hide the rest
+                print(f"Metrics Error ({metric.name}): {e}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into `seconds` (labelled by
+    method and route template, so /api/jobs/{job_id} is one series) and
+    counting responses into `requests` (method, route, status). Streaming
+    responses are timed until their last body chunk is sent.
+    """
+
+    UNMATCHED = "<unmatched>"
+
+    def __init__(self, app, seconds: Histogram, requests: Counter):
+        self.app = app
+        self.seconds = seconds
+        self.requests = requests
+        self._routes = None                     # endpoint -> path template
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return self.UNMATCHED
+        if self._routes is None or endpoint not in self._routes:
+            self._routes = {getattr(r, "endpoint", None): r.path for r in scope["app"].routes}
+        return self._routes.get(endpoint, self.UNMATCHED)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route(scope)
+            self.seconds.observe(time.perf_counter() - t0, method=scope["method"], route=route)
+            self.requests.inc(method=scope["method"], route=route, status=str(status[0]))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running server. While started, a daemon
+    thread records each other thread's stack every `interval_s`; stacks
+    are folded root-first and counted. Distinct stacks are capped at
+    `max_stacks` (further new ones count under "<other>").
+    """
+
+    def __init__(self, interval_s: float = 0.01, max_depth: int = 64, max_stacks: int = 10_000):
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.samples = 0
+        self.started_at = None
+        self._stacks = _Tally()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval_s: float = None) -> None:
+        if interval_s is not None:
+            self.interval_s = interval_s
+        if self.running:
+            return
+        self._stop.clear()
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            folded = []
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    names.append(_frame_name(frame))
+                    frame = frame.f_back
+                folded.append(";".join(reversed(names)))
+            del frames
+            with self._lock:
+                self.samples += 1
+                for stack in folded:
+                    if stack in self._stacks or len(self._stacks) < self.max_stacks:
+                        self._stacks[stack] += 1
+                    else:
+                        self._stacks["<other>"] += 1
+
+    def folded(self) -> str:
+        """All stacks as "frame;frame;frame count" lines, for flame graph tools."""
+        with self._lock:
+            return "".join(f"{stack} {n}\n" for stack, n in self._stacks.most_common())
+
+    def snapshot(self, limit: int = 20) -> dict:
+        with self._lock:
+            top = self._stacks.most_common(limit)
+            samples = self.samples
+        return {
+            "running": self.running,
+            "interval_s": self.interval_s,
+            "samples": samples,
+            "started_at": self.started_at,
+            "top": [{"stack": stack, "count": n} for stack, n in top],
+        }
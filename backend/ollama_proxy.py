@@ -0,0 +1,263 @@
+"""
+Pooled, streaming client for the local Ollama server behind /api/chat.
+
+One httpx.AsyncClient lives as long as the app, so chat requests reuse
+keep-alive connections instead of opening a new one each time. httpx is
+imported with that client, on the first chat, not at app start. A
+semaphore bounds how many generations run at once; a caller that waits
+longer than QUEUE_TIMEOUT_S for a slot gets OllamaBusy.
+
+The dashboard context is compacted before it goes into the system prompt:
+minified with sorted keys, repeated list items dropped, clipped and, as a
+last resort, cut down by whole entries to a character budget, so it is
+always valid JSON. It is still sent with every turn (the client keeps no
+server-side conversation), but the same context gives the same bytes each
+time, so Ollama can reuse its cached prompt prefix.
+"""
+import asyncio
+import json
+import os
+import time
+
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MAX_CONCURRENT = int(os.environ.get("OLLAMA_MAX_CONCURRENT", "2"))
+QUEUE_TIMEOUT_S = 30.0
+CONTEXT_BUDGET = 2000       # characters of context JSON in the system prompt
+HISTORY_BUDGET = 8000       # characters of conversation kept, newest first
+# (max list items, max string length) tried in turn until the context fits
+_CLIP_STEPS = ((50, 500), (20, 200), (10, 100), (5, 60), (2, 40), (1, 20))
+# Context that is not a JSON object or array and does not fit the budget
+_TRUNCATED = '{"truncated":true}'
+
+
+class OllamaBusy(Exception):
+    """No generation slot became free in time."""
+
+
+class OllamaError(Exception):
+    """Ollama answered with an error."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"{status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _dedupe(obj):
+    """Drop repeated items from lists, recursively (first occurrence wins)."""
+    if isinstance(obj, dict):
+        return {k: _dedupe(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        seen, out = set(), []
+        for item in map(_dedupe, obj):
+            key = json.dumps(item, sort_keys=True, default=str)
+            if key not in seen:
+                seen.add(key)
+                out.append(item)
+        return out
+    return obj
+
+
+def _clip(obj, max_items: int, max_chars: int):
+    if isinstance(obj, dict):
+        return {k: _clip(v, max_items, max_chars) for k, v in obj.items()}
+    if isinstance(obj, list):
+        out = [_clip(x, max_items, max_chars) for x in obj[:max_items]]
+        if len(obj) > max_items:
+            out.append(f"... {len(obj) - max_items} more")
+        return out
+    if isinstance(obj, str) and len(obj) > max_chars:
+        return obj[:max_chars] + "..."
+    if isinstance(obj, float):
+        return round(obj, 3)
+    return obj
+
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _fit(obj, budget: int):
+    """
+    `obj` with whole dict entries or list items dropped, largest first,
+    until its JSON is at most `budget` characters. The largest entry that
+    still has some room is cut down the same way. None if nothing fits.
+    """
+    if isinstance(obj, dict):
+        # cost of `"key":value,` and the part of it that is not the value
+        members = [(k, v, len(_dumps({k: v})) - 1) for k, v in obj.items()]
+    elif isinstance(obj, list):
+        members = [(i, v, len(_dumps(v)) + 1) for i, v in enumerate(obj)]
+    else:
+        return obj if len(_dumps(obj)) <= budget else None
+    if budget < 2:
+        return None
+
+    room = budget - 1                            # brackets, less the last comma
+    kept = {}
+    for i in sorted(range(len(members)), key=lambda i: members[i][2]):
+        key, value, cost = members[i]
+        if cost <= room:
+            kept[i] = value
+            room -= cost
+            continue
+        part = _fit(value, room - (cost - len(_dumps(value))))
+        if part is not None:
+            kept[i] = part
+        break
+
+    if isinstance(obj, dict):
+        return {members[i][0]: v for i, v in sorted(kept.items())}
+    return [v for _, v in sorted(kept.items())]
+
+
+def compact_context(context, budget: int = CONTEXT_BUDGET) -> str:
+    """Minified, deduplicated context JSON of at most `budget` characters."""
+    context = _dedupe(context)
+    for max_items, max_chars in _CLIP_STEPS:
+        clipped = _clip(context, max_items, max_chars)
+        text = _dumps(clipped)
+        if len(text) <= budget:
+            return text
+    fitted = _fit(clipped, budget)
+    return _TRUNCATED if fitted is None else _dumps(fitted)
+
+
+def compact_history(messages, budget: int = HISTORY_BUDGET) -> list:
+    """
+    Conversation to send upstream: client-side system messages and exact
+    repeats of the previous message (resends) are dropped, then the oldest
+    turns go until the rest fits `budget`. The latest message always stays.
+    """
+    kept = []
+    for msg in messages:
+        if msg["role"] == "system" or (kept and kept[-1] == msg):
+            continue
+        kept.append(msg)
+
+    out, used = [], 0
+    for msg in reversed(kept):
+        used += len(msg["content"])
+        if out and used > budget:
+            break
+        out.append(msg)
+    return out[::-1]
+
+
+class _Stream:
+    """
+    Tokens of one streaming generation. Holds a concurrency slot until the
+    upstream response is exhausted or aclose() is called (idempotent).
+    `done`, if given, is called once on close.
+    """
+
+    def __init__(self, response: "httpx.Response", release, done=None):
+        self._response = response
+        self._release = release
+        self._done = done
+
+    async def __aiter__(self):
+        try:
+            async for line in self._response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise OllamaError(502, chunk["error"])
+                content = chunk.get("message", {}).get("content", "")
+                if content:
+                    yield content
+                # read on past "done" to the end of the body, or the
+                # connection cannot go back to the pool
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._release is not None:
+            release, self._release = self._release, None
+            await self._response.aclose()
+            release()
+            if self._done is not None:
+                self._done()
+
+
+class OllamaClient:
+    """
+    App-lifetime connection pool to one Ollama server.
+
+    `observe`, if given, is called as observe(phase, seconds) with upstream
+    latencies: "chat" for a whole non-streamed reply, "first_byte" until a
+    stream's response headers and "stream" until a stream is closed. Time
+    spent queueing for a slot is not included.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_URL, max_concurrent: int = OLLAMA_MAX_CONCURRENT,
+                 timeout: float = 60.0, queue_timeout: float = QUEUE_TIMEOUT_S, observe=None):
+        self.base_url = base_url
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._client = None
+        self.observe = observe
+
+    def _observe(self, phase: str, t0: float) -> None:
+        if self.observe is not None:
+            self.observe(phase, time.perf_counter() - t0)
+
+    def _http(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+            limits = httpx.Limits(max_connections=self.max_concurrent,
+                                  max_keepalive_connections=self.max_concurrent)
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=limits,
+                                             timeout=httpx.Timeout(self.timeout, connect=5.0))
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _acquire(self) -> None:
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise OllamaBusy(f"all {self.max_concurrent} Ollama slots busy") from None
+
+    async def chat(self, model: str, messages: list) -> str:
+        """Whole reply in one piece."""
+        await self._acquire()
+        t0 = time.perf_counter()
+        try:
+            response = await self._http().post(
+                "/api/chat", json={"model": model, "messages": messages, "stream": False})
+            self._observe("chat", t0)
+            if response.status_code != 200:
+                raise OllamaError(response.status_code, response.text[:200])
+            return response.json().get("message", {}).get("content", "")
+        finally:
+            self._slots.release()
+
+    async def open_stream(self, model: str, messages: list) -> _Stream:
+        """
+        Start a streaming generation. Connection and HTTP errors are raised
+        here, before any token has been sent on to the client.
+        """
+        await self._acquire()
+        t0 = time.perf_counter()
+        try:
+            http = self._http()
+            request = http.build_request(
+                "POST", "/api/chat", json={"model": model, "messages": messages, "stream": True})
+            response = await http.send(request, stream=True)
+            self._observe("first_byte", t0)
+        except BaseException:
+            self._slots.release()
+            raise
+        if response.status_code != 200:
+            detail = (await response.aread()).decode("utf-8", "replace")[:200]
+            await response.aclose()
+            self._slots.release()
+            raise OllamaError(response.status_code, detail)
+        return _Stream(response, self._slots.release, lambda: self._observe("stream", t0))
@@ -0,0 +1,72 @@
+"""
+Checks budget accounting, LRU eviction and file-change invalidation of the data cache.
+Run from the project root: python -m pytest backend
+"""
+import os
+
+import numpy as np
+
+from data_cache import DataCache, estimate_bytes
+
+
+def test_lru_eviction_within_budget():
+    """Least recently used entries go first and the budget is never exceeded"""
+    cache = DataCache(max_bytes=3000)
+    for key in "abc":
+        cache.put(key, np.zeros(100))                       # 800 bytes each
+    assert cache.get("a") is not None                       # a is now most recent
+    cache.put("d", np.zeros(100))
+
+    assert "b" not in cache and {"a", "c", "d"} <= set(cache._entries)
+    assert cache.nbytes <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+    cache.put("huge", np.zeros(1000))                       # larger than the whole budget
+    assert "huge" not in cache and len(cache) == 3
+
+
+def test_invalidates_on_file_change(tmp_path):
+    """Rewritten files reload; touched-but-identical ones stay cached"""
+    path = tmp_path / "data.json"
+    path.write_text("1")
+    cache = DataCache(max_bytes=1 << 20)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return path.read_text()
+
+    assert cache.get_or_load("k", [path], load) == "1"
+    assert cache.get_or_load("k", [path], load) == "1"
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert cache.get_or_load("k", [path], load) == "1"
+    assert len(loads) == 1
+
+    path.write_text("22")
+    assert cache.get_or_load("k", [path], load) == "22"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["invalidations"]) == (2, 2, 1)
+
+
+def test_file_rewritten_mid_load_is_not_pinned(tmp_path):
+    """A value loaded from bytes that changed meanwhile is served once, not cached"""
+    path = tmp_path / "data.json"
+    path.write_text("old")
+    cache = DataCache(max_bytes=1 << 20)
+
+    def load_then_rewrite():
+        value = path.read_text()
+        path.write_text("new!")
+        return value
+
+    assert cache.get_or_load("k", [path], load_then_rewrite) == "old"
+    assert "k" not in cache
+    assert cache.get_or_load("k", [path], path.read_text) == "new!"
+
+
+def test_memory_mapped_arrays_are_free(tmp_path):
+    """Mapped pages are the OS's to drop, so they do not count against the budget"""
+    arr = np.lib.format.open_memmap(tmp_path / "a.npy", mode="w+", dtype=np.float64, shape=(10_000,))
+    assert estimate_bytes(arr.view(np.ndarray)[10:]) == 0
+    assert estimate_bytes(np.zeros(10_000)) == 80_000
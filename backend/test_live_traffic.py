@@ -0,0 +1,120 @@
+"""
+Ring buffers, rolling stats and push endpoints for live traffic.
+Run from the project root: python -m pytest backend
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+import main
+from test_main import request
+from live_traffic import LiveHub, LiveTraffic
+from wire_format import MEDIA_TYPE, encode_columns
+
+
+def test_rolling_stats_match_the_window():
+    live = LiveTraffic(window=50)
+    rng = np.random.default_rng(1)
+    seen = {}
+    for batch in range(40):
+        n = int(rng.integers(1, 130))           # some batches wrap, some overflow the window
+        links = rng.choice(["A", "B", "C"], n)
+        values = rng.gamma(2.0, 1.0, n)
+        values[rng.random(n) < 0.05] = np.nan
+        live.ingest(np.arange(n) + 1000.0 * batch, links, values)
+        for link, v in zip(links, values):
+            if not np.isnan(v):
+                seen.setdefault(link, []).append(v)
+
+        delta = live.take_delta()
+        snapshot = live.snapshot()
+        for link, history in seen.items():
+            window = np.array(history[-50:])
+            assert np.allclose(live.window_values(link), window)
+            stats = snapshot[link]
+            assert stats["n"] == len(window) and stats["total"] == len(history)
+            assert np.isclose(stats["mean"], window.mean())
+            assert stats["peak"] == window.max()
+            assert np.isclose(stats["p95"], np.percentile(window, 95))
+        for link, stats in delta.items():
+            assert stats["points"][1] == live.window_values(link)[-len(stats["points"][1]):].tolist()
+    assert not live.changed and live.take_delta() == {}
+
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    async def go():
+        live = LiveTraffic(window=8)
+        hub = LiveHub(live, interval_s=3600, depth=2)
+        queue = hub.subscribe()
+        assert (await queue.get())["type"] == "snapshot"
+        for i in range(4):
+            live.ingest([i], ["A"], [float(i)])
+            hub.publish()
+        messages = [queue.get_nowait() for _ in range(queue.qsize())]
+        await hub.aclose()
+        return messages
+
+    messages = asyncio.run(go())
+    # deltas 1 and 2 filled the queue, so delta 3 became a snapshot; delta 4 follows it
+    assert [m["type"] for m in messages] == ["snapshot", "delta"]
+    assert messages[0]["links"]["A"]["total"] == 3 and messages[1]["links"]["A"]["last"] == 3.0
+
+
+@pytest.fixture
+def live_app():
+    main._live.clear()
+    yield main.app
+    main._live.clear()
+
+
+async def _websocket(app, path: str, frames, replies: int):
+    """Drive an ASGI websocket: send `frames` after the handshake, collect `replies` messages"""
+    incoming = asyncio.Queue()
+    outgoing = []
+    got = asyncio.Event()
+    await incoming.put({"type": "websocket.connect"})
+
+    async def receive():
+        return await incoming.get()
+
+    async def send(message):
+        if message["type"] == "websocket.send":
+            outgoing.append(json.loads(message["text"]))
+            if len(outgoing) == 1:
+                for frame in frames:
+                    await incoming.put({"type": "websocket.receive", **frame})
+            if len(outgoing) >= replies:
+                got.set()
+
+    scope = {"type": "websocket", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [], "scheme": "ws", "server": ("test", 80), "client": ("test", 1),
+             "subprotocols": [], "root_path": "", "asgi": {"version": "3.0"}}
+    task = asyncio.ensure_future(app(scope, receive, send))
+    await asyncio.wait_for(got.wait(), 5)
+    await incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await asyncio.wait_for(task, 5)
+    return outgoing
+
+
+def test_ingest_formats_and_push(live_app):
+    as_json = {"time_seconds": [0.0, 0.1], "link_id": ["Link_A", "Link_B"], "aggregated_gbps": [1.0, 2.0]}
+    assert request(live_app, "POST", "/api/live/ingest", json=as_json).json()["accepted"] == 2
+    csv = "time_seconds,link_id,aggregated_gbps\n0.2,Link_A,3.0\n"
+    assert request(live_app, "POST", "/api/live/ingest", content=csv,
+                   headers={"Content-Type": "text/csv"}).json()["accepted"] == 1
+    binary = encode_columns({"time_seconds": np.array([0.3]), "link_id": np.array(["Link_B"], dtype=object),
+                             "aggregated_gbps": np.array([4.0])})
+    assert request(live_app, "POST", "/api/live/ingest", content=binary,
+                   headers={"Content-Type": MEDIA_TYPE}).json()["samples"] == 4
+    assert request(live_app, "POST", "/api/live/ingest", json={"link_id": []}).status_code == 400
+
+    links = request(live_app, "GET", "/api/live/snapshot").json()["links"]
+    assert links["Link_A"]["mean"] == 2.0 and links["Link_B"]["peak"] == 4.0
+
+    frame = {"text": json.dumps({"time_seconds": [1.0], "link_id": ["Link_C"], "aggregated_gbps": [7.5]})}
+    first, ack, delta = asyncio.run(_websocket(live_app, "/api/live/ws", [frame], 3))
+    assert first["type"] == "snapshot" and set(first["links"]) == {"Link_A", "Link_B"}
+    assert ack == {"type": "ack", "accepted": 1}
+    assert delta["type"] == "delta" and delta["links"]["Link_C"]["points"] == [[1.0], [7.5]]
+    assert main._live_hub.subscribers == 0
@@ -0,0 +1,496 @@
+"""
+In-process tests for the FastAPI app (no live server needed).
+Run from the project root: python -m pytest backend
+"""
+import asyncio
+import io
+import os
+import shutil
+import threading
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from wire_format import decode_columns
+
+MOCK_UPLOAD = main.BASE_DIR / "artifacts" / "user_upload_mock_traffic_data.csv"
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """App wired to a scratch copy of results/ and artifacts/"""
+    results, artifacts = tmp_path / "results", tmp_path / "artifacts"
+    results.mkdir()
+    artifacts.mkdir()
+    for name in ("topology.json", "correlation_matrix.csv"):
+        shutil.copy2(main.RESULTS_DIR / name, results / name)
+    shutil.copy2(main.ARTIFACTS_DIR / "link_capacity_summary.csv", artifacts / "link_capacity_summary.csv")
+
+    monkeypatch.setattr(main, "RESULTS_DIR", results)
+    monkeypatch.setattr(main, "ARTIFACTS_DIR", artifacts)
+    main._data_cache.clear()
+    yield main.app
+    main._data_cache.clear()
+
+
+def request(app, method, url, **kwargs):
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+    return asyncio.run(go())
+
+
+def upload(app, path, url="/api/upload"):
+    """Upload and hold the response until the processing job has finished"""
+    with open(path, "rb") as f:
+        return request(app, "POST", f"{url}?wait=true", files={"file": ("traffic.csv", f)})
+
+
+def rewrite(path, text):
+    """Replace a live artifact the way a batch job does (live files are read-only links)"""
+    tmp = path.with_name(path.name + ".new")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def test_etag_revalidation(api):
+    """Read-only endpoints answer If-None-Match with 304 until data changes"""
+    for url in ("/api/topology", "/api/correlation", "/api/capacity-summary"):
+        first = request(api, "GET", url)
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        again = request(api, "GET", url, headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.content == b""
+
+    gz = request(api, "GET", "/api/correlation", headers={"Accept-Encoding": "gzip"})
+    assert gz.headers["content-encoding"] == "gzip"
+    assert gz.json()["cells"][0] == "1"
+
+    before = request(api, "GET", "/api/topology").headers["etag"]
+    assert upload(api, MOCK_UPLOAD).status_code == 200
+    after = request(api, "GET", "/api/topology", headers={"If-None-Match": before})
+    assert after.status_code == 200 and after.headers["etag"] != before
+
+
+def test_picks_up_files_changed_on_disk(api):
+    """A batch job rewriting an artifact is served without a reset or upload"""
+    first = request(api, "GET", "/api/topology").json()
+    topology_file = main.RESULTS_DIR / "topology.json"
+    rewrite(topology_file, '{"links": {"Link_Z": {"cells": []}}}')
+
+    assert request(api, "GET", "/api/topology").json() != first
+    assert list(request(api, "GET", "/api/topology").json()["links"]) == ["Link_Z"]
+    assert request(api, "GET", "/api/cache-stats").json()["invalidations"] >= 1
+
+
+def test_publish_checks_out_off_the_event_loop(api, monkeypatch):
+    """The snapshot checkout of a job's publish step does not block the loop"""
+    threads = []
+    checkout = main._checkout
+    monkeypatch.setattr(main, "_checkout", lambda *args: threads.append(threading.get_ident()) or checkout(*args))
+
+    async def go():
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post("/api/upload", files={"file": ("traffic.csv", MOCK_UPLOAD.read_bytes())})
+            job = await main._jobs.get(accepted.json()["job_id"]).wait()
+            return job, threading.get_ident()
+
+    job, loop_thread = asyncio.run(go())
+    assert job.status == "succeeded", job.error
+    assert threads and loop_thread not in threads
+
+
+def test_upload_runs_as_background_job(api, tmp_path):
+    """Upload returns a job id at once; polling reports every stage until published"""
+    async def go():
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with open(MOCK_UPLOAD, "rb") as f:
+                accepted = await client.post("/api/upload", files={"file": ("traffic.csv", f)})
+            assert accepted.status_code == 202
+            status_url = accepted.json()["status_url"]
+
+            assert (await client.get("/health")).status_code == 200
+            while (status := (await client.get(status_url)).json())["status"] not in ("succeeded", "failed"):
+                await asyncio.sleep(0.01)
+            return status
+
+    status = asyncio.run(go())
+    assert status["status"] == "succeeded", status["error"]
+    assert [s["name"] for s in status["stages"]] == main.UPLOAD_STAGES
+    assert all(s["status"] == "done" and s["seconds"] is not None for s in status["stages"])
+    assert status["progress"] == 1.0
+    assert (main.ARTIFACTS_DIR / "link_traffic_timeseries.csv").exists()
+    assert not any((main.ARTIFACTS_DIR / ".staging").iterdir())
+
+    bad = tmp_path / "bad.csv"
+    bad.write_text("a,b\n1,2\n")
+    before = (main.RESULTS_DIR / "topology.json").read_bytes()
+    failed = upload(api, bad)
+    assert failed.status_code == 400 and "columns" in failed.json()["detail"]
+    assert (main.RESULTS_DIR / "topology.json").read_bytes() == before
+    assert request(api, "GET", "/api/jobs/unknown").status_code == 404
+
+
+def test_same_named_uploads_keep_their_own_input(api, tmp_path):
+    """Back-to-back uploads of one filename are each processed from their own bytes"""
+    def traffic(n_links):
+        return pd.DataFrame({
+            "time_seconds": np.repeat([0.0, 0.5, 1.0], n_links),
+            "link_id": np.tile([f"Link_{i}" for i in range(n_links)], 3),
+            "aggregated_gbps": np.arange(3 * n_links, dtype=float),
+        }).to_csv(index=False).encode()
+
+    async def go():
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            ids = [(await client.post("/api/upload", files={"file": ("traffic.csv", traffic(n))})).json()["job_id"]
+                   for n in (2, 3)]
+            jobs = [(await main._jobs.get(job_id).wait()).to_dict() for job_id in ids]
+            again = await client.post("/api/upload?wait=true", files={"file": ("other.csv", traffic(2))})
+            return jobs + [again.json()]
+
+    first, second, again = asyncio.run(go())
+    assert first["result"]["details"].startswith("Processed 2 links")
+    assert second["result"]["details"].startswith("Processed 3 links")
+    # the input -> snapshot memo points at the snapshot built from those bytes
+    assert again["snapshot"] == first["result"]["snapshot"]
+    assert again["details"].startswith("Processed 2 links") and "Reused" in again["details"]
+    assert not any((main.ARTIFACTS_DIR / ".staging").iterdir())
+
+
+def test_correlation_append_and_window(api, tmp_path):
+    """Appending a newer window equals re-correlating everything from scratch"""
+    rng = np.random.default_rng(3)
+    times = np.round(np.arange(0, 200, 0.5), 2)
+    traffic = pd.DataFrame({
+        "time_seconds": np.repeat(times, 3),
+        "link_id": np.tile(["Link_A", "Link_B", "Link_C"], len(times)),
+        "aggregated_gbps": np.round(rng.gamma(2.0, 1.0, 3 * len(times)), 4),
+    })
+    old, new = traffic[traffic["time_seconds"] < 120], traffic[traffic["time_seconds"] >= 120]
+    old.to_csv(tmp_path / "old.csv", index=False)
+    new.to_csv(tmp_path / "new.csv", index=False)
+
+    assert request(api, "GET", "/api/correlation/window").status_code == 404
+    assert upload(api, tmp_path / "old.csv").status_code == 200
+    assert upload(api, tmp_path / "new.csv", "/api/correlation/append").status_code == 200
+
+    pivot = traffic.pivot_table(index="time_seconds", columns="link_id", values="aggregated_gbps")
+    body = request(api, "GET", "/api/correlation").json()
+    assert np.allclose(body["matrix"], pivot.corr().to_numpy(), atol=1e-9)
+
+    window = request(api, "GET", "/api/correlation/window").json()
+    recent = pivot[pivot.index > pivot.index.max() - window["window_s"]]
+    assert np.allclose(window["matrix"], recent.corr().to_numpy(), atol=1e-9)
+
+
+def test_correlation_index_modes(api):
+    """Sparse and tiled views agree with the dense matrix"""
+    dense = request(api, "GET", "/api/correlation").json()
+    cells, M = dense["cells"], np.array(dense["matrix"])
+
+    meta = request(api, "GET", "/api/correlation?mode=meta").json()
+    assert meta["cells"] == cells and sorted(meta["order"]) == list(range(len(cells)))
+
+    topk = request(api, "GET", "/api/correlation?mode=topk&k=3").json()
+    ranked = M.copy()
+    np.fill_diagonal(ranked, -np.inf)
+    assert np.allclose(topk["values"], -np.sort(-ranked, axis=1)[:, :3], atol=1e-6)
+
+    edges = request(api, "GET", "/api/correlation?mode=edges&threshold=0.5").json()
+    iu, ju = np.triu_indices(len(cells), 1)
+    assert len(edges["value"]) == int((M[iu, ju] >= 0.5).sum()) > 0
+    assert all(M[i, j] >= 0.5 for i, j in zip(edges["source"], edges["target"]))
+    assert request(api, "GET", "/api/correlation?mode=edges&threshold=0.01").status_code == 400
+
+    tile = request(api, "GET", "/api/correlation?mode=tile&row0=2&row1=6&col0=0&col1=5").json()
+    order = meta["order"]
+    assert tile["rows"] == [cells[c] for c in order[2:6]]
+    assert np.allclose(tile["matrix"], M[np.ix_(order[2:6], order[0:5])], atol=1e-6)
+    assert request(api, "GET", "/api/correlation?mode=tile&row0=20&row1=30").status_code == 400
+
+
+def test_binary_wire_format(api):
+    """format=binary / Accept negotiation returns the same arrays as JSON"""
+    traffic = pd.DataFrame({
+        "time_seconds": np.arange(0, 10, 0.5).repeat(2),
+        "link_id": np.tile(["Link_A", "Link_B"], 20),
+        "aggregated_gbps": np.linspace(0, 1, 40),
+    })
+    traffic.to_csv(main.ARTIFACTS_DIR / "link_traffic_timeseries.csv", index=False)
+
+    as_json = request(api, "GET", "/api/link-traffic?link_id=Link_B")
+    assert as_json.headers["content-type"] == "application/json"
+    binary = request(api, "GET", "/api/link-traffic?link_id=Link_B",
+                     headers={"Accept": "application/vnd.columnar, application/json;q=0.5"})
+    assert binary.headers["content-type"] == "application/vnd.columnar"
+    columns, meta = decode_columns(binary.content)
+    expected = pd.DataFrame(as_json.json())
+    assert meta["rows"] == len(expected) == 20
+    assert list(columns["link_id"]) == ["Link_B"] * 20
+    assert np.array_equal(columns["aggregated_gbps"], expected["aggregated_gbps"])
+
+    columns, _ = decode_columns(request(api, "GET", "/api/link-traffic?format=binary&precision=float32").content)
+    assert columns["time_seconds"].dtype == np.float32 and len(columns["time_seconds"]) == 40
+
+    dense = request(api, "GET", "/api/correlation").json()
+    body = request(api, "GET", "/api/correlation?format=binary")
+    columns, meta = decode_columns(body.content)
+    assert meta["cells"] == dense["cells"]
+    assert np.array_equal(columns["matrix"], np.array(dense["matrix"]))
+    assert body.headers["etag"] != request(api, "GET", "/api/correlation").headers["etag"]
+    again = request(api, "GET", "/api/correlation?format=binary", headers={"If-None-Match": body.headers["etag"]})
+    assert again.status_code == 304
+
+    columns, meta = decode_columns(request(api, "GET", "/api/correlation?mode=topk&k=2&format=binary").content)
+    assert columns["neighbors"].shape == (len(dense["cells"]), 2) and meta["k"] == 2
+
+
+def test_capacity_timeline(api):
+    """Per-window capacities per link, cached until the traffic changes"""
+    rng = np.random.default_rng(0)
+    traffic = pd.DataFrame({
+        "time_seconds": np.arange(0, 30, 0.01).repeat(2),
+        "link_id": np.tile(["Link_A", "Link_B"], 3000),
+        "aggregated_gbps": rng.exponential(1.0, 6000),
+    })
+    traffic.to_csv(main.ARTIFACTS_DIR / "link_traffic_timeseries.csv", index=False)
+
+    body = request(api, "GET", "/api/capacity-timeline").json()
+    assert body["window_s"] == body["step_s"] == main.ANALYSIS_WINDOW_S
+    assert list(body["links"]) == ["Link_A", "Link_B"]
+    link = body["links"]["Link_B"]
+    assert link["start"] == [0.0, 10.0, 20.0] and link["samples"] == [1000] * 3
+    assert all(m <= c <= p for m, c, p in zip(link["mean_gbps"], link["capacity_with_buffer_gbps"],
+                                              link["peak_gbps"]))
+
+    rolling = request(api, "GET", "/api/capacity-timeline?link_id=link_a&window_s=10&step_s=5")
+    assert list(rolling.json()["links"]) == ["Link_A"] and len(rolling.json()["links"]["Link_A"]["start"]) == 5
+    again = request(api, "GET", "/api/capacity-timeline?link_id=link_a&window_s=10&step_s=5",
+                    headers={"If-None-Match": rolling.headers["etag"]})
+    assert again.status_code == 304
+
+    assert request(api, "GET", "/api/capacity-timeline?link_id=Link_Q").status_code == 404
+    assert request(api, "GET", "/api/capacity-timeline?step_s=0.0001").status_code == 400
+    assert request(api, "GET", "/api/capacity-timeline?window_s=0").status_code == 422
+
+
+def test_capacity_curve(api):
+    """Capacity per (buffer, loss) pair; deeper buffers and looser targets need less"""
+    rng = np.random.default_rng(1)
+    traffic = pd.DataFrame({
+        "time_seconds": np.arange(0, 5, 0.0005).repeat(2),
+        "link_id": np.tile(["Link_A", "Link_B"], 10000),
+        "aggregated_gbps": rng.exponential(1.0, 20000),
+    })
+    traffic.to_csv(main.ARTIFACTS_DIR / "link_traffic_timeseries.csv", index=False)
+
+    searches = main._bisection_steps.snapshot(search="full")["count"]
+    sweeps = main._curve_evaluations.snapshot()["count"]
+    body = request(api, "GET", "/api/capacity-curve").json()
+    # one sweep per link, reported apart from the single-pair searches
+    assert main._curve_evaluations.snapshot()["count"] == sweeps + 2
+    assert main._bisection_steps.snapshot(search="full")["count"] == searches
+    assert body["buffer_s"] == list(main.CURVE_BUFFERS_S) and body["loss_frac"] == list(main.CURVE_LOSS_FRACS)
+    curve = np.array(body["links"]["Link_A"]["capacity_with_buffer_gbps"])
+    assert curve.shape == (8, 3)
+    assert (np.diff(curve, axis=0) <= 1e-6).all() and (np.diff(curve, axis=1) <= 1e-6).all()
+
+    url = "/api/capacity-curve?link_id=Link_B&buffer_ms=50&buffer_ms=5&loss=0.001&tol=0.001"
+    one = request(api, "GET", url)
+    assert one.json()["buffer_s"] == [0.005, 0.05] and list(one.json()["links"]) == ["Link_B"]
+    assert request(api, "GET", url, headers={"If-None-Match": one.headers["etag"]}).status_code == 304
+    assert request(api, "GET", "/api/capacity-curve?loss=1.5").status_code == 400
+    assert request(api, "GET", "/api/capacity-curve?link_id=nope").status_code == 404
+
+
+def test_loss_events(api, tmp_path):
+    """A cell CSV is scored as a job; pairs, synchronized slots and one cell's partners come back"""
+    assert request(api, "GET", "/api/loss-events").status_code == 404
+    rng = np.random.default_rng(2)
+    lost = rng.random((4000, 6)) < 0.005
+    lost[::100, :3] = True                                  # cells 0-2 lose together
+    slot, cell = np.nonzero(np.ones_like(lost))
+    pd.DataFrame({"slot_id": slot, "cell_id": cell, "loss_binary": lost.ravel().astype(int)}) \
+        .to_csv(tmp_path / "cells.csv", index=False)
+    done = upload(api, tmp_path / "cells.csv", "/api/loss-events")
+    assert done.status_code == 200 and done.json()["snapshot"]
+
+    body = request(api, "GET", "/api/loss-events?limit=3").json()
+    assert body["n_cells"] == 6 and body["n_slots"] == 4000 and body["events"] == int(lost.sum())
+    assert {frozenset(p) for p in zip(body["pairs"]["a"], body["pairs"]["b"])} == \
+        {frozenset(p) for p in (("0", "1"), ("0", "2"), ("1", "2"))}
+    assert body["synchronized"]["total"] == int((lost.sum(axis=1) >= 2).sum())
+
+    one = request(api, "GET", "/api/loss-events?cell=1&other=4&k=2").json()
+    assert one["cell"]["cell_id"] == "1"
+    assert set(one["cell"]["neighbours"]["cell_id"]) == {"0", "2"}
+    assert one["pair"]["shared"] == int((lost[:, 1] & lost[:, 4]).sum())
+    assert request(api, "GET", "/api/loss-events?cell=nope").status_code == 404
+
+
+def test_loss_event_pairs_of_a_hub_cell(tmp_path):
+    """Pairs only in the partner's top-k list still make the strongest pairs"""
+    from src.loss_events import LossEvents
+    lost = np.zeros((1000, 7), dtype=bool)
+    lost[:400, 0] = True                                    # hub: shares with cells 1-4
+    for j in range(1, 5):
+        lost[(j - 1) * 100:j * 100, j] = True
+    lost[900:950, 5] = lost[945:, 6] = True                 # a weak pair
+    slot, cell = np.nonzero(np.ones_like(lost))
+    events = LossEvents.from_frame(pd.DataFrame({"slot_id": slot, "cell_id": cell,
+                                                 "loss_binary": lost.ravel().astype(int)}))
+    events.save(tmp_path / "loss.npz", k=2)
+    main._data_cache.clear()
+
+    pairs = main.build_loss_events(tmp_path / "loss.npz", None, None, k=2, limit=10, min_cells=2)["pairs"]
+    found = list(zip(pairs["a"], pairs["b"]))
+    assert sorted(found[:4]) == [("0", "1"), ("0", "2"), ("0", "3"), ("0", "4")]
+    assert found[4:] == [("5", "6")]
+
+
+def test_image_caching_and_ranges(api):
+    """Originals revalidate with ETags and serve byte ranges"""
+    shutil.copy2(main.BASE_DIR / "results" / "02_lag_distribution.png", main.RESULTS_DIR / "plot.png")
+    data = (main.RESULTS_DIR / "plot.png").read_bytes()
+    full = request(api, "GET", "/api/images/plot.png?format=png")
+    assert full.status_code == 200 and full.content == data
+    assert "max-age" in full.headers["cache-control"] and full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+    assert request(api, "GET", "/api/images/plot.png?format=png",
+                   headers={"If-None-Match": etag}).status_code == 304
+
+    part = request(api, "GET", "/api/images/plot.png?format=png", headers={"Range": "bytes=10-19"})
+    assert part.status_code == 206 and part.content == data[10:20]
+    assert part.headers["content-range"] == f"bytes 10-19/{len(data)}"
+    tail = request(api, "GET", "/api/images/plot.png?format=png", headers={"Range": "bytes=-5"})
+    assert tail.content == data[-5:]
+    stale = request(api, "GET", "/api/images/plot.png?format=png",
+                    headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200 and len(stale.content) == len(data)
+    assert request(api, "GET", "/api/images/plot.png?format=png",
+                   headers={"Range": f"bytes={len(data)}-"}).status_code == 416
+
+
+def test_image_variants(api):
+    """Resized WebP for clients that accept it, rendered once per version of the source"""
+    Image = pytest.importorskip("PIL.Image")
+    source = main.RESULTS_DIR / "plot.png"
+    Image.new("RGB", (1000, 500), "white").save(source)
+
+    first = request(api, "GET", "/api/images/plot.png?width=200", headers={"Accept": "image/webp,*/*"})
+    assert first.status_code == 200 and first.headers["content-type"] == "image/webp"
+    assert first.headers["vary"] == "Accept"
+    assert Image.open(io.BytesIO(first.content)).size == (256, 128)        # rounded up to 64 px
+    assert len(list((main.ARTIFACTS_DIR / "image_variants").iterdir())) == 1
+
+    again = request(api, "GET", "/api/images/plot.png?width=250", headers={"Accept": "image/webp"})
+    assert again.headers["etag"] == first.headers["etag"]
+    assert request(api, "GET", "/api/images/plot.png?width=200").headers["content-type"] == "image/png"
+
+    Image.new("RGB", (1000, 500), "black").save(source.with_name("new.png"))
+    os.replace(source.with_name("new.png"), source)
+    changed = request(api, "GET", "/api/images/plot.png?width=200", headers={"Accept": "image/webp"})
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert Image.open(io.BytesIO(changed.content)).getpixel((10, 10)) == (0, 0, 0)
+    names = [p.name for p in (main.ARTIFACTS_DIR / "image_variants").iterdir()]
+    assert names == [changed.headers["etag"].strip('"')]                   # older variants dropped
+
+
+def test_warm_up_and_ready(api, monkeypatch):
+    """The lifespan fills the caches in the background; /ready flips from 503 to 200"""
+    warmup = main.WarmUp(main.warm_up_steps())
+    monkeypatch.setattr(main, "_warmup", warmup)
+    not_yet = request(api, "GET", "/ready")
+    assert not_yet.status_code == 503 and not_yet.json()["status"] == "warming"
+
+    async def start_and_finish():
+        async with main.app.router.lifespan_context(main.app):
+            await warmup._task
+    asyncio.run(start_and_finish())
+
+    ready = request(api, "GET", "/ready").json()
+    assert ready["status"] == "ready" and ready["time_to_ready_seconds"] > 0
+    steps = {name: info["status"] for name, info in ready["steps"].items()}
+    assert steps["topology"] == steps["correlation"] == steps["snapshots"] == "done"
+    assert steps["link-traffic"] == steps["loss-events"] == "skipped"           # no such artifacts here
+
+    misses = main._data_cache.misses
+    assert request(api, "GET", "/api/topology").status_code == 200
+    assert request(api, "GET", "/api/capacity-summary").status_code == 200
+    assert main._data_cache.misses == misses                                    # served warm
+    assert "app_ready 1" in request(api, "GET", "/metrics").text
+
+
+def test_metrics_endpoint(api):
+    """Route latencies, cache counters and upload step timings show up at /metrics"""
+    assert request(api, "GET", "/api/topology").status_code == 200
+    assert request(api, "GET", "/api/topology").status_code == 200
+    assert request(api, "GET", "/api/jobs/nope").status_code == 404
+    response = upload(api, MOCK_UPLOAD)
+    assert response.status_code == 200
+
+    from src.buffer_model import capacity_with_buffer
+    capacity_with_buffer(pd.Series(np.random.default_rng(0).gamma(2.0, 1.0, 2000)))
+
+    scrape = request(api, "GET", "/metrics")
+    assert scrape.status_code == 200
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = scrape.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/topology"}' in text
+    assert 'http_requests_total{method="GET",route="/api/jobs/{job_id}",status="404"}' in text
+    assert "data_cache_hits_total" in text and "data_cache_bytes" in text
+    for stage in main.UPLOAD_STAGES:
+        assert f'job_stage_duration_seconds_count{{kind="upload",stage="{stage}"}}' in text
+    for step in ("read", "groupby", "pivot", "corr", "writes"):
+        assert f'job_step_duration_seconds_count{{kind="upload",step="{step}"}}' in text
+    assert main._bisection_steps.snapshot(search="full")["count"] >= 1
+
+    on = request(api, "POST", "/api/profiler?enabled=true&interval_ms=1")
+    assert on.json()["running"] is True
+    off = request(api, "POST", "/api/profiler?enabled=false")
+    assert off.json()["running"] is False
+    assert request(api, "GET", "/api/profiler?format=folded").status_code == 200
+
+
+def test_snapshots_reuse_reset_and_activate(api):
+    """Uploads become snapshots; identical re-uploads reuse them; reset is a switch"""
+    original = (main.RESULTS_DIR / "topology.json").read_bytes()
+    first = upload(api, MOCK_UPLOAD).json()
+    uploaded = (main.RESULTS_DIR / "topology.json").read_bytes()
+    assert uploaded != original
+
+    async def reupload():
+        transport = httpx.ASGITransport(app=api)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await client.post("/api/upload", files={"file": ("again.csv", MOCK_UPLOAD.read_bytes())})
+            return (await main._jobs.get(accepted.json()["job_id"]).wait()).to_dict()
+
+    job = asyncio.run(reupload())
+    assert job["status"] == "succeeded"
+    assert job["result"]["snapshot"] == first["snapshot"] and "Reused" in job["result"]["details"]
+    assert [s["status"] for s in job["stages"]] == ["skipped"] * (len(main.UPLOAD_STAGES) - 1) + ["done"]
+
+    rewrite(main.RESULTS_DIR / "topology.json", '{"links": {"Link_Z": {"cells": []}}}')
+    reset = request(api, "POST", "/api/reset").json()
+    assert reset["status"] == "success"
+    assert (main.RESULTS_DIR / "topology.json").read_bytes() == original
+    assert not (main.ARTIFACTS_DIR / "link_traffic_timeseries.csv").exists()
+    assert request(api, "GET", "/api/topology").content != uploaded
+
+    listing = request(api, "GET", "/api/snapshots").json()
+    assert listing["head"] == listing["refs"]["original"]
+    assert first["snapshot"] in {v["id"] for v in listing["versions"]}
+
+    switched = request(api, "POST", f"/api/snapshots/{first['snapshot']}/activate")
+    assert switched.status_code == 200
+    assert (main.RESULTS_DIR / "topology.json").read_bytes() == uploaded
+    assert request(api, "GET", "/api/link-traffic?max_points=10").status_code == 200
+    assert request(api, "POST", "/api/snapshots/nope/activate").status_code == 404
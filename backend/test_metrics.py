@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from metrics import MetricsRegistry, SamplingProfiler
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    hits = registry.counter("hits_total", "Hits", ("route",))
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    registry.callback("queue_depth", "Depth", lambda: 3)
+
+    hits.inc(route="/a")
+    hits.inc(2, route='/b"x')
+    for seconds in (0.05, 0.1, 0.5, 7.0):
+        latency.observe(seconds, route="/a")
+
+    text = registry.render()
+    assert "# TYPE hits_total counter" in text
+    assert 'hits_total{route="/a"} 1\n' in text
+    assert 'hits_total{route="/b\\"x"} 2\n' in text
+    # buckets are cumulative and inclusive of their upper bound
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 2\n' in text
+    assert 'latency_seconds_bucket{route="/a",le="1"} 3\n' in text
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 4\n' in text
+    assert 'latency_seconds_count{route="/a"} 4\n' in text
+    assert 'latency_seconds_sum{route="/a"} 7.65\n' in text
+    assert "queue_depth 3\n" in text
+
+    with pytest.raises(ValueError):
+        hits.inc(path="/a")
+    with pytest.raises(ValueError):
+        registry.counter("hits_total", "again")
+
+
+def test_sampling_profiler_toggles():
+    profiler = SamplingProfiler(interval_s=0.001)
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    try:
+        profiler.start()
+        assert profiler.running
+        deadline = time.time() + 5
+        while profiler.samples < 20 and time.time() < deadline:
+            time.sleep(0.01)
+        profiler.stop()
+    finally:
+        stop.set()
+        worker.join()
+
+    assert not profiler.running
+    samples = profiler.samples
+    assert samples >= 20
+    snapshot = profiler.snapshot(5)
+    assert any("busy_worker" in entry["stack"] for entry in snapshot["top"])
+    assert "busy_worker" in profiler.folded()
+
+    time.sleep(0.01)
+    assert profiler.samples == samples          # stopped means stopped
+    profiler.reset()
+    assert profiler.samples == 0 and profiler.folded() == ""
@@ -0,0 +1,103 @@
+"""
+Checks the Ollama proxy against a local fake Ollama server.
+Run from the project root: python -m pytest backend
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import main
+from fake_ollama import FakeOllama
+from ollama_proxy import OllamaBusy, OllamaClient, compact_context, compact_history
+
+
+def test_compact_context():
+    context = {
+        "traffic_snapshot": [{"t": 1.0, "gbps": 0.123456}] * 3 + [{"t": 2.0, "gbps": 5.0}],
+        "topology_summary": {"link_count": 3, "cell_count": 24},
+        "notes": "x" * 5000,
+    }
+    text = compact_context(context, budget=400)
+    assert len(text) <= 400 and "\n" not in text and ": " not in text
+    data = json.loads(text)
+    assert data["traffic_snapshot"] == [{"gbps": 0.123, "t": 1.0}, {"gbps": 5.0, "t": 2.0}]
+    assert data["topology_summary"] == {"cell_count": 24, "link_count": 3}
+    # same context, any key order: same bytes, so the prompt prefix stays cacheable
+    assert compact_context(dict(reversed(list(context.items()))), budget=400) == text
+    assert len(compact_context({"rows": list(range(10_000))}, budget=100)) <= 100
+    # past the last clip step whole entries go, largest first: still valid JSON
+    links = {f"link_{i}": {"avg": i / 7, "cells": ["c1", "c2"], "name": "n" * 30} for i in range(300)}
+    text = compact_context({"links": links, "link_count": 300}, budget=120)
+    assert len(text) <= 120 and json.loads(text)["link_count"] == 300
+    assert json.loads(text)["links"]
+    assert compact_context({"a": "b" * 40}, budget=5) == "{}"
+
+
+def test_compact_history():
+    msgs = [{"role": "assistant", "content": "hello"},
+            {"role": "system", "content": "client side"},
+            {"role": "user", "content": "a" * 50},
+            {"role": "user", "content": "a" * 50},
+            {"role": "assistant", "content": "b" * 50},
+            {"role": "user", "content": "latest"}]
+    assert [m["role"] for m in compact_history(msgs)] == ["assistant", "user", "assistant", "user"]
+    assert compact_history(msgs, budget=60) == msgs[4:]
+    assert compact_history(msgs[-1:], budget=1) == msgs[-1:]
+
+
+def test_pooled_streaming_client():
+    with FakeOllama(tokens=["one ", "two ", "three"], delay=0.05) as fake:
+        async def go():
+            client = OllamaClient(fake.url, max_concurrent=1, queue_timeout=0.05)
+            try:
+                stream = await client.open_stream("llama3", [{"role": "user", "content": "hi"}])
+                # the only slot is held while the stream is open
+                with pytest.raises(OllamaBusy):
+                    await client.chat("llama3", [])
+                tokens = [t async for t in stream]
+                whole = await client.chat("llama3", [])
+                return tokens, whole
+            finally:
+                await client.aclose()
+
+        tokens, whole = asyncio.run(go())
+        assert tokens == ["one ", "two ", "three"] and whole == "one two three"
+        assert fake.requests[0]["body"]["stream"] is True
+        # both calls went over one keep-alive connection
+        assert len({r["port"] for r in fake.requests}) == 1
+
+
+def test_chat_endpoint_streams_sse(monkeypatch):
+    with FakeOllama(tokens=["Add ", "buffer"]) as fake:
+        async def go():
+            monkeypatch.setattr(main, "_ollama", OllamaClient(fake.url))
+            transport = httpx.ASGITransport(app=main.app)
+            body = {"messages": [{"role": "user", "content": "advice?"}],
+                    "context_data": {"capacity_issues": [{"link_id": "Link_A"}] * 4}}
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                    streamed = await client.post("/api/chat", json=body | {"stream": True})
+                    plain = await client.post("/api/chat", json=body)
+                    missing = await client.post("/api/chat", json=body | {"model": "nope"})
+                return streamed, plain, missing
+            finally:
+                await main._ollama.aclose()
+
+        streamed, plain, missing = asyncio.run(go())
+        assert streamed.headers["content-type"].startswith("text/event-stream")
+        events = streamed.text.strip().split("\n\n")
+        assert events == ['data: {"content": "Add "}', 'data: {"content": "buffer"}', "event: done\ndata: {}"]
+        assert plain.json() == {"role": "assistant", "content": "Add buffer"}
+        assert missing.status_code == 500
+
+        system = fake.requests[0]["body"]["messages"][0]["content"]
+        assert system.endswith('{"capacity_issues":[{"link_id":"Link_A"}]}')
+
+    async def offline():
+        monkeypatch.setattr(main, "_ollama", OllamaClient(fake.url))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/api/chat", json={"messages": [], "stream": True})
+    assert asyncio.run(offline()).status_code == 503
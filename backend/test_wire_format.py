@@ -0,0 +1,49 @@
+"""
+Round-trip and content-negotiation checks for the columnar wire format.
+Run from the project root: python -m pytest backend
+"""
+import struct
+
+import numpy as np
+import pandas as pd
+
+from wire_format import decode_columns, encode_columns, encode_payload, wants_binary
+
+
+def test_round_trip_and_alignment():
+    df = pd.DataFrame({
+        "t": np.arange(5, dtype=np.float64) / 3,
+        "link": ["a", "b", None, "a", "c"],
+        "n": np.arange(5, dtype=np.int64),
+        "ok": [True, False, True, True, False],
+    })
+    body = encode_payload(df)
+    columns, meta = decode_columns(body)
+    assert meta == {"rows": 5}
+    assert np.array_equal(columns["t"], df["t"].to_numpy())
+    assert list(columns["link"]) == ["a", "b", None, "a", "c"]
+    assert columns["n"].dtype == np.int32 and columns["ok"].dtype == np.uint8
+
+    # categorical columns are sent from their own codes, missing values included
+    df["link"] = df["link"].astype("category")
+    columns, _ = decode_columns(encode_payload(df))
+    assert list(columns["link"]) == ["a", "b", None, "a", "c"]
+
+    matrix = np.array([[1.0, np.nan], [0.25, 1.0]])
+    body = encode_columns({"odd": np.arange(3, dtype=np.int32), "m": matrix}, {"cells": ["x", "y"]}, "float32")
+    columns, meta = decode_columns(body)
+    assert meta["cells"] == ["x", "y"]
+    np.testing.assert_array_equal(columns["m"], matrix.astype(np.float32))
+    # every buffer starts 8-byte aligned so clients can view it in place
+    (header_size,) = struct.unpack_from("<I", body, 4)
+    assert (8 + header_size) % 8 == 0 and len(body) == 8 + header_size + 16 + 16
+
+
+def test_negotiation():
+    assert not wants_binary(None)
+    assert not wants_binary("application/json, text/plain, */*")
+    assert wants_binary("application/vnd.columnar")
+    assert wants_binary("application/octet-stream, application/json;q=0.9")
+    assert not wants_binary("application/vnd.columnar;q=0.5, application/json")
+    assert not wants_binary("application/vnd.columnar", "json")
+    assert wants_binary(None, "binary")
@@ -0,0 +1,83 @@
+"""
+Start-up warm-up: fill the data caches in the background so the first
+request to each endpoint does not pay for parsing its artifacts.
+
+The app starts serving (and /health answers) as soon as it has imported.
+WarmUp then runs its steps one after another on a worker thread. /ready
+reports ready once every step has finished, failed or not, because a
+missing or broken artifact must not keep an instance out of the load
+balancer forever. time_to_ready is counted from `started`, normally the
+time main.py began importing.
+"""
+import asyncio
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+
+class WarmUp:
+    """
+    Named warm-up steps (callables) and how far they have got. A step that
+    returns False is reported as skipped.
+    """
+
+    def __init__(self, steps, started: float = None):
+        self.started = time.perf_counter() if started is None else started
+        self.steps = OrderedDict(
+            (name, {"status": "pending", "seconds": None, "error": None}) for name, _ in steps
+        )
+        self._fns = dict(steps)
+        self._lock = threading.Lock()
+        self.ready_at = None
+        self._task = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    @property
+    def time_to_ready(self):
+        return None if self.ready_at is None else self.ready_at - self.started
+
+    def _run_step(self, name: str) -> None:
+        info = self.steps[name]
+        with self._lock:
+            info["status"] = "running"
+        t0 = time.perf_counter()
+        try:
+            skipped = self._fns[name]() is False        # e.g. the artifact does not exist
+            status, error = "skipped" if skipped else "done", None
+        except Exception as e:
+            traceback.print_exc()
+            status, error = "failed", str(e)
+        with self._lock:
+            info.update(status=status, seconds=time.perf_counter() - t0, error=error)
+
+    async def run(self) -> None:
+        for name in self.steps:
+            await run_in_threadpool(self._run_step, name)
+        self.ready_at = time.perf_counter()
+        print(f"Warm-up finished in {self.time_to_ready:.2f}s")
+
+    def start(self) -> asyncio.Task:
+        """Run the steps in the background (call from the event loop)."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def aclose(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def status(self) -> dict:
+        with self._lock:
+            steps = {name: dict(info) for name, info in self.steps.items()}
+        return {
+            "status": "ready" if self.ready else "warming",
+            "time_to_ready_seconds": self.time_to_ready,
+            "uptime_seconds": time.perf_counter() - self.started,
+            "steps": steps,
+        }
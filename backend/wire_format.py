@@ -0,0 +1,132 @@
+"""
+Columnar binary wire format for numeric endpoints.
+
+Layout (all integers little-endian):
+
+    4 bytes   magic b"COLB"
+    4 bytes   uint32 header length H
+    H bytes   UTF-8 JSON header, space-padded so the data starts 8-byte aligned
+    ...       column buffers, each starting on an 8-byte boundary
+
+The header is {"version": 1, "meta": {...}, "columns": [{"name", "dtype",
+"shape", "offset", "nbytes"}, ...]}, offsets counted from the end of the
+header. dtypes are float64 | float32 | int64 | int32 | uint8, so a browser
+can view every buffer as a typed array without copying. String columns
+are sent as int32 codes plus a "categories" list in their header entry.
+NaN stays NaN (JSON responses turn it into null).
+"""
+import json
+import struct
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+MEDIA_TYPE = "application/vnd.columnar"
+MAGIC = b"COLB"
+VERSION = 1
+_BINARY_TYPES = {MEDIA_TYPE, "application/octet-stream"}
+_JSON_TYPES = {"application/json", "application/*", "*/*"}
+_DTYPES = {"float64": "<f8", "float32": "<f4", "int64": "<i8", "int32": "<i4", "uint8": "u1"}
+
+
+def _accept_q(accept: Optional[str], media_types) -> float:
+    best = 0.0
+    for part in (accept or "").split(","):
+        name, *params = part.strip().split(";")
+        if name.strip().lower() not in media_types:
+            continue
+        q = 1.0
+        for p in params:
+            key, _, value = p.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        best = max(best, q)
+    return best
+
+
+def wants_binary(accept: Optional[str], fmt: Optional[str] = None) -> bool:
+    """
+    True when the client asked for the binary format: `format=binary`, or an
+    Accept header that ranks it above JSON (ties and no header mean JSON).
+    """
+    if fmt:
+        return fmt == "binary"
+    return _accept_q(accept, _BINARY_TYPES) > _accept_q(accept, _JSON_TYPES)
+
+
+def _column(name: str, values, float_dtype: str):
+    """(header entry, contiguous little-endian array) for one column."""
+    entry = {"name": name}
+    cat = values.array if isinstance(values, (pd.Series, pd.Index)) else values
+    if isinstance(cat, pd.Categorical):
+        # already coded: send its codes and categories without re-factorizing
+        entry["categories"] = [str(c) for c in cat.categories]
+        arr, dtype = cat.codes, "int32"
+    else:
+        arr = values.to_numpy() if isinstance(values, (pd.Series, pd.Index)) else np.asarray(values)
+        if arr.dtype.kind in "fiub":
+            if arr.dtype.kind == "f":
+                dtype = float_dtype
+            elif arr.dtype.kind == "b":
+                dtype = "uint8"
+            else:
+                dtype = "int32" if arr.size == 0 or (arr.min() >= -2**31 and arr.max() < 2**31) else "int64"
+        else:
+            codes, categories = pd.factorize(pd.Series(arr.ravel(), copy=False))
+            entry["categories"] = [str(c) for c in categories]
+            arr, dtype = codes.reshape(arr.shape), "int32"
+    arr = np.ascontiguousarray(arr, dtype=_DTYPES[dtype])
+    entry.update(dtype=dtype, shape=list(arr.shape))
+    return entry, arr
+
+
+def encode_columns(columns: dict, meta: dict = None, float_dtype: str = "float64") -> bytes:
+    """Encode {name: array-like} (any shape) plus JSON-able meta."""
+    entries, parts, offset = [], [], 0
+    for name, values in columns.items():
+        entry, arr = _column(name, values, float_dtype)
+        entry.update(offset=offset, nbytes=arr.nbytes)
+        entries.append(entry)
+        parts += [arr.tobytes(), b"\0" * (-arr.nbytes % 8)]
+        offset += arr.nbytes + (-arr.nbytes % 8)
+
+    header = json.dumps({"version": VERSION, "meta": meta or {}, "columns": entries},
+                        separators=(",", ":"), allow_nan=False).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+    return b"".join([MAGIC, struct.pack("<I", len(header)), header] + parts)
+
+
+def encode_payload(payload, float_dtype: str = "float64") -> bytes:
+    """
+    Binary body for what an endpoint would otherwise send as JSON: a
+    DataFrame becomes one column per field; in a dict, arrays become
+    columns and everything else goes into the header meta.
+    """
+    if isinstance(payload, pd.DataFrame):
+        return encode_columns({str(c): payload[c] for c in payload.columns},
+                              {"rows": len(payload)}, float_dtype)
+    columns = {k: v for k, v in payload.items() if isinstance(v, (np.ndarray, pd.Series))}
+    meta = {k: v for k, v in payload.items() if k not in columns}
+    return encode_columns(columns, meta, float_dtype)
+
+
+def decode_columns(body: bytes):
+    """(columns, meta) from an encoded body; string columns come back as object arrays."""
+    if body[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a columnar body")
+    (size,) = struct.unpack_from("<I", body, len(MAGIC))
+    start = len(MAGIC) + 4 + size
+    header = json.loads(body[len(MAGIC) + 4:start])
+    columns = {}
+    for entry in header["columns"]:
+        count = int(np.prod(entry["shape"]))
+        arr = np.frombuffer(body, dtype=_DTYPES[entry["dtype"]], count=count,
+                            offset=start + entry["offset"]).reshape(entry["shape"])
+        if "categories" in entry:
+            arr = np.asarray(entry["categories"] + [None], dtype=object)[arr]
+        columns[entry["name"]] = arr
+    return columns, header["meta"]
@@ -0,0 +1,302 @@
+"""
+Benchmarks for the capacity, upload and serving hot paths.
+
+    python benchmarks/bench.py                                  # default grid
+    python benchmarks/bench.py --links 3,24 --duration 10,60 --slot 0.001,0.0005
+    python benchmarks/bench.py --quick --out bench.json
+    python benchmarks/bench.py --compare bench.json             # exit 1 on regressions
+
+Each case reports latency percentiles over --repeat runs (after one
+warm-up) and the peak Python heap of one traced run (tracemalloc also
+sees numpy buffers). Sizes run smallest first; once a case of a benchmark
+takes longer than --budget-s, its larger sizes are skipped and reported
+as such, which shows where the current code stops scaling.
+
+Upload and GET endpoints go through the FastAPI app in-process over
+ASGI, against a scratch copy of results/ and artifacts/.
+"""
+import argparse
+import asyncio
+import json
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+for path in (BASE_DIR, BASE_DIR / "backend", BASE_DIR / "benchmarks"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from src.buffer_model import capacity_with_buffer
+from src.capacity_planning import build_capacity_summary
+from workloads import link_names, link_traffic, topology_for
+
+ENDPOINTS = [
+    "/health",
+    "/api/topology",
+    "/api/capacity-summary",
+    "/api/correlation",
+    "/api/correlation?format=binary",
+    "/api/correlation?mode=topk&k=5",
+    "/api/correlation/window",
+    "/api/link-traffic?link_id={link}",
+    "/api/link-traffic?max_points=2000",
+    "/api/link-traffic?format=binary",
+    "/api/link-traffic",
+]
+
+
+def _summary(seconds, peak_bytes: int) -> dict:
+    ms = np.asarray(seconds) * 1000.0
+    return {
+        "runs": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+        "peak_mb": round(peak_bytes / 2**20, 2),
+    }
+
+
+def measure(fn, repeat: int) -> dict:
+    """Percentiles of fn() over `repeat` runs after a warm-up, plus one traced run."""
+    fn()
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return _summary(seconds, peak)
+
+
+async def measure_async(make_call, repeat: int, warmup: bool = True) -> dict:
+    if warmup:
+        await make_call()
+    seconds = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        await make_call()
+        seconds.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        await make_call()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return _summary(seconds, peak)
+
+
+class Budget:
+    """Skips sizes at or above the smallest one that already ran over budget."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.limit = {}                         # bench -> rows that went over
+
+    def allows(self, bench: str, rows: int) -> bool:
+        return rows < self.limit.get(bench, float("inf"))
+
+    def record(self, bench: str, rows: int, result: dict) -> None:
+        if result["p50_ms"] / 1000.0 > self.seconds:
+            self.limit[bench] = min(rows, self.limit.get(bench, float("inf")))
+
+
+@contextmanager
+def app_environment():
+    """The app, pointed at a scratch copy of its data directories."""
+    import main
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_"))
+    results, artifacts = tmp / "results", tmp / "artifacts"
+    results.mkdir()
+    artifacts.mkdir()
+    for name in ("topology.json", "correlation_matrix.csv"):
+        shutil.copy2(main.RESULTS_DIR / name, results / name)
+    shutil.copy2(main.ARTIFACTS_DIR / "link_capacity_summary.csv", artifacts / "link_capacity_summary.csv")
+
+    saved = main.RESULTS_DIR, main.ARTIFACTS_DIR
+    main.RESULTS_DIR, main.ARTIFACTS_DIR = results, artifacts
+    main._data_cache.clear()
+    try:
+        yield main
+    finally:
+        main.RESULTS_DIR, main.ARTIFACTS_DIR = saved
+        main._data_cache.clear()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+async def _upload(client: httpx.AsyncClient, body: bytes) -> dict:
+    accepted = (await client.post("/api/upload", files={"file": ("traffic.csv", body)})).json()
+    while True:
+        job = (await client.get(accepted["status_url"])).json()
+        if job["status"] == "succeeded":
+            return job
+        if job["status"] == "failed":
+            raise RuntimeError(f"upload failed: {job['error']}")
+        await asyncio.sleep(0.002)
+
+
+async def _serving_cases(app_module, body: bytes, params: dict, repeat: int, budget: Budget):
+    rows = params["rows"]
+    out = []
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if budget.allows("upload", rows):
+            stages = {}
+
+            async def upload():
+                app_module._snapshots().forget()        # process it again, not a reuse
+                job = await _upload(client, body)
+                for stage in job["stages"]:
+                    stages.setdefault(stage["name"], []).append(stage["seconds"])
+
+            result = await measure_async(upload, repeat)
+            result["stage_p50_ms"] = {name: round(float(np.median(s)) * 1000, 3) for name, s in stages.items()}
+            budget.record("upload", rows, result)
+            out.append({"bench": "upload", "params": params, **result})
+        else:
+            await _upload(client, body)                 # endpoints still need the data
+            out.append({"bench": "upload", "params": params, "skipped": "over budget"})
+
+        result = await measure_async(lambda: _upload(client, body), repeat)
+        out.append({"bench": "upload (identical re-upload)", "params": params, **result})
+
+        link = link_names(params["links"])[0]
+        for template in ENDPOINTS:
+            url = template.format(link=link)
+            bench = f"GET {template}"
+            if not budget.allows(bench, rows):
+                out.append({"bench": bench, "params": params, "skipped": "over budget"})
+                continue
+
+            async def get():
+                response = await client.get(url)
+                response.raise_for_status()
+
+            app_module._data_cache.clear()
+            t0 = time.perf_counter()
+            await get()
+            cold_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+            result = await measure_async(get, repeat, warmup=False)
+            result["cold_ms"] = cold_ms
+            budget.record(bench, rows, result)
+            out.append({"bench": bench, "params": params, **result})
+    return out
+
+
+def run_suite(links, durations, slots, repeat: int = 5, budget_s: float = 10.0, report=print) -> list:
+    budget = Budget(budget_s)
+    results = []
+
+    def add(entry):
+        results.append(entry)
+        report(format_row(entry))
+
+    sizes = sorted(((d, s) for d in durations for s in slots), key=lambda ds: ds[0] / ds[1])
+    for duration, slot in sizes:
+        rows = int(round(duration / slot))
+        params = {"links": 1, "duration_s": duration, "slot_s": slot, "rows": rows}
+        if not budget.allows("capacity_with_buffer", rows):
+            add({"bench": "capacity_with_buffer", "params": params, "skipped": "over budget"})
+            continue
+        series = link_traffic(1, duration, slot)["aggregated_gbps"]
+        result = measure(lambda: capacity_with_buffer(series), repeat)
+        budget.record("capacity_with_buffer", rows, result)
+        add({"bench": "capacity_with_buffer", "params": params, **result})
+
+    grid = sorted(((n, d, s) for n in links for d in durations for s in slots),
+                  key=lambda nds: nds[0] * nds[1] / nds[2])
+    for n_links, duration, slot in grid:
+        rows = int(round(duration / slot)) * n_links
+        params = {"links": n_links, "duration_s": duration, "slot_s": slot, "rows": rows}
+        traffic = link_traffic(n_links, duration, slot)
+
+        if budget.allows("build_capacity_summary", rows):
+            topology = topology_for(n_links)
+            result = measure(lambda: build_capacity_summary(traffic, topology), repeat)
+            budget.record("build_capacity_summary", rows, result)
+            add({"bench": "build_capacity_summary", "params": params, **result})
+        else:
+            add({"bench": "build_capacity_summary", "params": params, "skipped": "over budget"})
+
+        body = traffic.to_csv(index=False).encode()
+        del traffic
+        with app_environment() as app_module:
+            for entry in asyncio.run(_serving_cases(app_module, body, params, repeat, budget)):
+                add(entry)
+    return results
+
+
+def _params_key(entry: dict) -> str:
+    p = entry["params"]
+    return f"{p['links']}x{p['duration_s']:g}s@{p['slot_s'] * 1000:g}ms"
+
+
+def format_row(entry: dict) -> str:
+    head = f"{entry['bench']:<40} {_params_key(entry):<18}"
+    if "skipped" in entry:
+        return f"{head} skipped ({entry['skipped']})"
+    return (f"{head} p50 {entry['p50_ms']:>10.2f} ms  p90 {entry['p90_ms']:>10.2f}  "
+            f"p99 {entry['p99_ms']:>10.2f}  peak {entry['peak_mb']:>8.1f} MB")
+
+
+def compare(results: list, baseline: list, tolerance: float = 0.25, min_ms: float = 1.0) -> list:
+    """Cases whose p50 grew by more than `tolerance` (and min_ms) over the baseline."""
+    before = {(b["bench"], _params_key(b)): b for b in baseline if "p50_ms" in b}
+    regressions = []
+    for entry in results:
+        old = before.get((entry["bench"], _params_key(entry)))
+        if old is None or "p50_ms" not in entry:
+            continue
+        if entry["p50_ms"] > old["p50_ms"] * (1 + tolerance) and entry["p50_ms"] - old["p50_ms"] > min_ms:
+            regressions.append({"bench": entry["bench"], "params": _params_key(entry),
+                                "baseline_ms": old["p50_ms"], "p50_ms": entry["p50_ms"]})
+    return regressions
+
+
+def _floats(text: str) -> list:
+    return [float(x) for x in text.split(",") if x]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--links", type=lambda s: [int(x) for x in _floats(s)], default=[3, 24])
+    parser.add_argument("--duration", type=_floats, default=[10.0, 60.0], help="seconds, comma separated")
+    parser.add_argument("--slot", type=_floats, default=[0.01, 0.001, 0.0005], help="seconds, comma separated")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-s", type=float, default=10.0)
+    parser.add_argument("--quick", action="store_true", help="tiny grid, for a smoke run")
+    parser.add_argument("--out", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON; exit 1 on p50 regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.links, args.duration, args.slot, args.repeat = [3], [2.0], [0.01], 3
+
+    results = run_suite(args.links, args.duration, args.slot, args.repeat, args.budget_s)
+    if args.out:
+        args.out.write_text(json.dumps(results, indent=2))
+        print(f"Results written to {args.out}")
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r['bench']} {r['params']}: {r['baseline_ms']} -> {r['p50_ms']} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+"""
+Smoke run of the benchmark suite on a tiny grid, so it keeps working.
+Run from the project root: python -m pytest benchmarks
+"""
+from bench import ENDPOINTS, compare, run_suite
+
+
+def test_suite_runs_and_flags_regressions():
+    results = run_suite([2], [1.0], [0.01], repeat=2, report=lambda line: None)
+    benches = [r["bench"] for r in results]
+    assert benches[:4] == ["capacity_with_buffer", "build_capacity_summary", "upload",
+                           "upload (identical re-upload)"]
+    assert benches[4:] == [f"GET {e}" for e in ENDPOINTS]
+    for r in results:
+        assert r["p50_ms"] <= r["p90_ms"] <= r["p99_ms"] <= r["max_ms"] and r["peak_mb"] >= 0
+    assert set(results[2]["stage_p50_ms"]) == {"ingest", "capacity", "correlation", "topology", "snapshot", "publish"}
+
+    slower = [dict(r, p50_ms=r["p50_ms"] * 3 + 5) for r in results[:2]]
+    assert [r["bench"] for r in compare(slower, results)] == ["capacity_with_buffer", "build_capacity_summary"]
+    assert compare(results, results) == []
@@ -0,0 +1,28 @@
+"""
+Synthetic traffic for the benchmarks, sized by link count, duration and
+slot resolution, from the same generator as generate_mock_data.py
+(bursty ON/OFF cells summed per link).
+"""
+import pandas as pd
+
+from src.topology_inference import _link_name
+from src.traffic_generator import TrafficGenerator
+
+CELLS_PER_LINK = 4
+
+
+def link_names(n_links: int) -> list:
+    return [_link_name(i) for i in range(n_links)]
+
+
+def link_traffic(n_links: int, duration_s: float, slot_s: float, seed: int = 0) -> pd.DataFrame:
+    """Long-format (time_seconds, link_id, aggregated_gbps), time-major."""
+    gen = TrafficGenerator(n_links=n_links, cells_per_link=CELLS_PER_LINK, slot_s=slot_s, seed=seed)
+    df = pd.concat([links for links, _ in gen.chunks(duration_s, cells=False)], ignore_index=True)
+    df["link_id"] = df["link_id"].astype(str).astype(object)
+    return df
+
+
+def topology_for(n_links: int) -> dict:
+    """Minimal topology.json shape that build_capacity_summary iterates over."""
+    return {"links": {name: {"cells": []} for name in link_names(n_links)}}
@@ -8,3 +8,11 @@ MAX_LOSS_FRAC     = 0.001       # 0.1% allowed loss
 
 # Output directories
 OUT_DIR = "results"
+
+# Correlation state (sliding-window variant)
+CORRELATION_WINDOW_S      = 60.0    # seconds covered by the window
+CORRELATION_WINDOW_BLOCKS = 60      # window moves in steps of WINDOW_S / BLOCKS
+
+# Topology inference
+MAX_ALIGNMENT_LAG = 5               # samples searched either way for the best lag
+N_EXPECTED_LINKS  = 3
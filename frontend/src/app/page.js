@@ -47,6 +47,7 @@ export default function Home() {
     // Local UI State
     const [correlationView, setCorrelationView] = useState('network');
     const [uploading, setUploading] = useState(false);
+    const [uploadStage, setUploadStage] = useState(null);
     const [resetting, setResetting] = useState(false);
     const [activeTab, setActiveTab] = useState('dashboard'); // Mobile Tab State
     const [isMobile, setIsMobile] = useState(false);
@@ -72,9 +73,19 @@ export default function Home() {
 
         setUploading(true);
         try {
-            await axios.post(`${API_BASE_URL}/api/upload`, formData, {
+            const { data: accepted } = await axios.post(`${API_BASE_URL}/api/upload`, formData, {
                 headers: { 'Content-Type': 'multipart/form-data' }
             });
+
+            // Processing runs as a background job: poll until it finishes
+            let job;
+            do {
+                await new Promise((resolve) => setTimeout(resolve, 500));
+                ({ data: job } = await axios.get(`${API_BASE_URL}${accepted.status_url}`));
+                setUploadStage(job.stage);
+            } while (job.status !== 'succeeded' && job.status !== 'failed');
+            if (job.status === 'failed') throw new Error(job.error);
+
             alert('Upload successful! Dashboard updating...');
             await fetchDashboardData(true); // Force refresh
         } catch (err) {
@@ -82,6 +93,7 @@ export default function Home() {
             alert('Upload failed: ' + (err.response?.data?.detail || err.message));
         } finally {
             setUploading(false);
+            setUploadStage(null);
         }
     };
 
@@ -161,7 +173,7 @@ export default function Home() {
                     {/* Hide robust controls on mobile unless specific tab? Or simplify */}
                     <div style={{ gap: '1rem', alignItems: 'center', flexWrap: 'wrap', display: isMobile ? 'none' : 'flex' }}>
                         <label className="glass-btn" style={{ cursor: uploading ? 'wait' : 'pointer' }}>
-                            {uploading ? 'Uploading...' : 'Upload Data'}
+                            {uploading ? (uploadStage ? `Processing (${uploadStage})...` : 'Uploading...') : 'Upload Data'}
                             <input
                                 type="file"
                                 accept=".csv"
@@ -2,7 +2,6 @@
 
 import React, { useState, useRef, useEffect } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
-import axios from 'axios';
 import { useDashboard } from '../context/DashboardContext';
 
 import config from '../config';
@@ -48,20 +47,51 @@ export default function AIChatPanel() {
             traffic_snapshot: trafficData ? trafficData.slice(0, 5) : "No recent traffic"
         };
 
+        // Append streamed text to the reply in progress (the last message)
+        const appendToReply = (text) => setMessages(prev => {
+            const last = prev[prev.length - 1];
+            return [...prev.slice(0, -1), { ...last, content: last.content + text }];
+        });
+
         try {
-            const response = await axios.post(`${API_BASE_URL}/api/chat`, {
-                messages: [...messages, userMsg].map(m => ({ role: m.role, content: m.content })),
-                model: modelName,
-                context_data: contextData
+            const response = await fetch(`${API_BASE_URL}/api/chat`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    messages: [...messages, userMsg].map(m => ({ role: m.role, content: m.content })),
+                    model: modelName,
+                    context_data: contextData,
+                    stream: true
+                })
             });
+            if (!response.ok) {
+                const body = await response.json().catch(() => ({}));
+                throw new Error(body.detail || "Could not connect to AI. Is Ollama running locally?");
+            }
 
-            const aiMsg = response.data;
-            setMessages(prev => [...prev, aiMsg]);
+            // Server-sent events: `data: {"content": ...}` per token, then `event: done` or `event: error`
+            setMessages(prev => [...prev, { role: 'assistant', content: '' }]);
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            for (;;) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                events.forEach(raw => {
+                    const event = raw.match(/^event: (.*)$/m)?.[1];
+                    const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+                    if (event === 'error') appendToReply(`\n\nError: ${data.detail}`);
+                    else if (data.content) appendToReply(data.content);
+                });
+            }
         } catch (err) {
             console.error('Chat error:', err);
             setMessages(prev => [...prev, {
                 role: 'assistant',
-                content: `Error: ${err.response?.data?.detail || "Could not connect to AI. Is Ollama running locally?"}`
+                content: `Error: ${err.message || "Could not connect to AI. Is Ollama running locally?"}`
             }]);
         } finally {
             setLoading(false);
@@ -3,6 +3,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import axios from 'axios';
 import config from '../config';
+import { fetchColumnar } from '../utils/columnar';
 
 const DashboardContext = createContext();
 const API_BASE_URL = config.apiBaseUrl;
@@ -14,6 +15,9 @@ export function DashboardProvider({ children }) {
     const [capacitySummary, setCapacitySummary] = useState(null);
     const [trafficData, setTrafficData] = useState(null);
     const [allLinksTraffic, setAllLinksTraffic] = useState(null);
+    // Live rolling stats per link ({ link_id: { t, last, mean, peak, p95, n, total, points } }),
+    // pushed by the backend; no polling
+    const [liveTraffic, setLiveTraffic] = useState({});
 
     // UI State
     const [selectedLink, setSelectedLink] = useState('Link_A');
@@ -34,15 +38,17 @@ export function DashboardProvider({ children }) {
     // Fetch all links traffic for comparison
     const fetchAllLinksTraffic = useCallback(async () => {
         try {
-            const response = await axios.get(`${API_BASE_URL}/api/link-traffic`);
-            const allData = response.data;
+            const { columns } = await fetchColumnar(axios, `${API_BASE_URL}/api/link-traffic`);
+            const times = columns.time_seconds.values;
+            const gbps = columns.aggregated_gbps.values;
+            const links = columns.link_id;
 
             // Group by link_id
             const grouped = {};
-            allData.forEach(item => {
-                const link = item.link_id;
+            links.values.forEach((code, i) => {
+                const link = links.categories[code];
                 if (!grouped[link]) grouped[link] = [];
-                grouped[link].push(item);
+                grouped[link].push({ time_seconds: times[i], link_id: link, aggregated_gbps: gbps[i] });
             });
 
             setAllLinksTraffic(grouped);
@@ -105,12 +111,25 @@ export function DashboardProvider({ children }) {
         }
     }, [selectedLink, isInitialized, fetchTrafficData]);
 
+    // Subscribe to live traffic: a full snapshot first, then deltas of changed links
+    useEffect(() => {
+        if (typeof window === 'undefined' || !window.EventSource) return undefined;
+        const source = new EventSource(`${API_BASE_URL}/api/live/stream`);
+        source.addEventListener('snapshot', (e) => setLiveTraffic(JSON.parse(e.data).links));
+        source.addEventListener('delta', (e) => {
+            const { links } = JSON.parse(e.data);
+            setLiveTraffic(prev => ({ ...prev, ...links }));
+        });
+        return () => source.close();
+    }, []);
+
     const value = {
         topology,
         correlation,
         capacitySummary,
         trafficData,
         allLinksTraffic,
+        liveTraffic,
         selectedLink,
         setSelectedLink,
         loading,
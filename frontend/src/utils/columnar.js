@@ -0,0 +1,45 @@
+/**
+ * Columnar binary responses (see backend/wire_format.py)
+ * Buffers are viewed in place as typed arrays; nothing is parsed per row.
+ */
+
+export const COLUMNAR_MEDIA_TYPE = 'application/vnd.columnar';
+
+const ARRAY_TYPES = {
+    float64: Float64Array,
+    float32: Float32Array,
+    int64: BigInt64Array,
+    int32: Int32Array,
+    uint8: Uint8Array,
+};
+
+// Decode an ArrayBuffer into { columns: {name: {values, shape, categories}}, meta }
+export function decodeColumnar(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+    if (magic !== 'COLB') throw new Error('Not a columnar response');
+
+    const headerSize = view.getUint32(4, true);
+    const start = 8 + headerSize;
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerSize)));
+
+    const columns = {};
+    header.columns.forEach(col => {
+        const Type = ARRAY_TYPES[col.dtype];
+        columns[col.name] = {
+            values: new Type(buffer, start + col.offset, col.nbytes / Type.BYTES_PER_ELEMENT),
+            shape: col.shape,
+            categories: col.categories || null,
+        };
+    });
+    return { columns, meta: header.meta };
+}
+
+// GET a columnar endpoint with axios-like ergonomics
+export async function fetchColumnar(axios, url) {
+    const response = await axios.get(url, {
+        responseType: 'arraybuffer',
+        headers: { Accept: COLUMNAR_MEDIA_TYPE },
+    });
+    return decodeColumnar(response.data);
+}
@@ -1,69 +1,64 @@
+"""
+Generate synthetic traffic for load-testing the pipeline.
 
-import pandas as pd
-import numpy as np
+Streams link-level traffic (the /api/upload schema), cell-level traffic
+with loss (the topology inference input) and the ground-truth topology
+into --out-dir, in constant memory. See src/traffic_generator.py for the
+model.
 
-# Configuration
-NUM_LINKS = 5
-DURATION_SECONDS = 600  # 10 minutes
-LINKS = [f'Link_Test_{i}' for i in range(1, NUM_LINKS + 1)]
+    python generate_mock_data.py --links 3 --cells-per-link 8 --duration 600 --slot 0.0005
+    python generate_mock_data.py --links 50 --cells-per-link 20,40 --duration 3600 --format columnar
+"""
+import argparse
+import time
+from pathlib import Path
 
-# Generate Time Series
-time_seconds = np.arange(0, DURATION_SECONDS, 0.1) # 100ms intervals
-data = []
+from src.traffic_generator import BURST_MODELS, generate
 
-for link in LINKS:
-    # Randomize traffic pattern for each link
-    base_load = np.random.uniform(2, 5)
-    amplitude = np.random.uniform(1, 3)
-    frequency = np.random.uniform(0.01, 0.05)
-    phase = np.random.uniform(0, 2 * np.pi)
-    noise_level = 0.2
-    
-    # Generate Traffic (Sine wave + Noise)
-    traffic = base_load + amplitude * np.sin(2 * np.pi * frequency * time_seconds + phase)
-    traffic += np.random.normal(0, noise_level, len(time_seconds))
-    traffic = np.maximum(traffic, 0) # Ensure non-negative
-    
-    # Burstiness (Random spikes)
-    if np.random.rand() > 0.5:
-        spike_indices = np.random.choice(len(time_seconds), size=int(len(time_seconds) * 0.01), replace=False)
-        traffic[spike_indices] *= np.random.uniform(1.5, 3.0)
 
-    for t, val in zip(time_seconds, traffic):
-        data.append({
-            'time_seconds': round(t, 2),
-            'link_id': link,
-            'aggregated_gbps': round(val, 4)
-        })
+def _cells_per_link(text: str):
+    lo, _, hi = text.partition(",")
+    return int(lo) if not hi else (int(lo), int(hi))
 
-# Create DataFrame
-df = pd.DataFrame(data)
 
-# Save to CSV
-# Save to CSV
-output_path = r'd:\Project2\artifacts\link_traffic_timeseries.csv'
-df.to_csv(output_path, index=False)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic fronthaul traffic.")
+    parser.add_argument("--links", type=int, default=3)
+    parser.add_argument("--cells-per-link", type=_cells_per_link, default=8,
+                        help="cells per link, or MIN,MAX for random sizes")
+    parser.add_argument("--duration", type=float, default=600.0, help="seconds")
+    parser.add_argument("--slot", type=float, default=None, help="slot length in seconds (default: config)")
+    parser.add_argument("--burst-model", choices=BURST_MODELS, default="onoff")
+    parser.add_argument("--max-lag", type=int, default=None, help="per-cell delay range in slots")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=("csv", "columnar"), default="csv")
+    parser.add_argument("--level", choices=("links", "cells", "both"), default="both")
+    parser.add_argument("--out-dir", type=Path, default=Path(__file__).parent / "artifacts" / "generated")
+    args = parser.parse_args(argv)
 
-df.to_csv(output_path, index=False)
+    model = {"n_links": args.links, "cells_per_link": args.cells_per_link,
+             "burst_model": args.burst_model, "seed": args.seed}
+    if args.slot is not None:
+        model["slot_s"] = args.slot
+    if args.max_lag is not None:
+        model["max_lag"] = args.max_lag
 
-print(f"Mock dataset generated at: {output_path}")
+    t0 = time.perf_counter()
+    last = [0.0]
 
-# Generate Capacity Summary
-print("Generating capacity summary...")
-capacity_stats = df.groupby('link_id')['aggregated_gbps'].agg(['mean', 'max', lambda x: x.quantile(0.95)]).reset_index()
-capacity_stats.columns = ['link_id', 'avg_gbps', 'peak_gbps', 'p95_gbps']
+    def progress(fraction):
+        if fraction - last[0] >= 0.1 or fraction >= 1.0:
+            last[0] = fraction
+            print(f"  {fraction:6.1%}  {time.perf_counter() - t0:7.1f} s")
 
-def calc_buffer(row):
-    burstiness = row['peak_gbps'] / (row['avg_gbps'] + 0.001)
-    savings_factor = 0.2 if burstiness > 1.5 else 0.05
-    return row['peak_gbps'] * (1 - savings_factor)
+    summary = generate(args.out_dir, args.duration, fmt=args.format, level=args.level,
+                       progress=progress, **model)
+    seconds = time.perf_counter() - t0
+    for name, path in summary["paths"].items():
+        print(f"{name:>5}: {summary['rows'][name]:,} rows -> {path}")
+    print(f"{sum(summary['rows'].values()) / seconds:,.0f} rows/s in total")
+    print(f"Ground truth topology: {summary['ground_truth']}")
 
-capacity_stats['capacity_no_buffer_gbps'] = capacity_stats['peak_gbps'] * 1.1 # 10% headroom
-capacity_stats['capacity_with_buffer_gbps'] = capacity_stats.apply(calc_buffer, axis=1) * 1.1
 
-capacity_output_path = r'd:\Project2\artifacts\link_capacity_summary.csv'
-capacity_stats.to_csv(capacity_output_path, index=False)
-print(f"Capacity summary generated at: {capacity_output_path}")
-
-print(f"Total Rows: {len(df)}")
-print(f"Links: {LINKS}")
+if __name__ == "__main__":
+    main()
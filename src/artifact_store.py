@@ -0,0 +1,278 @@
+"""
+Columnar on-disk artifact store.
+
+Each table lives in a `<name>.cols/` directory next to its CSV: one raw
+little-endian array per column plus a small `manifest.json`. Text columns
+are stored as categorical codes with their categories in the manifest.
+Readers open the arrays with np.memmap, so loading costs a few syscalls
+instead of a CSV parse and pages are shared between worker processes.
+
+The manifest is written last with os.replace and names versioned column
+files, so a reader always sees either the old table or the new one.
+"""
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+STORE_SUFFIX = ".cols"
+EXPORT_CHUNK_ROWS = 250_000
+
+
+def store_path(csv_path: Path) -> Path:
+    """Columnar store directory that mirrors a CSV artifact."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + STORE_SUFFIX)
+
+
+def _source_stamp(csv_path: Path):
+    try:
+        st = os.stat(csv_path)
+    except FileNotFoundError:
+        return None
+    return {"name": Path(csv_path).name, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_manifest(directory: Path):
+    """Parsed manifest of a store, or None if there is none."""
+    try:
+        with open(Path(directory) / MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _drop_replaced(directory: Path, previous, manifest: dict) -> None:
+    # drop the column files of the version this one replaced; readers
+    # that still map them keep their pages until they let go
+    if previous is None:
+        return
+    live = {col["file"] for col in manifest["columns"]}
+    for col in previous["columns"]:
+        if col["file"] not in live:
+            try:
+                (directory / col["file"]).unlink()
+            except OSError:
+                pass
+
+
+class ColumnarWriter:
+    """
+    Appends DataFrame chunks column by column, so arbitrarily large tables
+    can be written with bounded memory. Call close() to publish.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._token = uuid.uuid4().hex[:12]
+        self._previous = read_manifest(self.directory)
+        self._columns = []          # [{"name", "file", "dtype", "categories"}]
+        self._files = []
+        self._cat_codes = []        # value -> code per categorical column
+        self.n_rows = 0
+
+    def _path(self, col: dict) -> Path:
+        return self.directory / col["file"]
+
+    def _rewrite(self, i: int, values: np.ndarray) -> None:
+        """Re-encode an already written column (dtype promotion)."""
+        self._files[i].close()
+        col = self._columns[i]
+        if col["categories"] is None:
+            col["dtype"] = values.dtype.newbyteorder("<").str
+            data = values.astype(col["dtype"])
+        else:
+            col["dtype"] = "<i4"
+            data = values.astype("<i4")
+        with open(self._path(col), "wb") as f:
+            data.tofile(f)
+        self._files[i] = open(self._path(col), "ab")
+
+    def _read_back(self, i: int) -> np.ndarray:
+        self._files[i].flush()
+        col = self._columns[i]
+        return np.fromfile(self._path(col), dtype=col["dtype"])
+
+    def _encode_categories(self, i: int, series: pd.Series) -> np.ndarray:
+        local_codes, uniques = pd.factorize(series)
+        mapping = self._cat_codes[i]
+        to_global = np.array([mapping.setdefault(u, len(mapping)) for u in uniques], dtype="<i4")
+        codes = np.full(len(series), -1, dtype="<i4")
+        named = local_codes >= 0
+        codes[named] = to_global[local_codes[named]]
+        return codes
+
+    def append(self, df: pd.DataFrame) -> None:
+        if not self._columns:
+            for i, name in enumerate(df.columns):
+                self._columns.append({"name": str(name), "file": f"c{i}.{self._token}.bin",
+                                      "dtype": None, "categories": None})
+                self._files.append(open(self._path(self._columns[-1]), "wb"))
+                self._cat_codes.append({})
+        elif [str(c) for c in df.columns] != [c["name"] for c in self._columns]:
+            raise ValueError("Chunk columns do not match the columns already written")
+
+        for i, name in enumerate(df.columns):
+            col = self._columns[i]
+            series = df.iloc[:, i]
+            numeric = (pd.api.types.is_numeric_dtype(series.dtype)
+                       or pd.api.types.is_datetime64_dtype(series.dtype))
+            numeric = numeric and not isinstance(series.dtype, pd.CategoricalDtype)
+
+            if col["categories"] is None and numeric:
+                values = series.to_numpy()
+                if col["dtype"] is None:
+                    col["dtype"] = values.dtype.newbyteorder("<").str
+                else:
+                    wanted = np.result_type(np.dtype(col["dtype"]), values.dtype)
+                    if wanted != np.dtype(col["dtype"]):
+                        self._rewrite(i, self._read_back(i).astype(wanted))
+                values.astype(col["dtype"], copy=False).tofile(self._files[i])
+                continue
+
+            if col["categories"] is None:
+                col["categories"] = []
+                if col["dtype"] is not None:
+                    # an earlier chunk looked numeric: re-encode it as codes
+                    self._rewrite(i, self._encode_categories(i, pd.Series(self._read_back(i))))
+                col["dtype"] = "<i4"
+            self._encode_categories(i, series).tofile(self._files[i])
+
+        self.n_rows += len(df)
+
+    def close(self, source: Path = None) -> None:
+        """Flush the columns and atomically publish the manifest."""
+        for f in self._files:
+            f.close()
+        for col, mapping in zip(self._columns, self._cat_codes):
+            if col["categories"] is not None:
+                col["categories"] = [v.item() if isinstance(v, np.generic) else v for v in mapping]
+            if col["dtype"] is None:
+                col["dtype"] = "<f8"
+
+        manifest = {
+            "n_rows": self.n_rows,
+            "columns": self._columns,
+            "source": _source_stamp(source) if source is not None else None,
+        }
+        tmp = self.directory / f"{MANIFEST}.{self._token}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.directory / MANIFEST)
+
+        _drop_replaced(self.directory, self._previous, manifest)
+
+    def abort(self) -> None:
+        for f in self._files:
+            f.close()
+        for col in self._columns:
+            self._path(col).unlink(missing_ok=True)
+
+
+def write_frame(df: pd.DataFrame, directory: Path, source: Path = None) -> None:
+    """Write a whole DataFrame as a columnar store."""
+    writer = ColumnarWriter(directory)
+    try:
+        writer.append(df)
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close(source=source)
+
+
+def publish_store(staged: Path, directory: Path) -> None:
+    """
+    Move a finished store from `staged` (same filesystem) over `directory`:
+    column files first, manifest last, so readers switch in one step.
+    """
+    staged, directory = Path(staged), Path(directory)
+    manifest = read_manifest(staged)
+    if manifest is None:
+        raise FileNotFoundError(f"No columnar store at {staged}")
+    directory.mkdir(parents=True, exist_ok=True)
+    previous = read_manifest(directory)
+    for col in manifest["columns"]:
+        os.replace(staged / col["file"], directory / col["file"])
+    os.replace(staged / MANIFEST, directory / MANIFEST)
+    _drop_replaced(directory, previous, manifest)
+    shutil.rmtree(staged, ignore_errors=True)
+
+
+def _map_columns(directory: Path, manifest: dict) -> pd.DataFrame:
+    n = manifest["n_rows"]
+    data = {}
+    for col in manifest["columns"]:
+        if n:
+            arr = np.memmap(directory / col["file"], dtype=col["dtype"], mode="r",
+                            shape=(n,)).view(np.ndarray)
+        else:
+            arr = np.empty(0, dtype=col["dtype"])
+        if col["categories"] is not None:
+            data[col["name"]] = pd.Categorical.from_codes(arr, categories=col["categories"])
+        else:
+            data[col["name"]] = arr
+    return pd.DataFrame(data, copy=False)
+
+
+def open_frame(directory: Path, source: Path = None):
+    """
+    Memory-mapped DataFrame for a store, or None when the store is missing
+    or was written from a different version of `source`.
+    """
+    directory = Path(directory)
+    for _ in range(3):
+        manifest = read_manifest(directory)
+        if manifest is None:
+            return None
+        if source is not None and manifest.get("source") is not None:
+            current = _source_stamp(source)
+            if current is not None and current != manifest["source"]:
+                return None
+        try:
+            return _map_columns(directory, manifest)
+        except FileNotFoundError:
+            continue                    # replaced while mapping: re-read manifest
+    return None
+
+
+def load_table(csv_path: Path) -> pd.DataFrame:
+    """
+    Load a tabular artifact, preferring its columnar store. A missing or
+    stale store is rebuilt from the CSV so the next load is memory-mapped.
+    """
+    csv_path = Path(csv_path)
+    directory = store_path(csv_path)
+    df = open_frame(directory, source=csv_path)
+    if df is not None:
+        return df
+
+    df = pd.read_csv(csv_path)
+    try:
+        write_frame(df, directory, source=csv_path)
+    except OSError as e:
+        print(f"Columnar store not written for {csv_path.name}: {e}")
+        return df
+
+    mapped = open_frame(directory, source=csv_path)
+    return mapped if mapped is not None else df
+
+
+def export_csv(directory: Path, csv_path: Path, chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """Write a store back out as CSV (compatibility export), chunk by chunk."""
+    df = open_frame(directory)
+    if df is None:
+        raise FileNotFoundError(f"No columnar store at {directory}")
+    csv_path = Path(csv_path)
+    tmp = csv_path.with_name(csv_path.name + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        if len(df) == 0:
+            df.to_csv(f, index=False)
+        for start in range(0, len(df), chunk_rows):
+            df.iloc[start:start + chunk_rows].to_csv(f, header=(start == 0), index=False)
+    os.replace(tmp, csv_path)
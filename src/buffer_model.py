@@ -1,34 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from config import BUFFER_DURATION_S, MAX_LOSS_FRAC
+
+# Gaps between forced overflows up to this many slots are simulated in
+# lock-step across all gaps; longer ones are scanned in blocks of slots
+# that grow from _SCAN_WINDOW to _SCAN_BLOCK.
+_LOCKSTEP_MAX_GAP = 32
+_SCAN_WINDOW = 64
+_SCAN_BLOCK = 1 << 16
+_EPS = np.finfo(np.float64).eps
+
+# Called with the number of bisection steps and the kind of search, when
+# set (the API points them at its metrics): "full" for every
+# capacity_with_buffer search, "warm" for every window capacity_near
+# searches. curve_observer gets the evaluations of every capacity_curve
+# sweep, which covers a whole (buffer, loss) grid. Searches running in
+# worker processes are not reported.
+bisection_observer = None
+curve_observer = None
+
+
+def _count_gap_overflows(excess: np.ndarray, start: int, stop: int,
+                         B_gb: float, limit: int) -> int:
+    """
+    Exact token-bucket scan of excess[start:stop] starting from an empty
+    buffer.
+
+    Each block gets one np.cumsum, which accumulates in the same order as
+    `buf += e`, so its first stretch (up to the first overflow) is the
+    buffer bit for bit. Later overflows in the block are read off as
+    differences of that cumsum, with one searchsorted each; a difference
+    within a rounding-error bound of B_gb is not trusted, and that stretch
+    is summed again from its own start. Counts therefore match the
+    slot-by-slot loop exactly, without a Python step per slot or window.
+    """
+    cnt = 0
+    buf = 0.0
+    r = start
+    width = _SCAN_WINDOW
+    while r < stop:
+        hi = min(r + width, stop)
+        if buf:
+            seg = np.cumsum(np.concatenate(([buf], excess[r:hi])))[1:]
+        else:
+            seg = np.cumsum(excess[r:hi])
+        n = len(seg)
+        # bounds |(seg[k] - seg[p-1]) - exact buffer| for any stretch p..k
+        slack = 4.0 * (n + 2) * _EPS * (float(seg[-1]) + B_gb)
+        above, below = B_gb + slack, B_gb - slack
+        item = seg.item
+
+        p, base = 0, 0.0                         # stretch start, seg before it
+        while True:
+            k = int(seg.searchsorted(base + B_gb, side="right"))
+            if p and (k == n or item(k) - base <= above
+                      or (k > p and item(k - 1) - base > below)):
+                # too close to call, or running past the block: re-sum the
+                # stretch in slot order (it must cross by `end` if anywhere)
+                end = int(seg.searchsorted(base + above, side="right"))
+                exact = np.cumsum(excess[r + p:r + min(end + 1, n)])
+                j = int(exact.searchsorted(B_gb, side="right"))
+                k = p + j if j < len(exact) else n
+                if k == n:
+                    buf = float(exact[-1])
+            elif k == n:
+                buf = float(seg[-1])
+            if k == n:
+                break                            # stretch carries on into the next block
+
+            cnt += 1
+            if cnt > limit:
+                return cnt
+            p, base = k + 1, item(k)
+            if p == n:
+                buf = 0.0
+                break
+
+        r = hi
+        width = min(width * 2, _SCAN_BLOCK)
+
+    return cnt
+
+
+def _count_overflows(excess: np.ndarray, B_gb: float, limit: int) -> int:
+    """
+    Overflow count of the token-bucket buffer for the positive excess
+    slots of one candidate capacity (time order preserved, zeros removed).
+    Counting stops as soon as it exceeds `limit`.
+    """
+    m = len(excess)
+    if m == 0:
+        return 0
+
+    # A slot whose own excess exceeds the buffer always overflows and
+    # empties the buffer, so it splits the trace into independent gaps.
+    forced = np.flatnonzero(excess > B_gb)
+    cnt = len(forced)
+    if cnt > limit:
+        return cnt
+
+    starts = np.concatenate(([0], forced + 1))
+    stops = np.concatenate((forced, [m]))
+    lengths = stops - starts
+
+    # A single slot below B_gb can never overflow on its own.
+    keep = lengths >= 2
+    starts, stops, lengths = starts[keep], stops[keep], lengths[keep]
+    if len(starts) == 0:
+        return cnt
+
+    short = lengths <= _LOCKSTEP_MAX_GAP
+    if short.any():
+        s, ln = starts[short], lengths[short]
+        width = int(ln.max())
+        cols = np.arange(width)
+        valid = cols[None, :] < ln[:, None]
+        grid = np.zeros((len(s), width))
+        grid[valid] = excess[(s[:, None] + cols[None, :])[valid]]
+
+        buf = np.zeros(len(s))
+        for j in range(width):
+            buf += grid[:, j]
+            over = buf > B_gb
+            cnt += int(np.count_nonzero(over))
+            buf[over] = 0.0
+        if cnt > limit:
+            return cnt
+
+    for start, stop in zip(starts[~short].tolist(), stops[~short].tolist()):
+        cnt += _count_gap_overflows(excess, start, stop, B_gb, limit - cnt)
+        if cnt > limit:
+            return cnt
+
+    return cnt
+
+
+class OverflowEngine:
+    """
+    Evaluates token-bucket overflow counts of one traffic trace for many
+    candidate capacities.
+
+    Only slots above the current floor are kept, so once a search has
+    ruled out everything below some capacity every later evaluation
+    touches just the slots that can still overflow.
+    """
+
+    def __init__(self, aggregated_gbps: np.ndarray,
+                 buffer_duration_s: float = BUFFER_DURATION_S):
+        arr = np.asarray(aggregated_gbps, dtype=np.float64)
+        self.n = len(arr)
+        self.buffer_duration_s = buffer_duration_s
+
+        # NaN poisons the running buffer for good: nothing after the
+        # first NaN slot can overflow in the slot-by-slot simulation.
+        nan_at = np.flatnonzero(np.isnan(arr))
+        if len(nan_at):
+            arr = arr[:nan_at[0]]
+        self._n_valid = len(arr)
+
+        self._floor = -np.inf
+        self._vals = arr
+
+    def loss_limit(self, max_loss_frac: float = MAX_LOSS_FRAC) -> int:
+        """Largest overflow count k with k / n <= max_loss_frac."""
+        if self.n == 0:
+            return 0
+        k = max(int(max_loss_frac * self.n), 0)
+        while (k + 1) / self.n <= max_loss_frac:
+            k += 1
+        while k > 0 and k / self.n > max_loss_frac:
+            k -= 1
+        return k
+
+    def raise_floor(self, cap_gbps: float) -> None:
+        """Drop slots that cannot exceed any capacity >= cap_gbps."""
+        if cap_gbps > self._floor:
+            self._vals = self._vals[self._vals > cap_gbps]
+            self._floor = cap_gbps
+
+    def count(self, cap_gbps: float, limit: int = None) -> int:
+        """
+        Overflow count at capacity cap_gbps.  With a limit, counting may
+        stop early and any value above the limit means "infeasible".
+        """
+        if self.n == 0:
+            return 0
+        if limit is None:
+            limit = self.n
+
+        B_gb = cap_gbps * self.buffer_duration_s
+        if B_gb < 0:
+            return self._n_valid                 # every slot overflows
+        if cap_gbps < self._floor:
+            raise ValueError(f"capacity {cap_gbps} is below the engine floor {self._floor}")
+
+        vals = self._vals
+        excess = vals[vals > cap_gbps] - cap_gbps
+        return _count_overflows(excess, B_gb, limit)
+
+    def counts(self, caps_gbps, limit: int = None) -> np.ndarray:
+        """Overflow counts for many candidates in one ascending sweep."""
+        caps = np.asarray(caps_gbps, dtype=np.float64)
+        out = np.zeros(len(caps), dtype=np.int64)
+        if self.n == 0:
+            return out
+        if limit is None:
+            limit = self.n
+
+        vals = self._vals
+        for i in np.argsort(caps, kind="stable"):
+            cap = caps[i]
+            B_gb = cap * self.buffer_duration_s
+            if B_gb < 0:
+                out[i] = self._n_valid
+                continue
+            vals = vals[vals > cap]
+            out[i] = _count_overflows(vals - cap, B_gb, limit)
+        return out
+
+
 def _compute_overflow_fraction(aggregated_gbps: np.ndarray,
                                candidate_cap_gbps: float) -> float:
     """
     Simulate a token-bucket buffer.
     Returns fraction of slots that overflowed.
     """
-
-    n = len(aggregated_gbps)
-    if n == 0:
+    engine = OverflowEngine(aggregated_gbps)
+    if engine.n == 0:
         return 0.0   # no traffic → no overflow
 
-    B_gb = candidate_cap_gbps * BUFFER_DURATION_S
-    excess = np.maximum(aggregated_gbps - candidate_cap_gbps, 0.0)
-
-    overflow_cnt = 0
-    buf = 0.0
+    return engine.count(candidate_cap_gbps) / engine.n
 
-    for e in excess:
-        buf += e
-        if buf > B_gb:
-            overflow_cnt += 1
-            buf = 0.0
 
-    return overflow_cnt / n
 
+def _bisect(engine: OverflowEngine, lo: float, hi: float, limit: int,
+            tol: float) -> tuple:
+    """
+    Bisect [lo, hi] (lo infeasible, hi feasible) down to tol, or 60
+    steps. Returns (capacity, steps).
+    """
+    steps = 0
+    while steps < 60 and hi - lo >= tol:
+        mid = (lo + hi) / 2.0
+        steps += 1
+        if engine.count(mid, limit) <= limit:
+            hi = mid                             # feasible → try lower
+        else:
+            lo = mid                             # too lossy → raise
+            engine.raise_floor(lo)
+    return hi, steps
 
 
-def capacity_with_buffer(series: pd.Series, tol: float = 1e-6) -> float:
+def capacity_with_buffer(series: pd.Series, tol: float = 1e-6,
+                         buffer_duration_s: float = BUFFER_DURATION_S,
+                         max_loss_frac: float = MAX_LOSS_FRAC) -> float:
     """
     Binary-search for the smallest capacity C such that
-    overflow_fraction(C) ≤ MAX_LOSS_FRAC.
+    overflow_fraction(C) ≤ max_loss_frac.
 
     Search range : [mean, peak]
     Termination  : |hi − lo| < tol  or  60 bisections
@@ -37,16 +266,167 @@ def capacity_with_buffer(series: pd.Series, tol: float = 1e-6) -> float:
     lo  = float(series.mean())
     hi  = float(series.max())
 
-    if _compute_overflow_fraction(arr, lo) <= MAX_LOSS_FRAC:
-        return lo                                # mean already safe
+    engine = OverflowEngine(arr, buffer_duration_s)
+    limit  = engine.loss_limit(max_loss_frac)
 
-    for _ in range(60):
-        mid = (lo + hi) / 2.0
-        if hi - lo < tol:
-            break
-        if _compute_overflow_fraction(arr, mid) <= MAX_LOSS_FRAC:
-            hi = mid                             # feasible → try lower
+    steps = 0
+    if engine.count(lo, limit) <= limit:
+        hi = lo                                  # mean already safe
+    else:
+        engine.raise_floor(lo)
+        hi, steps = _bisect(engine, lo, hi, limit, tol)
+
+    if bisection_observer is not None:
+        bisection_observer(steps, "full")
+    return hi
+
+
+def capacity_near(engine: OverflowEngine, lo: float, hi: float, guess: float,
+                  delta: float, tol: float = 1e-6) -> tuple:
+    """
+    capacity_with_buffer for one window, warm-started from `guess` (the
+    capacity of the neighbouring window) within the window's [mean, peak]
+    range [lo, hi].
+
+    The guess is probed first. If it is too lossy, the floor jumps straight
+    to it and the (expensive, nearly every slot is above the mean) mean
+    check is skipped; the search then walks up in steps of delta,
+    doubling each time, until a feasible capacity brackets the answer.
+    If the guess is feasible the walk goes down instead and only checks
+    the mean when it gets there. The bracket, a few delta wide when
+    adjacent windows need similar capacities, is then bisected to tol.
+
+    Returns (capacity, steps), counting steps like capacity_with_buffer
+    (evaluations other than the mean check).
+    """
+    limit = engine.loss_limit(MAX_LOSS_FRAC)
+    steps = 0
+    if not lo < guess < hi:
+        if engine.count(lo, limit) <= limit:
+            return lo, 0                         # mean already safe
+        engine.raise_floor(lo)
+    else:
+        delta = max(delta, tol)
+        steps += 1
+        if engine.count(guess, limit) <= limit:
+            hi = guess
+            while True:                          # walk down until infeasible
+                probe = hi - delta
+                if probe <= lo:
+                    if engine.count(lo, limit) <= limit:
+                        return lo, steps         # mean already safe
+                    engine.raise_floor(lo)
+                    break
+                steps += 1
+                if engine.count(probe, limit) > limit:
+                    lo = probe
+                    engine.raise_floor(lo)
+                    break
+                hi = probe
+                delta *= 2
         else:
-            lo = mid                             # too lossy → raise
+            lo = guess
+            engine.raise_floor(lo)
+            while lo + delta < hi:               # walk up until feasible
+                steps += 1
+                if engine.count(lo + delta, limit) <= limit:
+                    hi = lo + delta
+                    break
+                lo += delta
+                engine.raise_floor(lo)
+                delta *= 2
+
+    cap, n = _bisect(engine, lo, hi, limit, tol)
+    steps += n
+    if bisection_observer is not None:
+        bisection_observer(steps, "warm")
+    return cap, steps
+
+
+def capacity_curve(aggregated_gbps: np.ndarray, buffers_s, loss_fracs,
+                   tol: float = 1e-6) -> tuple:
+    """
+    capacity_with_buffer for every (buffer depth, loss target) pair of a
+    grid over one trace. Returns (capacities of shape
+    (len(buffers_s), len(loss_fracs)), overflow-count evaluations).
+
+    All loss targets of one buffer depth share a single search. Every
+    evaluation yields the overflow count itself, not just pass/fail, so
+    it tightens the bracket of every target at once, and the next probe
+    halves the widest bracket left. Depths run from shallow to deep.
+    Each depth first probes the capacities the two previous depths point
+    to, then walks outwards from them in doubling steps until every
+    target is bracketed, so the bisections start from brackets about as
+    wide as the capacity moved between depths rather than [mean, peak].
+    The mean, the most expensive point to evaluate, is only checked for
+    targets whose search never left it. Each result is within tol of what
+    capacity_with_buffer returns for that pair.
+    """
+    arr = np.asarray(aggregated_gbps, dtype=np.float64)
+    buffers = np.asarray(buffers_s, dtype=np.float64)
+    losses = np.asarray(loss_fracs, dtype=np.float64)
+    out = np.full((len(buffers), len(losses)), np.nan)
+    valid = arr[~np.isnan(arr)]
+    if len(valid) == 0 or len(losses) == 0:
+        return out, 0
+    mean, peak = float(valid.mean()), float(valid.max())
+
+    evaluations = 0
+    previous = before = None
+    for i in np.argsort(buffers, kind="stable"):
+        engine = OverflowEngine(arr, float(buffers[i]))
+        limits = np.array([engine.loss_limit(f) for f in losses])
+        cap_limit = int(limits.max())
+        lo = np.full(len(losses), mean)         # infeasible, or the unchecked mean
+        hi = np.full(len(losses), peak)         # feasible
+        checked = np.zeros(len(losses), dtype=bool)
+
+        def probe(cap):
+            count = engine.count(cap, cap_limit)
+            ok = count <= limits
+            np.minimum(hi, np.where(ok, cap, np.inf), out=hi)
+            bad = ~ok & (cap >= lo)
+            lo[bad] = cap
+            checked[bad] = True
+            engine.raise_floor(float(lo.min()))
+
+        if previous is not None:
+            # where each target's capacity was, and where its trend points
+            guesses = [previous] if before is None else [previous, 2 * previous - before]
+            for cap in np.unique(np.concatenate(guesses)):
+                if mean < cap < peak:
+                    probe(float(cap))
+                    evaluations += 1
+            # widen one-sided brackets from there in doubling steps
+            moved = np.abs(previous - before) if before is not None else np.full(len(losses), (peak - mean) / 64)
+            step = np.maximum(moved, tol)
+            for j in range(len(losses)):
+                d = step[j]
+                while not checked[j] and hi[j] - d > mean:
+                    probe(hi[j] - d)
+                    evaluations += 1
+                    d *= 2
+                d = step[j]
+                while hi[j] == peak and lo[j] + d < peak:
+                    probe(lo[j] + d)
+                    evaluations += 1
+                    d *= 2
+        for _ in range(60 * len(losses)):
+            width = hi - lo
+            j = int(np.argmax(width))
+            if width[j] < tol:
+                break
+            probe((lo[j] + hi[j]) / 2.0)
+            evaluations += 1
 
-    return hi
\ No newline at end of file
+        caps = hi.copy()
+        unchecked = ~checked
+        if unchecked.any():
+            mean_count = engine.count(mean, cap_limit)
+            safe = unchecked & (mean_count <= limits)
+            caps[safe] = mean                    # mean already safe
+        out[i] = caps
+        before, previous = previous, caps
+    if curve_observer is not None:
+        curve_observer(evaluations)
+    return out, evaluations
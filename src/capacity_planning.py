@@ -1,37 +1,176 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
 
-from src.buffer_model import capacity_with_buffer
+from config import ANALYSIS_WINDOW_S
+from src.buffer_model import OverflowEngine, capacity_curve, capacity_near, capacity_with_buffer
+
+# Windows per timeline request, at most.
+MAX_TIMELINE_WINDOWS = 100_000
+
+# Default (buffer depth, loss target) grid of capacity curves.
+CURVE_BUFFERS_S = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2)
+CURVE_LOSS_FRACS = (1e-4, 1e-3, 1e-2)
+MAX_CURVE_POINTS = 1024
 
 def capacity_no_buffer(series: pd.Series) -> float:
     """Required capacity when no buffer is present = peak traffic."""
     return float(series.max())
 
+def _link_row(link_id: str, values: np.ndarray) -> dict:
+    """Summary row for one link (runs in a worker process when parallel)."""
+    s = pd.Series(values, name="aggregated_gbps")
+
+    return {
+        "link_id": link_id,
+        "avg_gbps": round(s.mean(), 4),
+        "peak_gbps": round(s.max(), 4),
+        "p95_gbps": round(s.quantile(0.95), 4),
+        "capacity_no_buffer_gbps": round(capacity_no_buffer(s), 4),
+        "capacity_with_buffer_gbps": round(capacity_with_buffer(s), 4),
+    }
+
 def build_capacity_summary(link_traffic: pd.DataFrame,
-                           topology: dict) -> pd.DataFrame:
-    """One row per link with all required statistics."""
+                           topology: dict,
+                           workers: int = 1) -> pd.DataFrame:
+    """
+    One row per link with all required statistics.
+
+    The traffic is grouped once; with workers > 1 (or None for one per
+    CPU) the per-link buffer sizing runs in a process pool.
+    """
 
-    rows = []
+    # one pass over the frame instead of a boolean mask per link
+    groups = {
+        link_id: g.to_numpy()
+        for link_id, g in link_traffic.groupby("link_id", sort=False)["aggregated_gbps"]
+    }
 
+    link_ids = []
     # ✅ iterate ONLY over inferred links
     for link_id in topology["links"].keys():
 
-        s = link_traffic.loc[
-            link_traffic["link_id"] == link_id,
-            "aggregated_gbps"
-        ]
-
         # defensive check
-        if s.empty:
+        if link_id not in groups or len(groups[link_id]) == 0:
             print(f"⚠️  No traffic data for {link_id}, skipping")
             continue
 
-        rows.append({
-            "link_id": link_id,
-            "avg_gbps": round(s.mean(), 4),
-            "peak_gbps": round(s.max(), 4),
-            "p95_gbps": round(s.quantile(0.95), 4),
-            "capacity_no_buffer_gbps": round(capacity_no_buffer(s), 4),
-            "capacity_with_buffer_gbps": round(capacity_with_buffer(s), 4),
-        })
+        link_ids.append(link_id)
+
+    values = [groups[link_id] for link_id in link_ids]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(link_ids))
+
+    if workers <= 1:
+        rows = list(map(_link_row, link_ids, values))
+    else:
+        chunksize = max(1, len(link_ids) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_link_row, link_ids, values, chunksize=chunksize))
+
+    return pd.DataFrame(rows)
+
+
+def window_bounds(times: np.ndarray, window_s: float, step_s: float) -> tuple:
+    """
+    Sample ranges [lo, hi) of the windows [t0 + k*step_s, t0 + k*step_s + window_s)
+    over time-sorted `times`, from the first sample until a window holds
+    the last one. step_s == window_s gives tumbling windows, smaller steps
+    rolling (overlapping) ones.
+    """
+    if len(times) == 0:
+        return np.zeros(0), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    t0 = float(times[0])
+    span = float(times[-1]) - t0
+    n = 1 if span < window_s else int((span - window_s) // step_s) + 2
+    if n > MAX_TIMELINE_WINDOWS:
+        raise ValueError(f"{n} windows requested; at most {MAX_TIMELINE_WINDOWS} (use a larger step_s)")
+    starts = t0 + np.arange(n) * step_s
+    lo = times.searchsorted(starts, side="left")
+    hi = times.searchsorted(starts + window_s, side="left")
+    return starts, lo, hi
+
+
+def capacity_timeline(times: np.ndarray, values: np.ndarray,
+                      window_s: float = ANALYSIS_WINDOW_S, step_s: float = None,
+                      tol: float = 1e-6) -> dict:
+    """
+    Required capacity (capacity_with_buffer) per window of one link's
+    time-sorted traffic.
+
+    Windows are views of the link's arrays, never copies. Each window's
+    search starts from the previous window's capacity and widens by how
+    much the capacity moved last time (see capacity_near), so on slowly
+    varying traffic most windows settle in a handful of evaluations
+    instead of a full bisection over [mean, peak]. Windows without
+    samples get NaN.
+    """
+    step_s = window_s if step_s is None else step_s
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    starts, lo, hi = window_bounds(times, window_s, step_s)
+
+    n = len(starts)
+    means, peaks, caps = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    prev = prev_delta = None
+    total_steps = 0
+    for k, (a, b) in enumerate(zip(lo.tolist(), hi.tolist())):
+        window = values[a:b]
+        if b == a or np.isnan(window).all():
+            continue
+        mean, peak = float(np.nanmean(window)), float(np.nanmax(window))
+        engine = OverflowEngine(window)
+        if prev is None:
+            guess, delta = np.nan, 0.0
+        else:
+            guess = prev
+            delta = prev_delta if prev_delta else (peak - mean) / 64
+        cap, steps = capacity_near(engine, mean, peak, guess, delta, tol)
+        if prev is not None:
+            prev_delta = abs(cap - prev)
+        prev = cap
+        means[k], peaks[k], caps[k] = mean, peak, cap
+        total_steps += steps
+
+    return {
+        "start": starts,
+        "end": starts + window_s,
+        "samples": hi - lo,
+        "mean_gbps": means,
+        "peak_gbps": peaks,
+        "capacity_with_buffer_gbps": caps,
+        "bisection_steps": total_steps,
+    }
+
+
+def capacity_curves(link_values: dict, buffers_s=CURVE_BUFFERS_S,
+                    loss_fracs=CURVE_LOSS_FRACS, tol: float = 1e-6) -> dict:
+    """
+    Required capacity over a (buffer depth, loss target) grid for each
+    link in `link_values` (link id -> traffic in time order), one shared
+    sweep per link (see capacity_curve).
+    """
+    buffers = sorted(set(float(b) for b in buffers_s))
+    losses = sorted(set(float(f) for f in loss_fracs))
+    if not buffers or not losses:
+        raise ValueError("At least one buffer depth and one loss target are required")
+    if len(buffers) * len(losses) > MAX_CURVE_POINTS:
+        raise ValueError(f"At most {MAX_CURVE_POINTS} (buffer, loss) pairs per request")
+    if buffers[0] <= 0 or losses[0] < 0 or losses[-1] >= 1:
+        raise ValueError("Buffer depths must be positive and loss targets in [0, 1)")
 
-    return pd.DataFrame(rows)
\ No newline at end of file
+    links = {}
+    for link_id, values in link_values.items():
+        values = np.asarray(values, dtype=np.float64)
+        caps, evaluations = capacity_curve(values, buffers, losses, tol)
+        links[link_id] = {
+            "mean_gbps": float(np.nanmean(values)) if np.isfinite(values).any() else np.nan,
+            "peak_gbps": float(np.nanmax(values)) if np.isfinite(values).any() else np.nan,
+            "capacity_with_buffer_gbps": caps,
+            "evaluations": evaluations,
+        }
+    return {"buffer_s": buffers, "loss_frac": losses, "tol": tol, "links": links}
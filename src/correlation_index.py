@@ -0,0 +1,212 @@
+"""
+On-disk index over a correlation matrix for large cell counts.
+
+Built once per version of correlation_matrix.csv into a `<name>.idx/`
+directory next to it, and memory-mapped by readers:
+
+- the top-k most correlated neighbours of every cell,
+- all pairs at or above EDGE_MIN as an edge list sorted by value, so a
+  threshold query is a prefix of it,
+- the matrix in dendrogram (cluster) order as a pyramid of mean-pooled
+  levels, so a zoomed heatmap reads only the rows of the tile it shows.
+
+As in the artifact store, files carry a version token and the manifest
+is replaced last, so readers see either the old index or the new one.
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from src.artifact_store import _source_stamp
+from src.topology_inference import dendrogram_order
+
+INDEX_SUFFIX = ".idx"
+MANIFEST = "manifest.json"
+TOP_K = 32                  # neighbours kept per cell
+EDGE_MIN = 0.3              # lowest threshold an edge query may ask for
+TILE_BASE = 256             # pyramid stops once a level fits one tile this wide
+MAX_TILE = 512              # largest tile side served
+_ROW_BLOCK = 1024
+
+
+def index_path(csv_path: Path) -> Path:
+    """Index directory that belongs to a correlation CSV."""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + INDEX_SUFFIX)
+
+
+def _pool(level: np.ndarray) -> np.ndarray:
+    """Mean of each 2 x 2 block (NaN-aware; odd edges pool what is there)."""
+    n = len(level)
+    m = (n + 1) // 2
+    padded = np.full((2 * m, 2 * m), np.nan, dtype=np.float32)
+    padded[:n, :n] = level
+    blocks = padded.reshape(m, 2, m, 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.nansum(blocks, axis=(1, 3))
+        count = np.sum(~np.isnan(blocks), axis=(1, 3))
+        return np.where(count > 0, total / np.maximum(count, 1), np.nan).astype(np.float32)
+
+
+def build_index(cells, matrix, directory: Path, source: Path = None,
+                top_k: int = TOP_K, edge_min: float = EDGE_MIN) -> None:
+    """Write the index for a symmetric (cells x cells) correlation matrix."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    M = np.asarray(matrix, dtype=np.float64)
+    N = len(M)
+    rank = np.where(np.isfinite(M), M, -np.inf)
+    k = max(0, min(top_k, N - 1))
+
+    nbr_idx = np.zeros((N, k), dtype=np.int32)
+    nbr_val = np.zeros((N, k), dtype=np.float32)
+    edge_parts = []
+    for r0 in range(0, N, _ROW_BLOCK):
+        r1 = min(r0 + _ROW_BLOCK, N)
+        rows = np.arange(r0, r1)
+        block = rank[r0:r1].copy()
+        block[rows - r0, rows] = -np.inf                      # not your own neighbour
+        if k:
+            part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+            vals = np.take_along_axis(block, part, axis=1)
+            ranked = np.argsort(-vals, axis=1, kind="stable")
+            nbr_idx[r0:r1] = np.take_along_axis(part, ranked, axis=1)
+            nbr_val[r0:r1] = np.take_along_axis(vals, ranked, axis=1)
+
+        upper = block >= edge_min
+        upper &= np.arange(N)[None, :] > rows[:, None]          # each pair once, i < j
+        i, j = np.nonzero(upper)
+        edge_parts.append((i + r0, j, block[i, j]))
+
+    ei = np.concatenate([p[0] for p in edge_parts]).astype(np.int32) if edge_parts else np.zeros(0, np.int32)
+    ej = np.concatenate([p[1] for p in edge_parts]).astype(np.int32) if edge_parts else np.zeros(0, np.int32)
+    ev = np.concatenate([p[2] for p in edge_parts]).astype(np.float32) if edge_parts else np.zeros(0, np.float32)
+    by_value = np.argsort(-ev, kind="stable")
+    ei, ej, ev = ei[by_value], ej[by_value], ev[by_value]
+
+    order = dendrogram_order(np.clip(1.0 - np.nan_to_num(M), 0.0, 2.0)) if N else np.zeros(0, np.int64)
+    levels = [M[np.ix_(order, order)].astype(np.float32)]
+    while len(levels[-1]) > TILE_BASE:
+        levels.append(_pool(levels[-1]))
+
+    token = uuid.uuid4().hex[:12]
+    arrays = {"nbr_idx": nbr_idx, "nbr_val": nbr_val, "edge_i": ei, "edge_j": ej,
+              "edge_v": ev, "order": order.astype(np.int32)}
+    arrays.update({f"level{l}": level for l, level in enumerate(levels)})
+    files = {}
+    for name, arr in arrays.items():
+        files[name] = f"{name}.{token}.npy"
+        np.save(directory / files[name], arr)
+
+    manifest = {
+        "n": N,
+        "cells": [c.item() if isinstance(c, np.generic) else c for c in cells],
+        "top_k": k,
+        "edge_min": edge_min,
+        "levels": [len(level) for level in levels],
+        "files": files,
+        "source": _source_stamp(source) if source is not None else None,
+    }
+    previous = _read_manifest(directory)
+    tmp = directory / f"{MANIFEST}.{token}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, directory / MANIFEST)
+
+    if previous is not None:
+        for name in previous["files"].values():
+            if name not in files.values():
+                (directory / name).unlink(missing_ok=True)
+
+
+def _read_manifest(directory: Path):
+    try:
+        with open(Path(directory) / MANIFEST) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class CorrelationIndex:
+    """Read side of an index directory; arrays are memory-mapped."""
+
+    def __init__(self, directory: Path, manifest: dict):
+        self.n = manifest["n"]
+        self.cells = manifest["cells"]
+        self.top_k = manifest["top_k"]
+        self.edge_min = manifest["edge_min"]
+        self.levels = manifest["levels"]
+        arrays = {name: np.load(Path(directory) / f, mmap_mode="r")
+                  for name, f in manifest["files"].items()}
+        self.order = arrays["order"]
+        self._nbr_idx, self._nbr_val = arrays["nbr_idx"], arrays["nbr_val"]
+        self._edge_i, self._edge_j, self._edge_v = arrays["edge_i"], arrays["edge_j"], arrays["edge_v"]
+        self._levels = [arrays[f"level{l}"] for l in range(len(self.levels))]
+
+    def neighbors(self, k: int):
+        """(indices, values), each (n x k), best first; k is capped at the stored top_k."""
+        k = min(k, self.top_k)
+        return np.asarray(self._nbr_idx[:, :k]), np.asarray(self._nbr_val[:, :k])
+
+    def edges(self, threshold: float, limit: int = None):
+        """
+        Pairs (i < j) with correlation >= threshold, strongest first, as
+        (i, j, values, truncated).
+        """
+        if threshold < self.edge_min:
+            raise ValueError(f"threshold must be >= {self.edge_min} (lowest indexed value)")
+        # edge_v is sorted descending: the answer is a prefix
+        count = int(np.searchsorted(-self._edge_v, -np.float32(threshold), side="right"))
+        truncated = limit is not None and count > limit
+        if truncated:
+            count = limit
+        return (np.asarray(self._edge_i[:count]), np.asarray(self._edge_j[:count]),
+                np.asarray(self._edge_v[:count]), truncated)
+
+    def tile(self, level: int, row0: int, row1: int, col0: int, col1: int) -> np.ndarray:
+        """
+        Rectangle [row0:row1, col0:col1] of the cluster-ordered matrix at a
+        pyramid level (0 = one cell per entry, each level halves the side).
+        """
+        if not 0 <= level < len(self.levels):
+            raise ValueError(f"level must be in [0, {len(self.levels) - 1}]")
+        side = self.levels[level]
+        if not (0 <= row0 < row1 <= side and 0 <= col0 < col1 <= side):
+            raise ValueError(f"tile must lie within [0, {side}) on both axes")
+        if row1 - row0 > MAX_TILE or col1 - col0 > MAX_TILE:
+            raise ValueError(f"tiles are at most {MAX_TILE} x {MAX_TILE}")
+        return np.array(self._levels[level][row0:row1, col0:col1])
+
+
+def open_index(directory: Path, source: Path = None):
+    """Index at `directory`, or None when missing or built from another version of `source`."""
+    for _ in range(3):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            return None
+        if source is not None and manifest.get("source") is not None:
+            current = _source_stamp(source)
+            if current is not None and current != manifest["source"]:
+                return None
+        try:
+            return CorrelationIndex(directory, manifest)
+        except FileNotFoundError:
+            continue                    # replaced while opening: re-read manifest
+    return None
+
+
+def load_index(csv_path: Path, load_matrix) -> CorrelationIndex:
+    """
+    Index for a correlation CSV, rebuilt from `load_matrix()` -> (cells,
+    matrix) when missing or stale.
+    """
+    directory = index_path(csv_path)
+    index = open_index(directory, source=csv_path)
+    if index is None:
+        cells, matrix = load_matrix()
+        build_index(cells, matrix, directory, source=csv_path)
+        index = open_index(directory, source=csv_path)
+    return index
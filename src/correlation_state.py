@@ -0,0 +1,252 @@
+"""
+Persistent, incrementally updated link correlation.
+
+The correlation matrix is a function of the co-moment state of the
+(time x link) pivot, so that state is what gets kept: an all-time
+CoMoments plus one CoMoments per time block for the sliding window.
+Appending new traffic folds only the new time rows in, O(dT * N^2),
+and the state round-trips through a single .npz file.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import CORRELATION_WINDOW_BLOCKS, CORRELATION_WINDOW_S
+from src.streaming_stats import CoMoments
+
+
+def time_rows(times: np.ndarray, links: np.ndarray, values: np.ndarray, n_links: int):
+    """
+    Group (time, link code, value) records into dense time rows.
+    Returns (unique times, sums, counts), the last two shaped (times x links).
+    """
+    uniq, t_idx = np.unique(times, return_inverse=True)
+    flat = t_idx * n_links + links
+    size = len(uniq) * n_links
+    sums = np.bincount(flat, weights=values, minlength=size).reshape(len(uniq), n_links)
+    counts = np.bincount(flat, minlength=size).reshape(len(uniq), n_links)
+    return uniq, sums, counts
+
+
+def _row_means(sums: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Mean of duplicates per cell, 0 where a link has no sample (pivot fill_value=0)."""
+    return np.divide(sums, counts, out=np.zeros(sums.shape), where=counts > 0)
+
+
+def _sorted_ids(link_ids: list) -> list:
+    try:
+        return sorted(link_ids)
+    except TypeError:
+        return list(link_ids)
+
+
+def _pad(a: np.ndarray, n: int) -> np.ndarray:
+    return np.pad(a, (0, n - len(a)))
+
+
+class CorrelationState:
+    """
+    Co-moment state behind the link correlation matrix.
+
+    Time rows must arrive complete: bulk loaders fold them directly with
+    fold_rows(); append() takes raw chunks of a continuing stream and holds
+    back the latest timestamp until a newer one shows the row is complete.
+    Rows older than what has already been folded are dropped as late.
+
+    The sliding window keeps one accumulator per block of
+    window_s / n_blocks seconds and covers whole blocks, so "last N
+    seconds" is exact to one block.
+    """
+
+    def __init__(self, window_s: float = CORRELATION_WINDOW_S,
+                 n_blocks: int = CORRELATION_WINDOW_BLOCKS):
+        self.window_s = float(window_s)
+        self.block_s = self.window_s / n_blocks
+        self.link_ids = []
+        self._codes = {}
+        self.has_rows = np.zeros(0, dtype=bool)
+        self.total = CoMoments()
+        self.blocks = {}                        # block id -> CoMoments
+        self.last_time = -np.inf                # latest folded time row
+        self._pending_t = None                  # latest timestamp, not yet folded
+        self._pending_sum = np.zeros(0)
+        self._pending_cnt = np.zeros(0, dtype=np.int64)
+
+    @property
+    def n_links(self) -> int:
+        return len(self.link_ids)
+
+    def codes_for(self, link_ids) -> np.ndarray:
+        """Codes for a column of link ids, registering new links; -1 for missing ids."""
+        local, uniques = pd.factorize(pd.Series(link_ids, copy=False))
+        mapping = np.array([self._codes.setdefault(u, len(self._codes)) for u in uniques], dtype=np.int64)
+        if len(self._codes) > len(self.link_ids):
+            self.link_ids = list(self._codes)
+            self.has_rows = _pad(self.has_rows, self.n_links)
+        codes = np.full(len(local), -1, dtype=np.int64)
+        named = local >= 0
+        codes[named] = mapping[local[named]]
+        return codes
+
+    def mark_rows(self, codes: np.ndarray) -> None:
+        """Record that these links have at least one usable (time, value) row."""
+        self.has_rows[np.unique(codes)] = True
+
+    def _block_floor(self) -> int:
+        """Oldest block id inside the window ending at the latest timestamp seen."""
+        now = self.last_time if self._pending_t is None else max(self.last_time, self._pending_t)
+        if not np.isfinite(now):
+            return np.iinfo(np.int64).min
+        return int(np.floor((now - self.window_s) / self.block_s)) + 1
+
+    def fold_rows(self, times: np.ndarray, rows: np.ndarray) -> None:
+        """Fold complete, dense time rows (any order) into the total and window blocks."""
+        if len(times) == 0:
+            return
+        self.total.update(rows)
+        self.last_time = max(self.last_time, float(times.max()))
+
+        block_ids = np.floor(times / self.block_s).astype(np.int64)
+        floor = self._block_floor()
+        for b in np.unique(block_ids[block_ids >= floor]).tolist():
+            part = CoMoments()
+            part.update(rows[block_ids == b])
+            self.blocks.setdefault(b, CoMoments()).merge(part)
+        for b in [b for b in self.blocks if b < floor]:
+            del self.blocks[b]
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        Fold a chunk of (time_seconds, link_id, aggregated_gbps) rows that
+        continues the stream. Returns the number of rows dropped as late.
+        """
+        codes = self.codes_for(df["link_id"])
+        t = df["time_seconds"].to_numpy(dtype=np.float64) + 0.0
+        v = df["aggregated_gbps"].to_numpy(dtype=np.float64)
+        keep = (codes >= 0) & ~np.isnan(t) & ~np.isnan(v)
+        codes, t, v = codes[keep], t[keep], v[keep]
+
+        frontier = self._pending_t if self._pending_t is not None else self.last_time
+        on_time = t >= frontier if self._pending_t is not None else t > frontier
+        late = int((~on_time).sum())
+        codes, t, v = codes[on_time], t[on_time], v[on_time]
+        if len(t) == 0:
+            return late
+        self.mark_rows(codes)
+
+        self._pending_sum = _pad(self._pending_sum, self.n_links)
+        self._pending_cnt = _pad(self._pending_cnt, self.n_links)
+        times, sums, counts = time_rows(t, codes, v, self.n_links)
+        if self._pending_t is not None and times[0] == self._pending_t:
+            sums[0] += self._pending_sum
+            counts[0] += self._pending_cnt
+        elif self._pending_t is not None:
+            times = np.concatenate(([self._pending_t], times))
+            sums = np.vstack((self._pending_sum, sums))
+            counts = np.vstack((self._pending_cnt, counts))
+
+        # every row before the newest timestamp is complete
+        self.fold_rows(times[:-1], _row_means(sums[:-1], counts[:-1]))
+        self._pending_t = float(times[-1])
+        self._pending_sum, self._pending_cnt = sums[-1], counts[-1]
+        return late
+
+    def flush(self) -> None:
+        """Fold the held-back latest row (the stream is known to be complete)."""
+        if self._pending_t is None:
+            return
+        row = _row_means(self._pending_sum[None, :], self._pending_cnt[None, :])
+        self.fold_rows(np.array([self._pending_t]), row)
+        self._pending_t = None
+        self._pending_sum = np.zeros(0)
+        self._pending_cnt = np.zeros(0, dtype=np.int64)
+
+    def _snapshot(self, window: bool) -> CoMoments:
+        acc = CoMoments()
+        if window:
+            floor = self._block_floor()
+            for b in sorted(self.blocks):
+                if b >= floor:
+                    acc.merge(self.blocks[b])
+        else:
+            acc.merge(self.total)
+        if self._pending_t is not None:
+            acc.update(_row_means(self._pending_sum[None, :], self._pending_cnt[None, :]))
+        return acc
+
+    def matrix(self, window: bool = False) -> pd.DataFrame:
+        """
+        Correlation matrix over links that have data, sorted by link id, as
+        pivot_table(fill_value=0).corr().fillna(0) would give. With
+        window=True only the last window_s seconds of rows count.
+        """
+        acc = self._snapshot(window)
+        acc.grow(self.n_links)
+        ids = [link_id for link_id in _sorted_ids(self.link_ids) if self.has_rows[self._codes[link_id]]]
+        idx = [self._codes[link_id] for link_id in ids]
+        corr = acc.corr()[np.ix_(idx, idx)] if acc.n else np.full((len(idx), len(idx)), np.nan)
+        index = pd.Index(ids, name="link_id")
+        return pd.DataFrame(corr, index=index, columns=index).fillna(0)
+
+    def save(self, path: Path) -> None:
+        """Write the state atomically to one .npz file."""
+        path = Path(path)
+        n = self.n_links
+        block_ids = sorted(self.blocks)
+        blocks = [self.blocks[b] for b in block_ids]
+        for cm in blocks:
+            cm.grow(n)
+        self.total.grow(n)
+
+        ids = [i.item() if isinstance(i, np.generic) else i for i in self.link_ids]
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                link_ids=np.array(json.dumps(ids)),
+                has_rows=self.has_rows,
+                window=np.array([self.window_s, self.block_s, self.last_time]),
+                total_n=np.array(self.total.n),
+                total_mean=self.total.mean,
+                total_m2=self.total.m2,
+                pending_t=np.array(np.nan if self._pending_t is None else self._pending_t),
+                pending_sum=_pad(self._pending_sum, n),
+                pending_cnt=_pad(self._pending_cnt, n),
+                block_ids=np.array(block_ids, dtype=np.int64),
+                block_n=np.array([cm.n for cm in blocks], dtype=np.int64),
+                block_mean=np.array([cm.mean for cm in blocks]).reshape(len(blocks), n),
+                block_m2=np.array([cm.m2 for cm in blocks]).reshape(len(blocks), n, n),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path):
+        """State saved at `path`, or None if there is none."""
+        try:
+            data = np.load(path, allow_pickle=False)
+        except FileNotFoundError:
+            return None
+        with data:
+            window_s, block_s, last_time = data["window"].tolist()
+            state = cls(window_s, max(int(round(window_s / block_s)), 1))
+            state.block_s = block_s
+            state.codes_for(json.loads(str(data["link_ids"])))
+            state.has_rows = data["has_rows"].astype(bool)
+            state.last_time = last_time
+            state.total.n = int(data["total_n"])
+            state.total.mean = data["total_mean"]
+            state.total.m2 = data["total_m2"]
+            pending_t = float(data["pending_t"])
+            if not np.isnan(pending_t):
+                state._pending_t = pending_t
+                state._pending_sum = data["pending_sum"]
+                state._pending_cnt = data["pending_cnt"]
+            for b, n, mean, m2 in zip(data["block_ids"].tolist(), data["block_n"].tolist(),
+                                      data["block_mean"], data["block_m2"]):
+                cm = CoMoments()
+                cm.n, cm.mean, cm.m2 = n, mean, m2
+                state.blocks[b] = cm
+        return state
@@ -0,0 +1,209 @@
+"""
+Chunked, bounded-memory processing of uploaded traffic CSVs.
+
+The upload is read once in fixed-size chunks. Per-link mean / max / p95
+come from running sums and quantile sketches; the timeseries artifact is
+appended chunk by chunk; and (time, link, value) records are spilled to
+hash-by-time bucket files so each bucket holds complete time rows of the
+time x link pivot. Buckets are then folded into one co-moment state, so
+peak memory is set by CHUNK_ROWS and SPILL_BUCKET_BYTES, not file size.
+"""
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.artifact_store import ColumnarWriter
+from src.correlation_state import CorrelationState, time_rows
+from src.streaming_stats import QuantileSketch
+
+REQUIRED_COLUMNS = {"time_seconds", "link_id", "aggregated_gbps"}
+
+CHUNK_ROWS = 250_000
+SPILL_BUCKET_BYTES = 64 * 1024 * 1024      # CSV bytes per correlation bucket
+
+_READ_SHARE = 0.8                           # progress share of the read pass
+
+_SPILL_DTYPE = np.dtype([("t", "f8"), ("link", "i4"), ("v", "f8")])
+
+
+class LinkStats:
+    """Running count / sum / max and p95 sketch for one link."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.peak = -np.inf
+        self.sketch = QuantileSketch()
+
+    def add(self, values: np.ndarray) -> None:
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.peak = max(self.peak, float(values.max()))
+        self.sketch.add(values)
+
+    def summary(self) -> tuple:
+        if self.count == 0:
+            return float("nan"), float("nan"), float("nan")
+        return self.total / self.count, self.peak, self.sketch.quantile(0.95)
+
+
+class StepTimer:
+    """Wall seconds per named step, accumulated into `totals` by lap()."""
+
+    def __init__(self, totals: dict = None):
+        self.totals = totals if totals is not None else {}
+        self._t = time.perf_counter()
+
+    def restart(self) -> None:
+        self._t = time.perf_counter()
+
+    def lap(self, step: str) -> None:
+        """Charge the time since the previous lap (or restart) to `step`."""
+        now = time.perf_counter()
+        self.totals[step] = self.totals.get(step, 0.0) + (now - self._t)
+        self._t = now
+
+
+def _n_buckets(csv_path: Path) -> int:
+    return max(1, math.ceil(os.path.getsize(csv_path) / SPILL_BUCKET_BYTES))
+
+
+def _bucket_rows(records: np.ndarray, n_links: int):
+    """Dense (time x link) rows for one bucket: mean of duplicates, 0 if absent."""
+    times, sums, counts = time_rows(records["t"], records["link"], records["v"], n_links)
+    return times, np.divide(sums, counts, out=np.zeros(sums.shape), where=counts > 0)
+
+
+def ingest_traffic_csv(csv_path: Path, timeseries_path: Path,
+                       chunk_rows: int = CHUNK_ROWS, store_dir: Path = None,
+                       progress=None, state: CorrelationState = None,
+                       steps: StepTimer = None):
+    """
+    Stream one uploaded traffic CSV.
+
+    Writes the timeseries artifact to `timeseries_path` (atomically), and
+    to a columnar store at `store_dir` when given, and returns (capacity_stats, corr_matrix, link_ids) where capacity_stats
+    has link_id / avg_gbps / peak_gbps / p95_gbps sorted by link, the
+    correlation matrix matches pivot_table(fill_value=0).corr().fillna(0)
+    and link_ids is in order of first appearance.
+
+    `progress`, if given, is called with the fraction done (0..1) after
+    each chunk and each correlation bucket. `state`, if given, is a fresh
+    CorrelationState that is filled from this file so later traffic can be
+    appended to it. `steps`, if given, is charged the time spent on
+    read / groupby / pivot / corr / writes.
+    """
+    csv_path = Path(csv_path)
+    timeseries_path = Path(timeseries_path)
+    n_buckets = _n_buckets(csv_path)
+    total_bytes = max(os.path.getsize(csv_path), 1)
+    report = progress or (lambda fraction: None)
+    steps = steps if steps is not None else StepTimer()
+
+    state = state if state is not None else CorrelationState()
+    stats = []
+
+    tmp_timeseries = timeseries_path.with_name(timeseries_path.name + ".tmp")
+    store = ColumnarWriter(store_dir) if store_dir is not None else None
+    with tempfile.TemporaryDirectory(prefix="ingest_") as spill_dir:
+        spill_files = [open(Path(spill_dir) / f"bucket_{b}.bin", "wb") for b in range(n_buckets)]
+        try:
+            with open(csv_path, "rb") as src, open(tmp_timeseries, "w", newline="") as out:
+                steps.restart()
+                for i, chunk in enumerate(pd.read_csv(src, chunksize=chunk_rows)):
+                    steps.lap("read")
+                    report(_READ_SHARE * min(src.tell() / total_bytes, 1.0))
+                    if i == 0 and not REQUIRED_COLUMNS.issubset(chunk.columns):
+                        raise ValueError(f"CSV must contain columns: {REQUIRED_COLUMNS}")
+
+                    chunk.to_csv(out, header=(i == 0), index=False)
+                    if store is not None:
+                        store.append(chunk)
+                    steps.lap("writes")
+
+                    # map this chunk's link ids onto global codes
+                    codes = state.codes_for(chunk["link_id"])
+                    while len(stats) < state.n_links:
+                        stats.append(LinkStats())
+
+                    values = chunk["aggregated_gbps"].to_numpy(dtype=np.float64)
+                    times = chunk["time_seconds"].to_numpy(dtype=np.float64) + 0.0
+
+                    order = np.argsort(codes, kind="stable")
+                    sorted_codes = codes[order]
+                    bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+                    for part in np.split(order, bounds):
+                        if len(part) and codes[part[0]] >= 0:
+                            stats[codes[part[0]]].add(values[part])
+                    steps.lap("groupby")
+
+                    keep = (codes >= 0) & ~np.isnan(values) & ~np.isnan(times)
+                    if not keep.any():
+                        continue
+                    records = np.empty(int(keep.sum()), dtype=_SPILL_DTYPE)
+                    records["t"] = times[keep]
+                    records["link"] = codes[keep]
+                    records["v"] = values[keep]
+                    state.mark_rows(records["link"])
+
+                    buckets = pd.util.hash_array(records["t"]) % np.uint64(n_buckets)
+                    for b in np.unique(buckets).tolist():
+                        records[buckets == b].tofile(spill_files[b])
+                    steps.lap("writes")
+        except BaseException:
+            tmp_timeseries.unlink(missing_ok=True)
+            if store is not None:
+                store.abort()
+            raise
+        finally:
+            for f in spill_files:
+                f.close()
+
+        if not state.n_links:
+            tmp_timeseries.unlink(missing_ok=True)
+            if store is not None:
+                store.abort()
+            raise ValueError("CSV contains no traffic rows")
+
+        steps.restart()
+        for b in range(n_buckets):
+            records = np.fromfile(Path(spill_dir) / f"bucket_{b}.bin", dtype=_SPILL_DTYPE)
+            steps.lap("read")
+            if len(records):
+                rows = _bucket_rows(records, state.n_links)
+                steps.lap("pivot")
+                state.fold_rows(*rows)
+                steps.lap("corr")
+            report(_READ_SHARE + (1 - _READ_SHARE) * (b + 1) / n_buckets)
+
+    steps.restart()
+    os.replace(tmp_timeseries, timeseries_path)
+    if store is not None:
+        store.close(source=timeseries_path)
+    steps.lap("writes")
+
+    link_ids = list(state.link_ids)
+    try:
+        sorted_ids = sorted(link_ids)
+    except TypeError:
+        sorted_ids = link_ids
+
+    link_codes = {link_id: code for code, link_id in enumerate(link_ids)}
+    capacity_stats = pd.DataFrame(
+        [(link_id, *stats[link_codes[link_id]].summary()) for link_id in sorted_ids],
+        columns=["link_id", "avg_gbps", "peak_gbps", "p95_gbps"],
+    )
+
+    # pivot_table drops links that never had a usable (time, value) row
+    steps.restart()
+    corr_matrix = state.matrix()
+    steps.lap("corr")
+    return capacity_stats, corr_matrix, link_ids
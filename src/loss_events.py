@@ -0,0 +1,328 @@
+"""
+Synchronized loss events across cells, as packed bitsets.
+
+Each cell's loss events are a bitset over time slots (optionally coarsened
+to windows of several slots), packed 64 slots to a uint64 word. Loss is
+rare, so only non-zero words are stored, as (word, cell, bits) entries
+sorted by word then cell. Memory therefore follows the number of events,
+not cells x slots: hours of 0.5 ms slots are millions of words per cell,
+almost all of them empty.
+
+Co-occurrence of two cells is the popcount of the AND of their bitsets.
+Two cells only share events in words where both have an entry, so a
+block of cells is joined with every cell word by word, the shared words'
+ANDs are popcounted (np.bitwise_count, or a byte table before NumPy 2) in large vectorized batches, and
+the counts are summed into a dense block x N matrix. Cost is the sum
+over words of (cells active in the word)^2, and memory is one block
+row. The Jaccard score of a pair is co / (events_a + events_b - co).
+Blocks are independent and run in worker processes. Each keeps the top-k
+Jaccard neighbours per cell, so the output is N x k however many pairs
+co-occur.
+
+Synchronized events are the slots (windows) in which at least two cells
+lose at once, with how many do.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.ingest import CHUNK_ROWS
+
+WORD_BITS = 64
+TOP_K = 32                  # neighbours kept per cell
+ROW_BLOCK = 256             # cells per co-occurrence block
+PAIR_BATCH = 1 << 22        # word pairs ANDed per vectorized step
+_UNPACK_BATCH = 1 << 20
+_COMPACT_ENTRIES = 1 << 22    # builder entries merged once this many are pending
+
+_worker_events = None       # LossEvents in each worker process
+_BYTE_BITS = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+
+def _popcount_bytes(words: np.ndarray) -> np.ndarray:
+    """Set bits of each uint64 word, from a per-byte table."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _BYTE_BITS[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+_popcount = getattr(np, "bitwise_count", _popcount_bytes)      # NumPy >= 2.0 has it built in
+
+
+def _reduce_or(keys: np.ndarray, bits: np.ndarray):
+    """Unique keys (sorted) and the OR of the bits given for each."""
+    order = np.argsort(keys, kind="stable")
+    keys, bits = keys[order], bits[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1)) if len(keys) else np.zeros(0, dtype=np.int64)
+    return keys[starts], np.bitwise_or.reduceat(bits, starts) if len(keys) else bits
+
+
+def _ragged_arange(lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of arange(n) for each n in lengths."""
+    total = int(lengths.sum())
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.arange(total) - starts
+
+
+class LossEventsBuilder:
+    """
+    Packs (slot, cell) loss events into LossEvents chunk by chunk, in memory
+    proportional to the distinct (cell, word) pairs seen.
+    """
+
+    def __init__(self, window: int = 1):
+        if window < 1:
+            raise ValueError("window must be at least 1 slot")
+        self.window = int(window)
+        self.cells = []
+        self._index = {}
+        self._keys = []
+        self._bits = []
+        self._pending = 0
+        self.slot_min = None
+        self.slot_max = None
+
+    def _codes(self, cell_ids) -> np.ndarray:
+        local, uniques = pd.factorize(np.asarray(cell_ids, dtype=object))
+        for cell in uniques:
+            if cell not in self._index:
+                self._index[cell] = len(self.cells)
+                self.cells.append(cell)
+        return np.array([self._index[u] for u in uniques], dtype=np.int64)[local]
+
+    def add(self, slots, cell_ids, lost=None) -> None:
+        """
+        Record events: one per (slot, cell), where `lost` (if given) is
+        non-zero. Cells that never lose, and the slots spanned, are still
+        registered.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        cells = self._codes(cell_ids)
+        if len(slots) == 0:
+            return
+        lo, hi = int(slots.min()), int(slots.max())
+        self.slot_min = lo if self.slot_min is None else min(self.slot_min, lo)
+        self.slot_max = hi if self.slot_max is None else max(self.slot_max, hi)
+        if lost is not None:
+            hit = np.asarray(lost) > 0
+            slots, cells = slots[hit], cells[hit]
+
+        pos = np.floor_divide(slots, self.window)
+        words, bit = np.divmod(pos, WORD_BITS)
+        keys, bits = _reduce_or(words * (1 << 24) + cells, np.left_shift(np.uint64(1), bit.astype(np.uint64)))
+        self._keys.append(keys)
+        self._bits.append(bits)
+        self._pending += len(keys)
+        if self._pending > _COMPACT_ENTRIES:
+            self._compact()
+
+    def _compact(self) -> None:
+        if len(self._keys) > 1:
+            keys, bits = _reduce_or(np.concatenate(self._keys), np.concatenate(self._bits))
+            self._keys, self._bits = [keys], [bits]
+        self._pending = 0
+
+    def finish(self) -> "LossEvents":
+        if len(self.cells) >= 1 << 24:
+            raise ValueError("At most 16M cells")
+        self._compact()
+        keys = self._keys[0] if self._keys else np.zeros(0, dtype=np.int64)
+        bits = self._bits[0] if self._bits else np.zeros(0, dtype=np.uint64)
+        words, cells = np.divmod(keys, 1 << 24)
+        n_slots = 0 if self.slot_min is None else self.slot_max - self.slot_min + 1
+        cell_ids = np.array(self.cells)
+        if cell_ids.dtype == object:                        # mixed types: keep .npz pickle-free
+            cell_ids = cell_ids.astype(str)
+        return LossEvents(cell_ids, words, cells.astype(np.int32), bits,
+                          n_slots=n_slots, window=self.window)
+
+
+class LossEvents:
+    """
+    Per-cell loss bitsets, stored as non-zero uint64 words sorted by
+    (word, cell). Word w, bit b covers slots [(64 w + b) * window, +window).
+    """
+
+    def __init__(self, cells: np.ndarray, words: np.ndarray, cell_idx: np.ndarray,
+                 bits: np.ndarray, n_slots: int = 0, window: int = 1):
+        self.cells = np.asarray(cells)
+        self.words = np.asarray(words, dtype=np.int64)
+        self.cell_idx = np.asarray(cell_idx, dtype=np.int32)
+        self.bits = np.asarray(bits, dtype=np.uint64)
+        self.n_slots = int(n_slots)
+        self.window = int(window)
+        self.counts = np.bincount(self.cell_idx, weights=_popcount(self.bits),
+                                  minlength=len(self.cells)).astype(np.int64)
+        # entries of each distinct word: word_ids[u] spans [word_start[u], word_start[u + 1])
+        self.word_ids, self.word_start = np.unique(self.words, return_index=True)
+        self.word_start = np.append(self.word_start, len(self.words))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, window: int = 1, slot_col: str = "slot_id",
+                   cell_col: str = "cell_id", value_col: str = "loss_binary") -> "LossEvents":
+        builder = LossEventsBuilder(window)
+        builder.add(df[slot_col].to_numpy(), df[cell_col].to_numpy(), df[value_col].to_numpy())
+        return builder.finish()
+
+    def __len__(self) -> int:
+        return len(self.cells)
+
+    # pairs -------------------------------------------------------------------
+
+    def pair(self, a: int, b: int) -> int:
+        """Exact number of shared events of cells a and b (by position)."""
+        ma, mb = self.cell_idx == a, self.cell_idx == b
+        wa, wb = self.words[ma], self.words[mb]
+        shared, ia, ib = np.intersect1d(wa, wb, assume_unique=True, return_indices=True)
+        return int(_popcount(self.bits[ma][ia] & self.bits[mb][ib]).sum())
+
+    def cooccurrence_block(self, lo: int, hi: int) -> np.ndarray:
+        """Shared event counts of cells lo..hi-1 with every cell, (hi - lo) x N."""
+        N = len(self.cells)
+        out = np.zeros((hi - lo) * N)
+        mine = np.flatnonzero((self.cell_idx >= lo) & (self.cell_idx < hi))
+        if len(mine) == 0:
+            return out.reshape(hi - lo, N)
+        u = np.searchsorted(self.word_ids, self.words[mine])
+        start, stop = self.word_start[u], self.word_start[u + 1]
+        lengths = stop - start
+
+        # batches of whole entries, about PAIR_BATCH word pairs each
+        ends = np.cumsum(lengths)
+        cuts = np.searchsorted(ends, np.arange(PAIR_BATCH, ends[-1], PAIR_BATCH), side="right")
+        for s, e in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(mine)]))):
+            if s == e:
+                continue
+            n = lengths[s:e]
+            first = np.repeat(mine[s:e], n)
+            second = np.repeat(start[s:e], n) + _ragged_arange(n)
+            co = _popcount(self.bits[first] & self.bits[second])
+            key = (self.cell_idx[first].astype(np.int64) - lo) * N + self.cell_idx[second]
+            out += np.bincount(key, weights=co, minlength=len(out))
+        return out.reshape(hi - lo, N)
+
+    def _top_block(self, lo: int, hi: int, k: int):
+        co = self.cooccurrence_block(lo, hi)
+        rows = np.arange(hi - lo)
+        co[rows, rows + lo] = 0                                     # not its own neighbour
+        union = self.counts[lo:hi, None] + self.counts[None, :] - co
+        with np.errstate(divide="ignore", invalid="ignore"):
+            jac = np.where(union > 0, co / union, 0.0)
+        k = min(k, len(self.cells) - 1)
+        if k <= 0:
+            empty = np.zeros((hi - lo, 0))
+            return lo, empty.astype(np.int64), empty, empty
+        part = np.argpartition(-jac, k - 1, axis=1)[:, :k]
+        # best first; ties by shared events, then cell position
+        order = np.lexsort((part, -np.take_along_axis(co, part, axis=1),
+                            -np.take_along_axis(jac, part, axis=1)), axis=1)
+        idx = np.take_along_axis(part, order, axis=1)
+        return lo, idx, np.take_along_axis(co, idx, axis=1), np.take_along_axis(jac, idx, axis=1)
+
+    def neighbours(self, k: int = TOP_K, workers: int = 1, block: int = ROW_BLOCK):
+        """
+        Top-k Jaccard neighbours of every cell over all pairs. Returns
+        (index, shared events, jaccard), each N x k, best first; pairs that
+        never co-occur have jaccard 0. workers=None uses one process per CPU.
+        """
+        N = len(self.cells)
+        k = max(0, min(k, N - 1))
+        idx = np.zeros((N, k), dtype=np.int64)
+        co, jac = np.zeros((N, k)), np.zeros((N, k))
+        tasks = [(lo, min(lo + block, N), k) for lo in range(0, N, block)]
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self,)) as pool:
+                results = list(pool.map(_run_block, tasks))
+        else:
+            results = [self._top_block(*task) for task in tasks]
+        for lo, i, c, j in results:
+            idx[lo:lo + len(i)], co[lo:lo + len(i)], jac[lo:lo + len(i)] = i, c, j
+        return idx, co.astype(np.int64), jac
+
+    # timeline ------------------------------------------------------------------
+
+    def synchronized(self, min_cells: int = 2):
+        """
+        Windows in which at least min_cells cells lose: (first slot of each
+        window, number of cells), in time order.
+        """
+        slots, counts = [], []
+        for s in range(0, len(self.bits), _UNPACK_BATCH):
+            bits = self.bits[s:s + _UNPACK_BATCH]
+            flags = np.unpackbits(bits.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+            entry, bit = np.nonzero(flags)
+            pos = self.words[s:s + _UNPACK_BATCH][entry] * WORD_BITS + bit
+            u, c = np.unique(pos, return_counts=True)
+            slots.append(u)
+            counts.append(c)
+        if not slots:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        pos, n = np.concatenate(slots), np.concatenate(counts)
+        # batches split on entries; the same window can appear in two of them
+        pos, inverse = np.unique(pos, return_inverse=True)
+        n = np.bincount(inverse, weights=n).astype(np.int64)
+        keep = n >= min_cells
+        return pos[keep] * self.window, n[keep]
+
+    # persistence -------------------------------------------------------------
+
+    def save(self, path, k: int = TOP_K, workers: int = 1, steps=None) -> None:
+        """Write the bitsets, top-k neighbours and synchronized events to an .npz."""
+        idx, co, jac = self.neighbours(k, workers)
+        if steps is not None:
+            steps.lap("cooccurrence")
+        sync_slot, sync_cells = self.synchronized()
+        if steps is not None:
+            steps.lap("synchronized")
+        with open(path, "wb") as f:
+            np.savez(f, cells=self.cells, words=self.words, cell_idx=self.cell_idx, bits=self.bits,
+                     n_slots=self.n_slots, window=self.window,
+                     neighbours=idx, shared=co, jaccard=jac,
+                     sync_slot=sync_slot, sync_cells=sync_cells)
+
+
+def read_loss_csv(path, window: int = 1, slot_col: str = "slot_id", cell_col: str = "cell_id",
+                  value_col: str = "loss_binary", progress=None, steps=None) -> LossEvents:
+    """
+    LossEvents of a cell-level CSV (one row per slot and cell), streamed in
+    chunks of CHUNK_ROWS. progress(fraction) is called after each chunk.
+    """
+    builder = LossEventsBuilder(window)
+    total_bytes = max(os.path.getsize(path), 1)
+    with open(path, "rb") as src:
+        for i, chunk in enumerate(pd.read_csv(src, chunksize=CHUNK_ROWS,
+                                              usecols=lambda c: c in (slot_col, cell_col, value_col))):
+            if steps is not None:
+                steps.lap("read")
+            if i == 0 and len(chunk.columns) < 3:
+                raise ValueError(f"CSV must contain columns: {{'{slot_col}', '{cell_col}', '{value_col}'}}")
+            builder.add(chunk[slot_col].to_numpy(), chunk[cell_col].to_numpy(), chunk[value_col].to_numpy())
+            if steps is not None:
+                steps.lap("pack")
+            if progress is not None:
+                progress(src.tell() / total_bytes)
+    return builder.finish()
+
+
+def load_results(path) -> dict:
+    """Arrays written by LossEvents.save, plus the LossEvents to query pairs on."""
+    with np.load(path, allow_pickle=False) as data:
+        out = {name: data[name] for name in data.files}
+    out["events"] = LossEvents(out["cells"], out["words"], out["cell_idx"], out["bits"],
+                               int(out["n_slots"]), int(out["window"]))
+    return out
+
+
+def _init_worker(events: LossEvents) -> None:
+    global _worker_events
+    _worker_events = events
+
+
+def _run_block(task):
+    lo, hi, k = task
+    return _worker_events._top_block(lo, hi, k)
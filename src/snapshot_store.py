@@ -0,0 +1,411 @@
+"""
+Content-addressed, immutable snapshots of processed datasets.
+
+Every artifact file is stored once under `objects/`, named by the hash of
+its content. A version is a small manifest mapping artifact paths
+("results/topology.json", "artifacts/x.cols/manifest.json", ...) to
+object hashes, and its id is the hash of that mapping, so identical
+outputs give the same version. Named refs (HEAD, original) point at
+versions and are swapped atomically with os.replace.
+
+Each version is materialized once as a read-only tree, `trees/<id>/`,
+of reflinks (or, where the filesystem has none, copies) of its objects,
+never hardlinks: a live file rewritten in place must not reach the
+stored object. Objects are named by the hash of the bytes actually
+stored, and a copied tree file is verified against that hash. The live
+artifact paths the API reads are symlinks through `live`, itself a
+symlink to the HEAD tree, so checkout() is one os.replace of `live`:
+readers see either the old version or the new one, and those that still
+hold old files keep reading them. Where symlinks cannot be made
+(Windows without the privilege) the live paths fall back to copies.
+
+`remember()` / `lookup()` map an input key (e.g. the hash of an uploaded
+file) to the version it produced, so identical work is not redone.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from src.artifact_store import MANIFEST, STORE_SUFFIX, read_manifest
+
+HEAD = "HEAD"
+LIVE = "live"                           # symlink to the tree of the HEAD version
+_FICLONE = 0x40049409                   # Linux reflink ioctl
+_BLOCK = 1024 * 1024
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_BLOCK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class HashingWriter:
+    """File-like wrapper that hashes what is written through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self._h = hashlib.blake2b(digest_size=20)
+
+    def write(self, data) -> int:
+        self._h.update(data)
+        return self._f.write(data)
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def _write_json(path: Path, data) -> None:
+    tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _clone(src: Path, dst: Path) -> bool:
+    """Reflink src to dst where the platform and filesystem support it."""
+    try:
+        import fcntl
+    except ImportError:                 # Windows: byte copies only
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        Path(dst).unlink(missing_ok=True)
+        return False
+
+
+def _copy(src: Path, dst: Path) -> str:
+    """Copy src to dst (reflink, else byte copy); returns the digest of what was copied, if read."""
+    if _clone(src, dst):
+        return None
+    h = hashlib.blake2b(digest_size=20)
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        for block in iter(lambda: s.read(_BLOCK), b""):
+            h.update(block)
+            d.write(block)
+    return h.hexdigest()
+
+
+def _install(src: Path, dst: Path, mode: int, digest: str = None) -> None:
+    """
+    Copy src over dst via os.replace, with src's mtime (columnar store
+    stamps check it) and `mode`; a byte copy is verified against `digest`.
+    """
+    stat = os.stat(src)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f"{dst.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        copied = _copy(src, tmp)
+        if digest is not None and copied is not None and copied != digest:
+            raise ValueError(f"Snapshot object {digest} is corrupt")
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.chmod(tmp, mode)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _same_stamp(a: Path, b: Path) -> bool:
+    try:
+        sa, sb = os.stat(a), os.stat(b)
+    except FileNotFoundError:
+        return False
+    return (sa.st_size, sa.st_mtime_ns) == (sb.st_size, sb.st_mtime_ns)
+
+
+def _symlink(target: Path, link: Path) -> bool:
+    """Point `link` at `target` (relative) in one os.replace; False where symlinks cannot be made."""
+    link.parent.mkdir(parents=True, exist_ok=True)
+    tmp = link.with_name(f"{link.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        os.symlink(os.path.relpath(target, link.parent), tmp)
+    except (OSError, NotImplementedError):
+        return False
+    os.replace(tmp, link)
+    return True
+
+
+def _points_at(link: Path, target: Path) -> bool:
+    try:
+        return os.readlink(link) == os.path.relpath(target, link.parent)
+    except OSError:
+        return False
+
+
+def artifact_files(directory: Path, root: str, names) -> dict:
+    """
+    Artifact path -> file for `names` in `directory`, with the files of
+    their columnar stores (only those the store manifest lists).
+    """
+    directory = Path(directory)
+    files = {}
+    for name in names:
+        path = directory / name
+        if path.is_file():
+            files[f"{root}/{name}"] = path
+        store = path.with_name(path.stem + STORE_SUFFIX)
+        manifest = read_manifest(store)
+        if manifest is not None:
+            prefix = f"{root}/{store.name}"
+            for col in manifest["columns"]:
+                files[f"{prefix}/{col['file']}"] = store / col["file"]
+            files[f"{prefix}/{MANIFEST}"] = store / MANIFEST
+    return files
+
+
+def _covers(artifact: str, path: str) -> bool:
+    """Whether `path` is the artifact itself or a file of its columnar store."""
+    return path == artifact or path.startswith(artifact.rsplit(".", 1)[0] + STORE_SUFFIX + "/")
+
+
+class SnapshotStore:
+    """
+    Versions of the artifacts under `roots` (name -> live directory),
+    kept in `directory`.
+    """
+
+    def __init__(self, directory: Path, roots: dict):
+        self.directory = Path(directory)
+        self.roots = {name: Path(path) for name, path in roots.items()}
+        for sub in ("objects", "versions", "trees", "refs", "sources", "tmp"):
+            (self.directory / sub).mkdir(parents=True, exist_ok=True)
+
+    # objects -------------------------------------------------------------
+
+    def _object(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / digest[2:]
+
+    def _add_object(self, path: Path) -> str:
+        """
+        Store a private, read-only copy of `path` (with its mtime, which
+        columnar store stamps check), named by the hash of that copy.
+        """
+        tmp = self.directory / "tmp" / f"{uuid.uuid4().hex}.tmp"
+        try:
+            stat = os.stat(path)
+            digest = _copy(path, tmp) or file_digest(tmp)
+            target = self._object(digest)
+            if target.exists():
+                return digest
+            os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.chmod(tmp, 0o444)
+            target.parent.mkdir(exist_ok=True)
+            os.replace(tmp, target)
+            return digest
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    # versions and refs ---------------------------------------------------
+
+    def commit(self, files: dict, label: str = "", meta: dict = None,
+               base: str = None, replaces=()) -> str:
+        """
+        Store `files` (artifact path -> file) as a version and return its id.
+        With `base`, the version is that one with `files` laid over it,
+        minus the artifacts in `replaces` (and their columnar stores).
+        """
+        entries = {}
+        if base is not None:
+            previous = self.version(base)
+            if previous is None:
+                raise KeyError(f"Unknown version {base}")
+            entries = {path: dict(e) for path, e in previous["files"].items()
+                       if not any(_covers(a, path) for a in replaces)}
+        for path, src in files.items():
+            entries[path] = {"object": self._add_object(src), "size": os.path.getsize(src)}
+
+        key = json.dumps({p: e["object"] for p, e in sorted(entries.items())}).encode()
+        version_id = hashlib.blake2b(key, digest_size=8).hexdigest()
+        manifest_path = self.directory / "versions" / f"{version_id}.json"
+        if manifest_path.exists():
+            os.utime(manifest_path)             # recently produced again: keep it
+        else:
+            _write_json(manifest_path, {
+                "id": version_id,
+                "label": label,
+                "created_at": time.time(),
+                "meta": meta or {},
+                "files": entries,
+            })
+        self._build_tree(self.version(version_id))
+        return version_id
+
+    def version(self, version_id: str):
+        if not version_id or "/" in version_id or version_id.startswith("."):
+            return None
+        return _read_json(self.directory / "versions" / f"{version_id}.json")
+
+    def versions(self) -> list:
+        """Version manifests, most recently produced first."""
+        paths = sorted((self.directory / "versions").glob("*.json"),
+                       key=lambda p: p.stat().st_mtime, reverse=True)
+        return [v for v in map(_read_json, paths) if v is not None]
+
+    def ref(self, name: str):
+        data = _read_json(self.directory / "refs" / name)
+        return data["version"] if data else None
+
+    def refs(self) -> dict:
+        return {p.name: self.ref(p.name) for p in (self.directory / "refs").iterdir()
+                if not p.name.endswith(".tmp")}
+
+    def set_ref(self, name: str, version_id: str) -> None:
+        _write_json(self.directory / "refs" / name, {"version": version_id})
+
+    @property
+    def head(self):
+        return self.ref(HEAD)
+
+    # trees and live files -----------------------------------------------
+
+    def _tree(self, version_id: str) -> Path:
+        return self.directory / "trees" / version_id
+
+    def _build_tree(self, version: dict) -> set:
+        """
+        Materialize a version as its read-only tree, once (commit does it
+        on the job pool, so checkout rarely has to). Files of an existing
+        tree whose size or mtime no longer match their object, i.e. that
+        were rewritten in place, are restored. Returns the restored paths.
+        """
+        tree = self._tree(version["id"])
+        if not tree.exists():
+            tmp = self.directory / "tmp" / uuid.uuid4().hex
+            try:
+                for path, entry in version["files"].items():
+                    _install(self._object(entry["object"]), tmp / path, 0o444, entry["object"])
+                tmp.mkdir(exist_ok=True)
+                os.rename(tmp, tree)
+            except OSError:
+                if not tree.exists():           # else built concurrently: use that one
+                    raise
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+            return set()
+
+        restored = set()
+        for path, entry in version["files"].items():
+            obj = self._object(entry["object"])
+            if not _same_stamp(tree / path, obj):
+                _install(obj, tree / path, 0o444, entry["object"])
+                restored.add(path)
+        return restored
+
+    def _live(self, path: str) -> Path:
+        root, _, rel = path.partition("/")
+        return self.roots[root] / rel
+
+    def checkout(self, version_id: str) -> int:
+        """
+        Make a version live and move HEAD to it: its tree is built (or
+        restored) first, then `live` is swapped to it in one os.replace.
+        Live paths are symlinks through `live`, made the first time a path
+        is seen or after something replaced the link; paths of the old
+        HEAD that the version lacks are removed. Returns the number of
+        live files whose content changed.
+        """
+        target = self.version(version_id)
+        if target is None:
+            raise KeyError(f"Unknown version {version_id}")
+        current = self.version(self.head) or {"files": {}}
+        old = current["files"]
+
+        changed = {path for path, entry in target["files"].items()
+                   if old.get(path, {}).get("object") != entry["object"]}
+        restored = self._build_tree(target)
+        if version_id == self.head:
+            changed |= restored
+
+        tree, live_dir = self._tree(version_id), self.directory / LIVE
+        linked = _symlink(tree, live_dir)
+        order = sorted(target["files"], key=lambda path: (path.endswith("/" + MANIFEST), path))
+        for path in order:
+            live = self._live(path)
+            if linked:
+                if not _points_at(live, live_dir / path):
+                    _symlink(live_dir / path, live)
+                    changed.add(path)
+            elif not _same_stamp(live, tree / path):
+                # no symlinks here: a writable copy, store manifests last
+                _install(tree / path, live, 0o644)
+                changed.add(path)
+
+        for path in old:
+            if path not in target["files"]:
+                try:
+                    self._live(path).unlink()
+                    changed.add(path)
+                except FileNotFoundError:
+                    pass
+
+        self.set_ref(HEAD, version_id)
+        return len(changed)
+
+    # input -> version memo -----------------------------------------------
+
+    def _memo(self, key: str) -> Path:
+        return self.directory / "sources" / hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def remember(self, key: str, version_id: str) -> None:
+        _write_json(self._memo(key), {"key": key, "version": version_id})
+
+    def lookup(self, key: str):
+        """Version an input key produced, if that version is still stored."""
+        data = _read_json(self._memo(key))
+        if data is None or data.get("key") != key or self.version(data["version"]) is None:
+            return None
+        return data["version"]
+
+    def forget(self, key: str = None) -> None:
+        """Drop the memo of one input key, or of all of them."""
+        paths = [self._memo(key)] if key else list((self.directory / "sources").iterdir())
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    # housekeeping --------------------------------------------------------
+
+    def gc(self, keep: int = 10, protect=()) -> int:
+        """
+        Drop all but the `keep` most recent versions (never a ref'd or
+        protected one), their trees, and the objects no remaining version
+        uses.
+        Returns the number of objects removed.
+        """
+        pinned = set(self.refs().values()) | set(protect)
+        kept = []
+        for i, version in enumerate(self.versions()):
+            if i < keep or version["id"] in pinned:
+                kept.append(version)
+            else:
+                (self.directory / "versions" / f"{version['id']}.json").unlink(missing_ok=True)
+
+        ids = {v["id"] for v in kept}
+        for tree in (self.directory / "trees").iterdir():
+            if tree.name not in ids:
+                shutil.rmtree(tree, ignore_errors=True)
+
+        live = {e["object"] for v in kept for e in v["files"].values()}
+        removed = 0
+        for shard in (self.directory / "objects").iterdir():
+            for obj in shard.iterdir():
+                if shard.name + obj.name not in live and not obj.name.endswith(".tmp"):
+                    obj.unlink(missing_ok=True)
+                    removed += 1
+        return removed
@@ -0,0 +1,144 @@
+"""
+Mergeable, bounded-memory accumulators for streaming traffic statistics.
+"""
+import math
+
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch with logarithmic buckets (DDSketch).
+
+    Every returned quantile is within `relative_accuracy` of the exact
+    order statistic. Two sketches with the same accuracy merge exactly,
+    and memory grows with log(max / min) of the values, not their count.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.005):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._pos = {}
+        self._neg = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add_keys(self, store: dict, magnitudes: np.ndarray) -> None:
+        if len(magnitudes) == 0:
+            return
+        keys = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        for k, c in zip(keys.tolist(), counts.tolist()):
+            store[k] = store.get(k, 0) + c
+
+    def add(self, values) -> None:
+        """Add an array of values (non-finite values are ignored)."""
+        v = np.asarray(values, dtype=np.float64)
+        v = v[np.isfinite(v)]
+        self._add_keys(self._pos, v[v > 0])
+        self._add_keys(self._neg, -v[v < 0])
+        self.zero_count += int(np.count_nonzero(v == 0))
+        self.count += len(v)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Fold another sketch with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for store, other_store in ((self._pos, other._pos), (self._neg, other._neg)):
+            for k, c in other_store.items():
+                store[k] = store.get(k, 0) + c
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _value(self, key: int) -> float:
+        return 2.0 * self._gamma ** key / (self._gamma + 1.0)
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (NaN when the sketch is empty)."""
+        if self.count == 0:
+            return float("nan")
+
+        rank = min(max(q, 0.0), 1.0) * (self.count - 1)
+        cum = 0
+        for k in sorted(self._neg, reverse=True):
+            cum += self._neg[k]
+            if cum > rank:
+                return -self._value(k)
+        cum += self.zero_count
+        if cum > rank:
+            return 0.0
+        for k in sorted(self._pos):
+            cum += self._pos[k]
+            if cum > rank:
+                return self._value(k)
+        return float("nan")
+
+
+class CoMoments:
+    """
+    Running mean vector and centered co-moment matrix over the rows of a
+    (time x link) matrix.
+
+    Batches are folded in with the pairwise update of Chan et al., which
+    stays numerically stable where raw sums of products would cancel.
+    Adding a variable later is equivalent to it having been 0 in every
+    earlier row, matching a pivot with fill_value=0.
+    """
+
+    def __init__(self, n_vars: int = 0):
+        self.n = 0
+        self.mean = np.zeros(n_vars)
+        self.m2 = np.zeros((n_vars, n_vars))
+
+    @property
+    def n_vars(self) -> int:
+        return len(self.mean)
+
+    def grow(self, n_vars: int) -> None:
+        """Extend to n_vars variables, zero-filling the history."""
+        extra = n_vars - self.n_vars
+        if extra <= 0:
+            return
+        self.mean = np.concatenate((self.mean, np.zeros(extra)))
+        self.m2 = np.pad(self.m2, ((0, extra), (0, extra)))
+
+    def _fold(self, n_b: int, mean_b: np.ndarray, m2_b: np.ndarray) -> None:
+        if n_b == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m2 = n_b, mean_b.copy(), m2_b.copy()
+            return
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + np.outer(delta, delta) * (self.n * n_b / n)
+        self.n = n
+
+    def update(self, rows: np.ndarray) -> None:
+        """Fold a (rows x n_vars) batch of complete time rows."""
+        rows = np.asarray(rows, dtype=np.float64)
+        if rows.ndim != 2 or len(rows) == 0:
+            return
+        self.grow(rows.shape[1])
+        mean_b = rows.mean(axis=0)
+        centered = rows - mean_b
+        self._fold(len(rows), mean_b, centered.T @ centered)
+
+    def merge(self, other: "CoMoments") -> None:
+        """Fold another accumulator over disjoint rows into this one."""
+        n_vars = max(self.n_vars, other.n_vars)
+        self.grow(n_vars)
+        other_mean = np.concatenate((other.mean, np.zeros(n_vars - other.n_vars)))
+        other_m2 = np.pad(other.m2, ((0, n_vars - other.n_vars), (0, n_vars - other.n_vars)))
+        self._fold(other.n, other_mean, other_m2)
+
+    def corr(self) -> np.ndarray:
+        """Pearson correlation matrix; NaN where a variable is constant."""
+        sd = np.sqrt(np.clip(np.diag(self.m2), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            c = self.m2 / np.outer(sd, sd)
+        c[~np.isfinite(c)] = np.nan
+        c = np.clip(c, -1.0, 1.0)
+        np.fill_diagonal(c, np.where(sd > 0, 1.0, np.nan))
+        return c
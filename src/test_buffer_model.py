@@ -0,0 +1,99 @@
+"""
+Checks the overflow engine against the original slot-by-slot token bucket.
+Run from the project root: python -m pytest src
+"""
+import numpy as np
+import pandas as pd
+
+from config import BUFFER_DURATION_S, MAX_LOSS_FRAC
+from src.buffer_model import OverflowEngine, capacity_curve, capacity_with_buffer
+
+
+def reference_overflow_fraction(arr, cap):
+    """Original pure-Python token-bucket loop"""
+    if len(arr) == 0:
+        return 0.0
+    B_gb = cap * BUFFER_DURATION_S
+    cnt, buf = 0, 0.0
+    for e in np.maximum(arr - cap, 0.0):
+        buf += e
+        if buf > B_gb:
+            cnt += 1
+            buf = 0.0
+    return cnt / len(arr)
+
+
+def reference_capacity(series, tol=1e-6):
+    """Original bisection on top of the reference loop"""
+    arr = series.values.astype(np.float64)
+    lo, hi = float(series.mean()), float(series.max())
+    if reference_overflow_fraction(arr, lo) <= MAX_LOSS_FRAC:
+        return lo
+    for _ in range(60):
+        mid = (lo + hi) / 2.0
+        if hi - lo < tol:
+            break
+        if reference_overflow_fraction(arr, mid) <= MAX_LOSS_FRAC:
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def make_traces(rng):
+    yield rng.exponential(1.0, 2000)                                # bursty
+    yield 5 + rng.uniform(0, 0.01, 2000)                            # long gaps
+    yield np.where(rng.random(2000) < 0.05, rng.uniform(5, 20, 2000),
+                   rng.uniform(0, 1, 2000))                         # spikes
+    yield np.round(rng.normal(3, 1, 1500), 2)                       # ties
+
+
+def test_counts_match_reference():
+    """Overflow counts agree with the slot-by-slot loop"""
+    rng = np.random.default_rng(7)
+    for arr in make_traces(rng):
+        engine = OverflowEngine(arr)
+        caps = rng.uniform(arr.min() - 0.5, arr.max(), 8)
+        expected = [reference_overflow_fraction(arr, c) for c in caps]
+        assert [engine.count(c) / engine.n for c in caps] == expected
+        assert (engine.counts(caps) / engine.n).tolist() == expected
+
+
+def test_long_stretches_match_reference():
+    """Blocks of low-variance slots and exact threshold ties count like the loop"""
+    rng = np.random.default_rng(5)
+    for arr in (rng.normal(5, 0.001, 100_000), 5 + rng.integers(1, 4, 20_000) / 64):
+        engine = OverflowEngine(arr)
+        caps = [5.0, 4.99, *rng.uniform(arr.min(), arr.max(), 3)]
+        assert [engine.count(c) / engine.n for c in caps] == \
+            [reference_overflow_fraction(arr, c) for c in caps]
+
+
+def test_capacity_matches_reference():
+    """Bisection returns bit-identical capacities"""
+    rng = np.random.default_rng(11)
+    for arr in make_traces(rng):
+        series = pd.Series(arr)
+        assert capacity_with_buffer(series) == reference_capacity(series)
+
+
+def test_nan_stops_overflows():
+    """A NaN slot freezes the buffer just like the original loop"""
+    arr = np.array([0.0, 9.0, np.nan, 9.0, 9.0])
+    engine = OverflowEngine(arr)
+    assert engine.count(1.0) / engine.n == reference_overflow_fraction(arr, 1.0)
+
+
+def test_curve_matches_capacity_per_point():
+    """The shared sweep lands within tol of a search per (buffer, loss) pair"""
+    rng = np.random.default_rng(13)
+    buffers, losses = [0.2, 0.001, 0.01, 0.05], [1e-2, 1e-4, 1e-3, 0.0]
+    for arr in list(make_traces(rng)) + [np.full(500, 2.0)]:
+        curve, _ = capacity_curve(arr, buffers, losses)
+        assert curve.shape == (4, 4)
+        for i, b in enumerate(buffers):
+            for j, f in enumerate(losses):
+                expected = capacity_with_buffer(pd.Series(arr), buffer_duration_s=b, max_loss_frac=f)
+                assert abs(curve[i, j] - expected) < 1e-6
+
+    assert np.isnan(capacity_curve(np.full(10, np.nan), buffers, losses)[0]).all()
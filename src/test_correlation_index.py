@@ -0,0 +1,99 @@
+"""
+Checks the correlation index queries against the dense matrix.
+Run from the project root: python -m pytest src
+"""
+import os
+
+import numpy as np
+
+from src import correlation_index
+from src.correlation_index import build_index, index_path, load_index, open_index
+
+
+def block_matrix(rng, n=300, groups=6):
+    """Correlation of noisy signals around a few shared sources"""
+    sources = rng.normal(size=(groups, 400))
+    labels = rng.integers(0, groups, n)
+    signals = sources[labels] + rng.normal(scale=1.5, size=(n, 400))
+    M = np.corrcoef(signals)
+    M[7, :] = M[:, 7] = np.nan                      # a constant cell
+    return [f"cell{i}" for i in range(n)], M
+
+
+def test_queries_match_dense_matrix(tmp_path, monkeypatch):
+    monkeypatch.setattr(correlation_index, "TILE_BASE", 64)
+    rng = np.random.default_rng(0)
+    cells, M = block_matrix(rng)
+    n = len(cells)
+    build_index(cells, M, tmp_path / "corr.idx", top_k=8, edge_min=0.2)
+    index = open_index(tmp_path / "corr.idx")
+    assert index.cells == cells
+
+    # top-k: best neighbours excluding self and NaN
+    idx, val = index.neighbors(5)
+    ranked = np.where(np.isnan(M), -np.inf, M)
+    np.fill_diagonal(ranked, -np.inf)
+    for i in [0, 50, 299]:
+        expected = np.sort(ranked[i])[::-1][:5]
+        np.testing.assert_allclose(val[i], expected, rtol=1e-6)
+        np.testing.assert_allclose(M[i, idx[i]], expected, rtol=1e-6)
+    assert index.neighbors(100)[0].shape == (n, 8)
+
+    # edges: exactly the upper-triangle pairs at or above the threshold, strongest first
+    i, j, v, truncated = index.edges(0.35)
+    iu, ju = np.triu_indices(n, 1)
+    above = M[iu, ju] >= np.float32(0.35)
+    assert not truncated
+    assert set(zip(i.tolist(), j.tolist())) == set(zip(iu[above].tolist(), ju[above].tolist()))
+    assert np.all(np.diff(v) <= 0)
+    i2, j2, v2, truncated = index.edges(0.35, limit=10)
+    assert truncated and len(v2) == 10
+    np.testing.assert_array_equal(v2, v[:10])
+    try:
+        index.edges(0.1)
+        raise AssertionError("threshold below the indexed minimum must be rejected")
+    except ValueError:
+        pass
+
+    # tiles: level 0 is the permuted matrix, level 1 its 2 x 2 means
+    order = index.order
+    assert sorted(order.tolist()) == list(range(n))
+    assert index.levels == [300, 150, 75, 38]
+    np.testing.assert_allclose(index.tile(0, 10, 20, 30, 45),
+                               M[np.ix_(order[10:20], order[30:45])], rtol=1e-6)
+    coarse = index.tile(1, 0, 4, 0, 4)
+    fine = M[np.ix_(order[:8], order[:8])]
+    with np.errstate(invalid="ignore"):
+        expected = np.nanmean(fine.reshape(4, 2, 4, 2), axis=(1, 3))
+    np.testing.assert_allclose(coarse, expected, rtol=1e-5)
+    # the last level ends in a half-empty block
+    assert index.tile(3, 37, 38, 37, 38).shape == (1, 1)
+    for bad in [(4, 0, 1, 0, 1), (0, 290, 301, 0, 1), (0, 0, 600, 0, 10)]:
+        try:
+            index.tile(*bad)
+            raise AssertionError(f"tile {bad} should be rejected")
+        except ValueError:
+            pass
+
+
+def test_rebuilt_when_source_changes(tmp_path):
+    rng = np.random.default_rng(1)
+    csv = tmp_path / "correlation_matrix.csv"
+    csv.write_text("v1")
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return block_matrix(rng, n=40, groups=2)
+
+    first = load_index(csv, loader)
+    assert load_index(csv, loader).n == 40 and len(calls) == 1
+    old_files = set(os.listdir(index_path(csv)))
+
+    csv.write_text("version 2")
+    second = load_index(csv, loader)
+    assert len(calls) == 2
+    # the earlier reader keeps its mapped arrays; the replaced files are gone
+    assert first.neighbors(3)[0].shape == (40, 3)
+    assert not (old_files - {"manifest.json"}) & set(os.listdir(index_path(csv)))
+    assert second.n == 40
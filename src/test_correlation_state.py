@@ -0,0 +1,57 @@
+"""
+Checks incremental and sliding-window correlation against a full pandas rebuild.
+Run from the project root: python -m pytest src
+"""
+import numpy as np
+import pandas as pd
+
+import src.ingest as ingest
+from src.correlation_state import CorrelationState
+
+
+def make_traffic(t0, t1, seed, links=("Link_A", "Link_B", "Link_C")):
+    rng = np.random.default_rng(seed)
+    times = np.round(np.arange(t0, t1, 0.5), 2)
+    base = rng.gamma(2.0, 1.0, len(times))
+    df = pd.concat([
+        pd.DataFrame({"time_seconds": times, "link_id": link,
+                      "aggregated_gbps": np.round(base * (i + 1) + rng.normal(0, 1, len(times)), 4)})
+        for i, link in enumerate(links)
+    ]).sort_values("time_seconds", kind="stable")
+    return df.drop(index=df.index[rng.choice(len(df), len(df) // 20, replace=False)]).reset_index(drop=True)
+
+
+def pandas_corr(df):
+    pivot = df.pivot_table(index="time_seconds", columns="link_id", values="aggregated_gbps", fill_value=0)
+    return pivot.corr().fillna(0)
+
+
+def test_append_matches_full_rebuild(tmp_path):
+    """Chunks split mid-row, a new link and a save/load in between change nothing"""
+    history = make_traffic(0, 100, seed=1)
+    history.to_csv(tmp_path / "upload.csv", index=False)
+    state = CorrelationState(window_s=20.0, n_blocks=10)
+    ingest.ingest_traffic_csv(tmp_path / "upload.csv", tmp_path / "ts.csv", state=state)
+
+    new = make_traffic(100, 160, seed=2, links=("Link_A", "Link_B", "Link_C", "Link_D"))
+    late = pd.DataFrame({"time_seconds": [50.0], "link_id": ["Link_A"], "aggregated_gbps": [99.0]})
+    bounds = np.linspace(0, len(new), 8).astype(int)
+    for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+        chunk = new.iloc[lo:hi]
+        if i == 3:
+            state.save(tmp_path / "state.npz")
+            state = CorrelationState.load(tmp_path / "state.npz")
+            assert state.append(late) == 1
+        state.append(chunk)
+
+    everything = pd.concat([history, new])
+    pd.testing.assert_frame_equal(state.matrix(), pandas_corr(everything), atol=1e-9, check_names=False)
+
+    recent = everything[everything["time_seconds"] >= 140.0]          # 20 s, block aligned
+    pd.testing.assert_frame_equal(state.matrix(window=True), pandas_corr(recent),
+                                  atol=1e-9, check_names=False)
+    assert min(state.blocks) == 70                                     # 140 s / 2 s blocks
+
+
+def test_missing_state_file(tmp_path):
+    assert CorrelationState.load(tmp_path / "none.npz") is None
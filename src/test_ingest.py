@@ -0,0 +1,64 @@
+"""
+Checks the streaming upload ingest against the original in-memory pandas path.
+Run from the project root: python -m pytest src
+"""
+import numpy as np
+import pandas as pd
+
+import src.ingest as ingest
+from src.streaming_stats import QuantileSketch
+
+
+def make_upload(path, seed=5):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(4):
+        times = np.round(np.arange(0, 60, 0.1), 2)
+        frames.append(pd.DataFrame({
+            "time_seconds": times,
+            "link_id": f"Link_Test_{i}",
+            "aggregated_gbps": np.round(rng.gamma(2.0, 1.0 + i, len(times)), 4),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop(index=rng.choice(len(df), 200, replace=False))   # gaps → fill 0
+    df = pd.concat([df, df.sample(50, random_state=1)])           # duplicate samples
+    df = df.sample(frac=1, random_state=2)                        # arbitrary order
+    df.to_csv(path, index=False)
+    return pd.read_csv(path)
+
+
+def test_ingest_matches_pandas(tmp_path, monkeypatch):
+    """Streaming stats, correlation and timeseries match the full-frame path"""
+    df = make_upload(tmp_path / "upload.csv")
+    monkeypatch.setattr(ingest, "SPILL_BUCKET_BYTES", 10_000)     # force many buckets
+
+    stats, corr, link_ids = ingest.ingest_traffic_csv(
+        tmp_path / "upload.csv", tmp_path / "timeseries.csv", chunk_rows=700)
+
+    expected = df.groupby("link_id")["aggregated_gbps"].agg(["mean", "max", lambda x: x.quantile(0.95)])
+    assert stats["link_id"].tolist() == expected.index.tolist()
+    assert np.allclose(stats["avg_gbps"], expected["mean"])
+    assert (stats["peak_gbps"].to_numpy() == expected["max"].to_numpy()).all()
+    assert np.allclose(stats["p95_gbps"], expected.iloc[:, 2], rtol=0.011)
+
+    pivot = df.pivot_table(index="time_seconds", columns="link_id", values="aggregated_gbps", fill_value=0)
+    pd.testing.assert_frame_equal(corr, pivot.corr().fillna(0), atol=1e-9, check_names=False)
+
+    assert link_ids == df["link_id"].unique().tolist()
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "timeseries.csv"), df.reset_index(drop=True))
+
+
+def test_sketch_merge_and_accuracy():
+    """Merged sketches equal one sketch over all values, within relative error"""
+    rng = np.random.default_rng(9)
+    a, b = rng.exponential(3.0, 5000), rng.exponential(3.0, 7000)
+    merged, whole = QuantileSketch(), QuantileSketch()
+    merged.add(a)
+    other = QuantileSketch()
+    other.add(b)
+    merged.merge(other)
+    whole.add(np.concatenate((a, b)))
+    for q in (0.05, 0.5, 0.95, 0.99):
+        assert merged.quantile(q) == whole.quantile(q)
+        exact = np.quantile(np.concatenate((a, b)), q, method="lower")
+        assert abs(merged.quantile(q) - exact) <= 0.0051 * exact
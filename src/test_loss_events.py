@@ -0,0 +1,95 @@
+"""
+Checks the packed-bitset loss-event scores against dense references.
+Run from the project root: python -m pytest src
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import loss_events
+from src.loss_events import LossEvents, LossEventsBuilder, load_results, read_loss_csv
+
+
+def losses(rng, slots=3000, cells=30):
+    """Random loss plus bursts shared by the first ten cells"""
+    X = rng.random((slots, cells)) < 0.01
+    X[::40, :10] = True
+    return X
+
+
+def frame(X, slot0=0):
+    slot, cell = np.nonzero(np.ones_like(X))
+    return pd.DataFrame({"slot_id": slot + slot0, "cell_id": [f"c{c}" for c in cell],
+                         "loss_binary": X.ravel().astype(int)})
+
+
+def test_scores_match_dense_popcount():
+    """Every pair's shared count and Jaccard score, chunked or not, in or out of process"""
+    X = losses(np.random.default_rng(0))
+    events = LossEvents.from_frame(frame(X, slot0=1000))
+    A = X.astype(np.int64)
+    co = A.T @ A
+    assert (events.counts == A.sum(axis=0)).all()
+    assert (events.cooccurrence_block(0, 30) == co).all()
+    assert events.pair(3, 17) == co[3, 17]
+
+    jac = co / (A.sum(axis=0)[:, None] + A.sum(axis=0)[None, :] - co)
+    np.fill_diagonal(jac, -1)
+    nb, shared, score = events.neighbours(k=4)
+    assert np.allclose(score, -np.sort(-jac, axis=1)[:, :4])
+    assert (shared == np.take_along_axis(co, nb, axis=1)).all()
+    assert set(nb[0]) <= set(range(1, 10))
+
+    _, shared2, score2 = events.neighbours(k=4, workers=2, block=7)
+    assert (shared2 == shared).all() and np.allclose(score2, score)
+
+
+def test_byte_table_popcount_without_numpy_2(monkeypatch):
+    """Before NumPy 2.0 has np.bitwise_count, set bits come from a byte table"""
+    words = np.random.default_rng(1).integers(0, 2**63, 1000, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    words[:2] = [0, np.iinfo(np.uint64).max]
+    expected = [bin(int(w)).count("1") for w in words]
+    assert loss_events._popcount_bytes(words).tolist() == expected
+
+    monkeypatch.setattr(loss_events, "_popcount", loss_events._popcount_bytes)
+    X = losses(np.random.default_rng(0))
+    A = X.astype(np.int64)
+    events = LossEvents.from_frame(frame(X))
+    assert (events.counts == A.sum(axis=0)).all()
+    assert (events.cooccurrence_block(0, 30) == A.T @ A).all()
+
+
+def test_windows_and_synchronized_slots(tmp_path):
+    """Coarser windows OR slots together; synchronized windows count cells at once"""
+    X = losses(np.random.default_rng(1), slots=2000, cells=12)
+    df = frame(X)
+    path = tmp_path / "cells.csv"
+    df.to_csv(path, index=False)
+
+    events = read_loss_csv(path, window=8)
+    W = X.reshape(-1, 8, 12).any(axis=1).astype(np.int64)
+    assert events.window == 8 and events.n_slots == 2000
+    assert (events.cooccurrence_block(0, 12) == W.T @ W).all()
+
+    slot, n = events.synchronized(min_cells=3)
+    hits = np.flatnonzero(W.sum(axis=1) >= 3)
+    assert (slot == hits * 8).all() and (n == W.sum(axis=1)[hits]).all()
+
+    events.save(tmp_path / "loss.npz", k=3)
+    data = load_results(tmp_path / "loss.npz")
+    assert data["cells"].tolist() == [f"c{c}" for c in range(12)]
+    assert data["neighbours"].shape == (12, 3)
+    assert (data["events"].counts == events.counts).all()
+
+
+def test_builder_merges_chunks_and_checks_input():
+    """Events of one word arriving in different chunks end up in one entry"""
+    builder = LossEventsBuilder()
+    builder.add([1, 5], ["a", "b"])
+    builder.add([2, 5, 70], ["a", "a", "b"], lost=[1, 1, 0])
+    events = builder.finish()
+    assert len(events) == 2 and len(events.bits) == 2
+    assert events.counts.tolist() == [3, 1] and events.pair(0, 1) == 1
+
+    with pytest.raises(ValueError):
+        LossEventsBuilder(window=0)
@@ -0,0 +1,102 @@
+"""
+Versioning, switching and housekeeping of the dataset snapshot store.
+Run from the project root: python -m pytest src
+"""
+import os
+
+import pandas as pd
+
+from src.artifact_store import load_table, store_path, write_frame
+from src.snapshot_store import SnapshotStore, artifact_files
+
+
+def _dataset(directory, topology: str, rows: int):
+    directory.mkdir(exist_ok=True)
+    (directory / "topology.json").write_text(topology)
+    csv = directory / "summary.csv"
+    df = pd.DataFrame({"link_id": [f"L{i}" for i in range(rows)], "peak_gbps": range(rows)})
+    df.to_csv(csv, index=False)
+    write_frame(df, store_path(csv), source=csv)
+    return artifact_files(directory, "data", ["topology.json", "summary.csv"])
+
+
+def test_versions_are_content_addressed_and_switch_by_one_swap(tmp_path):
+    live = tmp_path / "live"
+    live.mkdir()
+    store = SnapshotStore(tmp_path / "snapshots", {"data": live})
+
+    first = store.commit(_dataset(tmp_path / "a", '{"v": 1}', 3), label="a")
+    again = store.commit(_dataset(tmp_path / "a2", '{"v": 1}', 3), label="a again")
+    second = store.commit(_dataset(tmp_path / "b", '{"v": 2}', 5), label="b")
+    assert first != second
+    # identical files are stored once, whichever version they belong to
+    objects = lambda v: {p: e["object"] for p, e in store.version(v)["files"].items()}
+    assert objects(first)["data/topology.json"] == objects(again)["data/topology.json"]
+    assert objects(first)["data/summary.csv"] == objects(again)["data/summary.csv"]
+    assert store.commit(_dataset(tmp_path / "a", '{"v": 1}', 3)) == store.commit(
+        artifact_files(tmp_path / "a", "data", ["topology.json", "summary.csv"]))
+
+    assert store.checkout(first) > 0 and store.head == first
+    assert (live / "topology.json").read_text() == '{"v": 1}'
+    assert len(load_table(live / "summary.csv")) == 3          # store stamps survive the link
+    obj = store._object(store.version(first)["files"]["data/topology.json"]["object"])
+    tree_file = store._tree(first) / "data" / "topology.json"
+    assert not os.path.samefile(tree_file, obj)
+    assert obj.stat().st_mode & 0o222 == 0 and tree_file.stat().st_mode & 0o222 == 0
+
+    # switching only swaps the link: live paths both versions have are not rewritten
+    link = os.lstat(live / "topology.json")
+    assert store.checkout(second) > 0
+    assert os.lstat(live / "topology.json").st_ino == link.st_ino
+    assert (live / "topology.json").read_text() == '{"v": 2}'
+    assert len(load_table(live / "summary.csv")) == 5
+    assert os.path.samefile(live / "topology.json", store._tree(second) / "data" / "topology.json")
+    assert store.checkout(second) == 0                         # already live: nothing to do
+
+    # a live file replaced by a batch job is linked back on the next checkout
+    edited = tmp_path / "edited.json"
+    edited.write_text('{"v": "edited"}')
+    os.replace(edited, live / "topology.json")
+    assert store.checkout(second) == 1
+    assert (live / "topology.json").read_text() == '{"v": 2}'
+
+    # an in-place rewrite (where permitted) reaches the tree, never the object
+    if os.access(live / "topology.json", os.W_OK):
+        (live / "topology.json").write_text('{"v": "edited"}')
+        assert store.checkout(second) == 1
+        assert (live / "topology.json").read_text() == '{"v": 2}'
+    assert obj.read_text() == '{"v": 1}'
+
+
+def test_overlay_memo_and_gc(tmp_path):
+    live = tmp_path / "live"
+    live.mkdir()
+    store = SnapshotStore(tmp_path / "snapshots", {"data": live})
+    base = store.commit(_dataset(tmp_path / "a", '{"v": 1}', 3))
+    store.set_ref("original", base)
+
+    patch = tmp_path / "patch"
+    patch.mkdir()
+    (patch / "summary.csv").write_text("link_id,peak_gbps\nL9,9\n")
+    overlay = store.commit({"data/summary.csv": patch / "summary.csv"}, base=base,
+                           replaces=["data/summary.csv"])
+    files = store.version(overlay)["files"]
+    assert "data/topology.json" in files
+    assert not any(p.startswith("data/summary.cols/") for p in files)   # stale store dropped
+
+    store.checkout(overlay)
+    assert not (live / "summary.cols" / "manifest.json").exists()
+    assert pd.read_csv(live / "summary.csv")["link_id"].tolist() == ["L9"]
+
+    store.remember("upload:abc", overlay)
+    assert store.lookup("upload:abc") == overlay and store.lookup("upload:other") is None
+    store.forget("upload:abc")
+    assert store.lookup("upload:abc") is None
+
+    for i in range(4):
+        store.commit(_dataset(tmp_path / f"x{i}", f'{{"v": {10 + i}}}', 2))
+    store.gc(keep=1)
+    kept = {v["id"] for v in store.versions()}
+    assert {base, overlay} <= kept and len(kept) == 3          # refs (original, HEAD) + newest
+    assert {p.name for p in (store.directory / "trees").iterdir()} == kept
+    assert (live / "topology.json").read_text() == '{"v": 1}'
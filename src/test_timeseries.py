@@ -0,0 +1,55 @@
+"""
+Checks time-range selection and min/max downsampling of link traffic.
+Run from the project root: python -m pytest src
+"""
+import numpy as np
+import pandas as pd
+
+from src.timeseries import TrafficIndex, minmax_downsample, window_traffic
+
+
+def test_downsample_keeps_extremes():
+    """Bounded output that still contains every bucket's burst"""
+    rng = np.random.default_rng(4)
+    t = np.arange(100_000) * 0.0005
+    y = rng.normal(5, 0.5, len(t))
+    y[[1234, 56_789, 99_000]] = [40.0, 55.0, -3.0]                 # bursts / dip
+
+    idx = minmax_downsample(t, y, 400)
+    assert len(idx) <= 400
+    assert (np.diff(idx) > 0).all()
+    assert {1234, 56_789, 99_000} <= set(idx.tolist())
+
+
+def test_window_traffic_per_link():
+    """Range filter and per-link budget on an interleaved frame"""
+    t = np.repeat(np.arange(1000) * 0.1, 2)
+    df = pd.DataFrame({
+        "time_seconds": t,
+        "link_id": np.tile(["Link_A", "Link_B"], 1000),
+        "aggregated_gbps": np.sin(t) + np.tile([0.0, 10.0], 1000),
+    })
+
+    out = window_traffic(df, start=10.0, end=50.0, max_points=20)
+    assert out["time_seconds"].between(10.0, 50.0).all()
+    assert out.groupby("link_id").size().max() <= 20
+    assert out.index.is_monotonic_increasing
+
+    assert window_traffic(df) is df
+
+
+def test_traffic_index_lookup():
+    """Alias resolution, time-sorted slices and file order across matches"""
+    df = pd.DataFrame({
+        "time_seconds": [0.2, 0.0, 0.1, 0.1, 0.0, 0.2],
+        "link_id": ["Link_A", "Link_B", "Link_A", "Link_B", "Link_A", np.nan],
+        "aggregated_gbps": [3.0, 1.0, 2.0, 4.0, 1.5, 9.0],
+    })
+    index = TrafficIndex(df)
+
+    assert index.lookup("link_a")["time_seconds"].tolist() == [0.0, 0.1, 0.2]
+    assert index.lookup(" LINK_B ", start=0.05)["aggregated_gbps"].tolist() == [4.0]
+    assert index.lookup("Link_C").empty
+
+    both = index.lookup("link")
+    assert both.index.tolist() == [0, 1, 2, 3, 4]                 # original row order
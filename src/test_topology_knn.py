@@ -0,0 +1,107 @@
+"""
+Checks the kNN-graph topology inference against the dense pipeline.
+Run from the project root: python -m pytest src
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.test_topology_inference import planted_signals
+import src.topology_knn as topology_knn
+from src.artifact_store import write_frame
+from src.topology_inference import average_linkage, infer_topology, load_signals
+from src.topology_knn import (LongSignals, infer_topology_knn, knn_graph, lags_to,
+                              sparse_average_linkage, write_knn_outputs)
+
+
+def test_sparse_linkage_on_a_full_graph_matches_dense():
+    """With every pair listed, the graph clustering is plain average linkage"""
+    rng = np.random.default_rng(1)
+    pts = np.concatenate([rng.normal(c, 0.4, (7, 2)) for c in (0, 3, 6, 9)])
+    sim = np.exp(-np.linalg.norm(pts[:, None] - pts[None], axis=-1))
+    n = len(sim)
+    neighbours = np.array([[j for j in range(n) if j != i] for i in range(n)])
+    weights = np.take_along_axis(sim, neighbours, axis=1)
+
+    labels = sparse_average_linkage(n, neighbours, weights, 4)
+    assert (labels == average_linkage(1.0 - sim, 4)).all()
+
+
+def test_silent_cells_follow_their_neighbour():
+    """Cells without positive edges do not take up a cluster of their own"""
+    neighbours = np.array([[1], [0], [3], [2], [0], [3]])
+    weights = np.array([[0.9], [0.9], [0.8], [0.8], [0.0], [-0.1]])
+    assert sparse_average_linkage(6, neighbours, weights, 2).tolist() == [0, 0, 1, 1, 0, 1]
+
+
+def test_approximate_search_finds_the_exact_neighbours():
+    """The sketch only proposes candidates; scores are exact"""
+    rng = np.random.default_rng(3)
+    base = rng.standard_normal((2000, 8))
+    Z = base[:, rng.integers(0, 8, 120)] + 0.3 * rng.standard_normal((2000, 120))
+    Z = (Z - Z.mean(axis=0)) / np.linalg.norm(Z - Z.mean(axis=0), axis=0)
+
+    exact_nb, exact_w = knn_graph(Z, k=5, sketch_dim=10_000)
+    approx_nb, approx_w = knn_graph(Z, k=5, sketch_dim=64)
+    assert np.allclose(exact_w, (Z.T @ Z)[np.arange(120)[:, None], exact_nb])
+    assert np.mean(approx_w[:, -1] >= exact_w[:, -1] - 1e-12) > 0.95
+
+
+def test_recovers_planted_links_like_the_dense_pipeline(tmp_path):
+    """Same links and cell lags as infer_topology, with sampled quality metrics"""
+    rng = np.random.default_rng(2)
+    signals, _ = planted_signals(rng, groups=4, per_group=5)
+    dense, _, lag = infer_topology(signals, n_links=4, max_lag=5)
+
+    for sketch_dim in (10_000, 32):
+        topology, graph = infer_topology_knn(signals, n_links=4, max_lag=5, k=4,
+                                             sketch_dim=sketch_dim, sample=10)
+        assert topology["links"] == dense["links"]
+        assert set(topology) >= {"n_cells", "n_links", "quality_metrics", "links"}
+        assert topology["quality_sample_cells"] == 8            # every link represented
+        assert topology["quality_metrics"]["within_cluster_correlation"] > 0.8
+        assert len(graph) == 20 * 4 and list(graph.columns) == ["cell", "neighbor", "correlation"]
+
+    members = np.array([3, 7, 11, 19])
+    assert (lags_to(signals.to_numpy(), members, 0, 5) == lag.to_numpy()[members, 0]).all()
+
+    write_knn_outputs(topology, graph, tmp_path)
+    assert json.loads((tmp_path / "topology.json").read_text())["n_links"] == 4
+    assert len(pd.read_csv(tmp_path / "knn_graph.csv")) == len(graph)
+
+
+def test_long_table_is_streamed_like_the_pivoted_frame(tmp_path, monkeypatch):
+    """CSV and columnar tables, read in chunks, give what the pivoted frame gives"""
+    rng = np.random.default_rng(4)
+    signals, _ = planted_signals(rng, groups=3, per_group=4)
+    long = signals.rename_axis("slot_id").reset_index().melt(
+        id_vars="slot_id", var_name="cell_id", value_name="loss_binary")
+    long = long[(long["loss_binary"] > 0) | (long["cell_id"] == 1)].sample(frac=1, random_state=0)
+    long["cell_id"] = long["cell_id"].astype(np.int64)
+    long.to_csv(tmp_path / "cells.csv", index=False)
+    write_frame(long.reset_index(drop=True), tmp_path / "cells.cols")
+
+    frame = load_signals(tmp_path / "cells.csv")
+    expected, expected_graph = infer_topology_knn(frame, n_links=3, max_lag=5, k=4, sample=6)
+    monkeypatch.setattr(topology_knn, "RAW_BYTES", 8 * len(frame) * 3)      # two columns a read
+    for path in (tmp_path / "cells.csv", tmp_path / "cells.cols"):
+        table = LongSignals(path, chunk_rows=1000)
+        assert table.cells == list(frame.columns) and table.n_samples == len(frame)
+        assert np.allclose(table.binned(11), topology_knn._binned(frame.to_numpy(), 11))
+        assert (table.columns([5, 2, 5]) == frame.to_numpy()[:, [5, 2, 5]]).all()
+
+        topology, graph = infer_topology_knn(table, n_links=3, max_lag=5, k=4, sample=6)
+        assert topology["links"] == expected["links"]
+        assert topology["quality_metrics"] == expected["quality_metrics"]
+        assert np.allclose(graph["correlation"], expected_graph["correlation"])
+
+        # one pass after the axes: the lags and quality read the spilled samples
+        table, scans = LongSignals(path, chunk_rows=1000), []
+        read = table._read
+        monkeypatch.setattr(table, "_read", lambda columns: scans.append(columns) or read(columns))
+        assert infer_topology_knn(table, n_links=3, max_lag=5, k=4, sample=6)[0]["links"] == expected["links"]
+        assert len(scans) == 1
+        assert (LongSignals(path, chunk_rows=1000).columns([3]) == frame.to_numpy()[:, [3]]).all()
+        for pivoted in (LongSignals(path, chunk_rows=1000).frame(), table.frame()):     # before and after a spill
+            pd.testing.assert_frame_equal(pivoted, frame, check_dtype=False)
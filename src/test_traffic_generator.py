@@ -0,0 +1,61 @@
+"""
+Checks the synthetic traffic generator: consistency, streaming and ground truth.
+Run from the project root: python -m pytest src
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.artifact_store import load_table
+from src.topology_inference import infer_topology
+from src.traffic_generator import TrafficGenerator, generate
+
+
+def test_links_sum_their_cells_and_chunks_stay_bounded():
+    gen = TrafficGenerator(n_links=4, cells_per_link=(2, 5), slot_s=0.001, seed=3, chunk_slots=700)
+    parts = list(gen.chunks(2.0))
+    assert len(parts) == 3 and all(len(c) <= 700 * gen.n_cells for _, c in parts)
+    links = pd.concat([l for l, _ in parts], ignore_index=True)
+    cells = pd.concat([c for _, c in parts], ignore_index=True)
+    assert len(links) == 2000 * 4 and len(cells) == 2000 * gen.n_cells
+
+    truth = gen.ground_truth()
+    cell_link = {c: name for name, link in truth["links"].items() for c in link["cells"]}
+    summed = cells.groupby([cells["time_seconds"], cells["cell_id"].map(cell_link)])["throughput_gbps"].sum()
+    direct = links.set_index(["time_seconds", links["link_id"].astype(str)])["aggregated_gbps"]
+    assert np.allclose(summed.sort_index().to_numpy(), direct.sort_index().to_numpy(), atol=1e-3)
+
+    again = pd.concat([l for l, _ in TrafficGenerator(n_links=4, cells_per_link=(2, 5), slot_s=0.001,
+                                                       seed=3, chunk_slots=700).chunks(2.0, cells=False)],
+                      ignore_index=True)
+    pd.testing.assert_frame_equal(links, again)
+
+
+def test_inference_recovers_ground_truth():
+    gen = TrafficGenerator(n_links=3, cells_per_link=(4, 8), seed=1)
+    cells = pd.concat([c for _, c in gen.chunks(10.0)])
+    assert 0.001 < cells["loss_binary"].mean() < 0.05
+    signals = cells.pivot(index="slot_id", columns="cell_id", values="loss_binary")
+    topology, _, _ = infer_topology(signals, 3, gen.max_lag)
+
+    truth = gen.ground_truth()["links"]
+    found = sorted(sorted(link["cells"]) for link in topology["links"].values())
+    assert found == sorted(sorted(link["cells"]) for link in truth.values())
+
+
+def test_generate_streams_csv_and_columnar(tmp_path):
+    model = {"n_links": 2, "cells_per_link": 3, "slot_s": 0.01, "seed": 5, "chunk_slots": 64}
+    csv = generate(tmp_path / "csv", 3.0, fmt="csv", **model)
+    cols = generate(tmp_path / "cols", 3.0, fmt="columnar", **model)
+    assert csv["rows"] == cols["rows"] == {"links": 600, "cells": 1800}
+
+    for name in ("links", "cells"):
+        from_csv = pd.read_csv(csv["paths"][name])
+        from_cols = load_table(cols["paths"][name])
+        assert list(from_csv.columns) == list(from_cols.columns)
+        assert np.allclose(from_csv.select_dtypes("number"), from_cols.select_dtypes("number"))
+    assert set(pd.read_csv(csv["paths"]["links"])["link_id"]) == {"Link_A", "Link_B"}
+
+    truth = json.loads(open(csv["ground_truth"]).read())
+    assert sorted(c for link in truth["links"].values() for c in link["cells"]) == list(range(1, 7))
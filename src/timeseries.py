@@ -0,0 +1,161 @@
+"""
+Time-range selection and peak-preserving downsampling of link traffic.
+"""
+import numpy as np
+import pandas as pd
+
+
+def minmax_downsample(times: np.ndarray, values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of at most `max_points` samples of a time-sorted series.
+
+    The time span is cut into max_points // 2 equal-width buckets and the
+    minimum and maximum sample of each bucket are kept, so bursts and dips
+    survive however far the series is reduced.
+    """
+    n = len(times)
+    if n <= max_points:
+        return np.arange(n)
+
+    n_buckets = max(max_points // 2, 1)
+    t0, t1 = times[0], times[-1]
+    if t1 > t0:
+        bucket = ((times - t0) / (t1 - t0) * n_buckets).astype(np.int64)
+        np.clip(bucket, 0, n_buckets - 1, out=bucket)
+    else:
+        bucket = np.zeros(n, dtype=np.int64)
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    counts = np.diff(np.concatenate((starts, [n])))
+    member = np.repeat(np.arange(len(starts)), counts)
+
+    lo_key = np.where(np.isnan(values), np.inf, values)
+    hi_key = np.where(np.isnan(values), -np.inf, values)
+    mins = np.minimum.reduceat(lo_key, starts)
+    maxs = np.maximum.reduceat(hi_key, starts)
+
+    picked = []
+    for key, extreme in ((lo_key, mins), (hi_key, maxs)):
+        hits = np.flatnonzero(key == extreme[member])
+        _, first = np.unique(member[hits], return_index=True)
+        picked.append(hits[first])
+    return np.unique(np.concatenate(picked))
+
+
+def window_traffic(df: pd.DataFrame, start: float = None, end: float = None,
+                   max_points: int = None) -> pd.DataFrame:
+    """
+    Rows of a (time_seconds, link_id, aggregated_gbps) frame inside
+    [start, end], downsampled to at most max_points per link. Rows keep
+    their original order.
+    """
+    if start is None and end is None and max_points is None:
+        return df
+
+    t = df["time_seconds"].to_numpy(dtype=np.float64)
+    keep = np.ones(len(df), dtype=bool)
+    if start is not None:
+        keep &= t >= start
+    if end is not None:
+        keep &= t <= end
+    if max_points is not None:
+        keep &= ~np.isnan(t)
+    pos = np.flatnonzero(keep)
+
+    if max_points is not None and len(pos) > max_points:
+        y = df["aggregated_gbps"].to_numpy(dtype=np.float64)
+        codes, _ = pd.factorize(df["link_id"].iloc[pos])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+
+        selected = []
+        for part in np.split(pos[order], bounds):
+            part = part[np.argsort(t[part], kind="stable")]
+            selected.append(part[minmax_downsample(t[part], y[part], max_points)])
+        pos = np.sort(np.concatenate(selected))
+
+    return df.iloc[pos]
+
+
+def _normalize_link(link_id) -> str:
+    return str(link_id).strip().casefold()
+
+
+class TrafficIndex:
+    """
+    Per-link lookup over a (time_seconds, link_id, aggregated_gbps) frame.
+
+    Rows are arranged once into contiguous, time-sorted slices per link
+    (zero-copy when the file is already link-major and time-ordered), and
+    link names resolve through an exact / case-insensitive alias map, so a
+    lookup costs the same however many links the file holds.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        codes, links = pd.factorize(df["link_id"])
+        t = df["time_seconds"].to_numpy(dtype=np.float64)
+
+        d_code, d_t = np.diff(codes), np.diff(t)
+        already_sorted = (len(df) == 0 or codes[0] >= 0) and bool(
+            np.all((d_code > 0) | ((d_code == 0) & (d_t >= 0)))
+        )
+        if already_sorted:
+            order = np.arange(len(df))
+            self.frame = df
+        else:
+            order = np.lexsort((t, codes))
+            order = order[codes[order] >= 0]             # rows without a link id
+            self.frame = df.iloc[order]
+
+        self._row_pos = order
+        self._times = t[order]
+        self._values = self.frame["aggregated_gbps"].to_numpy(dtype=np.float64)
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(codes[order], minlength=len(links)))))
+
+        self.links = list(links)
+        self._exact = {}
+        self._alias = {}
+        for i, link in enumerate(self.links):
+            self._exact.setdefault(link, i)
+            self._exact.setdefault(str(link), i)
+            self._alias.setdefault(_normalize_link(link), i)
+
+    def resolve(self, link_id) -> list:
+        """Link positions for a requested name: exact, then case-insensitive, then substring."""
+        if link_id in self._exact:
+            return [self._exact[link_id]]
+        key = _normalize_link(link_id)
+        if key in self._alias:
+            return [self._alias[key]]
+        return [i for i, link in enumerate(self.links) if key in _normalize_link(link)]
+
+    def link_arrays(self, i: int) -> tuple:
+        """Time-sorted (times, values) views of link i, without NaN times."""
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        hi = lo + int(self._times[lo:hi].searchsorted(np.inf, side="right"))
+        return self._times[lo:hi], self._values[lo:hi]
+
+    def _slice(self, i: int, start, end, max_points) -> np.ndarray:
+        lo, hi = int(self._offsets[i]), int(self._offsets[i + 1])
+        times = self._times[lo:hi]
+        if start is not None or end is not None or max_points is not None:
+            hi = lo + int(times.searchsorted(np.inf, side="right"))    # NaN times sort last
+        if start is not None:
+            lo += int(self._times[lo:hi].searchsorted(start, side="left"))
+        if end is not None:
+            hi = lo + int(self._times[lo:hi].searchsorted(end, side="right"))
+        if max_points is not None and hi - lo > max_points:
+            return lo + minmax_downsample(self._times[lo:hi], self._values[lo:hi], max_points)
+        return np.arange(lo, hi)
+
+    def lookup(self, link_id, start: float = None, end: float = None,
+               max_points: int = None) -> pd.DataFrame:
+        """Rows of the requested link(s), optionally range-limited and downsampled."""
+        ids = self.resolve(link_id)
+        if not ids:
+            return self.frame.iloc[:0]
+        parts = [self._slice(i, start, end, max_points) for i in ids]
+        pos = np.concatenate(parts)
+        if len(ids) > 1:
+            pos = pos[np.argsort(self._row_pos[pos], kind="stable")]   # file order across links
+        return self.frame.iloc[pos]
@@ -0,0 +1,395 @@
+"""
+Lag-aware topology inference from per-cell signals.
+
+For every pair of cells the Pearson correlation is taken at each lag in
+[-max_lag, max_lag] over the overlapping samples (as np.corrcoef of the
+shifted series would give), and the best lag and its correlation kept.
+Cross-products for all lags come from FFTs: time is cut into segments,
+each pair block's cross-spectra are summed over segments, and a single
+inverse FFT per pair yields every lag at once, so memory is bounded by
+the block size and cost grows with T * N^2 rather than T * N^2 * lags.
+Blocks can run in worker processes.
+
+Cells are then grouped into links by average-linkage clustering on
+1 - peak correlation, and the result is written as topology.json /
+correlation_matrix.csv. All of this is O(N^2) in the number of cells;
+src/topology_knn.py is the variant for thousands of cells.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import MAX_ALIGNMENT_LAG, N_EXPECTED_LINKS
+
+BLOCK_SIZE = 64             # cells per side of a pair block
+MIN_FFT = 256
+KNN_MIN_CELLS = 2000        # the CLI switches to src/topology_knn.py from here
+
+_worker_signals = None      # (X, prefix sums) in each worker process
+
+
+def _next_pow2(n: int) -> int:
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+
+def _standardize(signals: np.ndarray):
+    """Zero-mean, unit-variance columns; constant columns become zeros."""
+    X = np.asarray(signals, dtype=np.float64)
+    X = np.where(np.isnan(X), 0.0, X)
+    sd = X.std(axis=0)
+    valid = sd > 0
+    X = np.divide(X - X.mean(axis=0), sd, out=np.zeros_like(X), where=valid)
+    return X, valid
+
+
+def _overlap_sums(X: np.ndarray, max_lag: int):
+    """
+    Per lag k in -L..L: sample count and the sums / sums of squares of the
+    leading series a[max(k,0) : T+min(k,0)] and the lagging series
+    b[max(-k,0) : T-max(k,0)], each (2L+1 x N).
+    """
+    T = len(X)
+    c1 = np.vstack((np.zeros(X.shape[1]), np.cumsum(X, axis=0)))
+    c2 = np.vstack((np.zeros(X.shape[1]), np.cumsum(X * X, axis=0)))
+    lags = np.arange(-max_lag, max_lag + 1)
+    a_lo, a_hi = np.maximum(lags, 0), T + np.minimum(lags, 0)
+    b_lo, b_hi = np.maximum(-lags, 0), T - np.maximum(lags, 0)
+    n = (T - np.abs(lags)).astype(np.float64)
+    return (n, c1[a_hi] - c1[a_lo], c2[a_hi] - c2[a_lo],
+            c1[b_hi] - c1[b_lo], c2[b_hi] - c2[b_lo])
+
+
+def _lagged_products(X: np.ndarray, I: slice, J: slice, max_lag: int) -> np.ndarray:
+    """sum_t X[t+k, i] * X[t, j] for i in I, j in J, k in -L..L -> (|I|, |J|, 2L+1)."""
+    T = len(X)
+    width = 2 * max_lag + 1
+    nfft = min(max(MIN_FFT, _next_pow2(8 * width)), _next_pow2(T + 2 * max_lag))
+    seg = nfft - 2 * max_lag
+
+    a_pad = np.vstack((np.zeros((max_lag, I.stop - I.start)), X[:, I], np.zeros((max_lag, I.stop - I.start))))
+    acc = None
+    for t0 in range(0, T, seg):
+        t1 = min(t0 + seg, T)
+        # a[t0-L .. t1+L) against b[t0 .. t1): circular lag d = k + L never wraps
+        U = np.fft.rfft(a_pad[t0:t1 + 2 * max_lag], n=nfft, axis=0)
+        V = np.fft.rfft(X[t0:t1, J], n=nfft, axis=0)
+        prod = U.T[:, None, :] * V.T.conj()[None, :, :]
+        acc = prod if acc is None else acc + prod
+    return np.fft.irfft(acc, n=nfft, axis=-1)[..., :width]
+
+
+def _pair_block(X: np.ndarray, sums, I: slice, J: slice, max_lag: int):
+    n, sa, saa, sb, sbb = sums
+    sab = _lagged_products(X, I, J, max_lag)                         # (|I|, |J|, lags)
+    sa, saa = sa[:, I].T[:, None, :], saa[:, I].T[:, None, :]
+    sb, sbb = sb[:, J].T[None, :, :], sbb[:, J].T[None, :, :]
+    cov = sab - sa * sb / n
+    var = (saa - sa * sa / n) * (sbb - sb * sb / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var)
+    corr[~np.isfinite(corr) | (var <= 1e-12 * n * n)] = 0.0
+    best = np.argmax(corr, axis=-1)                                 # first max: most negative lag
+    peak = np.take_along_axis(corr, best[..., None], axis=-1)[..., 0]
+    return np.clip(peak, -1.0, 1.0), best - max_lag
+
+
+def _init_worker(X: np.ndarray, sums) -> None:
+    global _worker_signals
+    _worker_signals = (X, sums)
+
+
+def _run_block(task):
+    I, J, max_lag = task
+    X, sums = _worker_signals
+    return I, J, _pair_block(X, sums, I, J, max_lag)
+
+
+def lagged_correlation(signals, max_lag: int = MAX_ALIGNMENT_LAG,
+                       block_size: int = BLOCK_SIZE, workers: int = 1):
+    """
+    Peak cross-correlation and best lag for every pair of columns of a
+    (time x cell) array.
+
+    Returns (peak, lag), both N x N. lag[i, j] = k means cell i at t + k
+    lines up best with cell j at t (i trails j by k samples); peak is
+    symmetric and lag antisymmetric. Constant cells correlate 0 at lag 0.
+    `workers=None` uses one process per CPU.
+    """
+    X, valid = _standardize(signals)
+    T, N = X.shape
+    max_lag = int(max(0, min(max_lag, T - 2)))
+    peak = np.zeros((N, N))
+    lag = np.zeros((N, N), dtype=np.int64)
+    if T < 2 or N == 0:
+        return peak, lag
+
+    sums = _overlap_sums(X, max_lag)
+    edges = list(range(0, N, block_size)) + [N]
+    blocks = [slice(lo, hi) for lo, hi in zip(edges[:-1], edges[1:])]
+    tasks = [(I, J, max_lag) for a, I in enumerate(blocks) for J in blocks[a:]]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, sums)) as pool:
+            results = list(pool.map(_run_block, tasks))
+    else:
+        results = [(I, J, _pair_block(X, sums, I, J, max_lag)) for I, J, _ in tasks]
+
+    for I, J, (p, k) in results:
+        peak[I, J], lag[I, J] = p, k
+        peak[J, I], lag[J, I] = p.T, -k.T
+
+    lag[~valid, :] = 0
+    lag[:, ~valid] = 0
+    np.fill_diagonal(peak, np.where(valid, 1.0, 0.0))
+    np.fill_diagonal(lag, 0)
+    return peak, lag
+
+
+def _linkage_merges(dist: np.ndarray) -> list:
+    """
+    Average-linkage merges (distance, a, b) in distance order, where a and b
+    are representative cells of the clusters joined. Nearest-neighbour
+    chain: O(N^2) time on a dense distance matrix.
+    """
+    N = len(dist)
+    D = np.array(dist, dtype=np.float64)
+    np.fill_diagonal(D, np.inf)
+    size = np.ones(N)
+    active = np.ones(N, dtype=bool)
+    merges = []
+    chain = []
+
+    while active.sum() > 1:
+        if not chain:
+            chain.append(int(np.flatnonzero(active)[0]))
+        a = chain[-1]
+        row = np.where(active, D[a], np.inf)
+        b = int(np.argmin(row))
+        if len(chain) > 1 and row[chain[-2]] <= row[b]:
+            b = chain[-2]
+        if len(chain) > 1 and b == chain[-2]:
+            chain = chain[:-2]
+            merges.append((row[b], a, b))
+            keep, drop = min(a, b), max(a, b)
+            merged = (size[a] * D[a] + size[b] * D[b]) / (size[a] + size[b])
+            D[keep], D[:, keep] = merged, merged
+            D[keep, keep] = np.inf
+            D[drop], D[:, drop] = np.inf, np.inf
+            size[keep] += size[drop]
+            active[drop] = False
+        else:
+            chain.append(b)
+
+    # average linkage is reducible: applying the merges in distance order
+    # gives the same dendrogram
+    return sorted(merges)
+
+
+def _union_find(N: int):
+    parent = np.arange(N)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    return parent, find
+
+
+def average_linkage(dist: np.ndarray, n_clusters: int) -> np.ndarray:
+    """
+    Flat cluster labels (0..n_clusters-1) from average-linkage hierarchical
+    clustering, cut where n_clusters remain.
+    """
+    N = len(dist)
+    n_clusters = max(1, min(n_clusters, N))
+    parent, find = _union_find(N)
+    for _, a, b in _linkage_merges(dist)[:N - n_clusters]:
+        parent[find(a)] = find(b)
+    roots = np.array([find(i) for i in range(N)])
+    _, first = np.unique(roots, return_index=True)
+    order = {root: label for label, root in enumerate(roots[np.sort(first)])}
+    return np.array([order[r] for r in roots], dtype=np.int64)
+
+
+def dendrogram_order(dist: np.ndarray) -> np.ndarray:
+    """Leaf order of the average-linkage dendrogram: clusters sit in contiguous runs."""
+    N = len(dist)
+    parent, find = _union_find(N)
+    leaves = {i: [i] for i in range(N)}
+    for _, a, b in _linkage_merges(dist):
+        ra, rb = find(a), find(b)
+        parent[rb] = ra
+        leaves[ra] = leaves[ra] + leaves.pop(rb)
+    return np.array([i for root in sorted(leaves) for i in leaves[root]], dtype=np.int64)
+
+
+def cluster_quality(corr: np.ndarray, labels: np.ndarray) -> dict:
+    """Silhouette, Davies-Bouldin and within/between-cluster correlation."""
+    N = len(labels)
+    k = labels.max() + 1 if N else 0
+    dist = np.clip(1.0 - corr, 0.0, 2.0)
+    np.fill_diagonal(dist, 0.0)
+    onehot = np.eye(k)[labels]
+    counts = onehot.sum(axis=0)
+
+    sums = dist @ onehot
+    own = labels
+    a = sums[np.arange(N), own] / np.maximum(counts[own] - 1, 1)
+    mean_to = sums / np.maximum(counts, 1)
+    mean_to[np.arange(N), own] = np.inf
+    b = mean_to.min(axis=1) if k > 1 else np.zeros(N)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(counts[own] > 1, (b - a) / np.maximum(a, b), 0.0)
+    silhouette = float(np.nan_to_num(s).mean()) if k > 1 else 0.0
+
+    centroids = (onehot.T @ corr) / np.maximum(counts, 1)[:, None]
+    scatter = np.array([np.linalg.norm(corr[labels == c] - centroids[c], axis=1).mean() for c in range(k)])
+    sep = np.linalg.norm(centroids[:, None, :] - centroids[None, :, :], axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = (scatter[:, None] + scatter[None, :]) / sep
+    np.fill_diagonal(ratio, -np.inf)
+    davies_bouldin = float(ratio.max(axis=1).mean()) if k > 1 else 0.0
+
+    iu = np.triu_indices(N, k=1)
+    same = labels[iu[0]] == labels[iu[1]]
+    within, between = corr[iu][same], corr[iu][~same]
+    w = float(within.mean()) if len(within) else 0.0
+    bt = float(between.mean()) if len(between) else 0.0
+    return {
+        "silhouette_score": silhouette,
+        "davies_bouldin_index": davies_bouldin,
+        "within_cluster_correlation": w,
+        "within_cluster_std": float(within.std()) if len(within) else 0.0,
+        "between_cluster_correlation": bt,
+        "between_cluster_std": float(between.std()) if len(between) else 0.0,
+        "separation_ratio": w / bt if bt > 0 else float("inf"),
+    }
+
+
+def _link_name(i: int) -> str:
+    name = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        name = chr(ord("A") + r) + name
+    return f"Link_{name}"
+
+
+def _plain(v):
+    return v.item() if isinstance(v, np.generic) else v
+
+
+def infer_topology(signals: pd.DataFrame, n_links: int = N_EXPECTED_LINKS,
+                   max_lag: int = MAX_ALIGNMENT_LAG, workers: int = 1):
+    """
+    Group cells into links from a (time x cell) frame.
+
+    Returns (topology, corr, lags): the topology.json document, and the
+    peak-correlation and best-lag matrices as cell-indexed DataFrames.
+    Each link lists its cells and, per cell, the lag in samples behind the
+    link's first cell.
+    """
+    cells = [_plain(c) for c in signals.columns]
+    peak, lag = lagged_correlation(signals.to_numpy(), max_lag=max_lag, workers=workers)
+    labels = average_linkage(np.clip(1.0 - peak, 0.0, 2.0), n_links)
+
+    links = {}
+    for c in range(labels.max() + 1 if len(labels) else 0):
+        members = np.flatnonzero(labels == c)
+        ref = members[0]
+        links[_link_name(c)] = {
+            "cells": [cells[i] for i in members],
+            "cell_count": int(len(members)),
+            "cell_lags": {str(cells[i]): int(lag[i, ref]) for i in members},
+        }
+
+    topology = {
+        "topology_version": "1.0",
+        "inference_method": "lagged_xcorr_average_linkage",
+        "inference_timestamp": datetime.now().isoformat(),
+        "n_cells": len(cells),
+        "n_links": len(links),
+        "max_lag": int(max_lag),
+        "quality_metrics": cluster_quality(peak, labels) if len(cells) else {},
+        "links": links,
+    }
+    corr = pd.DataFrame(peak, index=cells, columns=cells)
+    lags = pd.DataFrame(lag, index=cells, columns=cells)
+    return topology, corr, lags
+
+
+def write_outputs(topology: dict, corr: pd.DataFrame, lags: pd.DataFrame, out_dir: Path) -> None:
+    """
+    Atomically write topology.json, correlation_matrix.csv and lag_matrix.csv.
+    Drops correlation_state.npz, which described the previous matrix.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    def replace(name, write):
+        tmp = out_dir / f"{name}.tmp"
+        write(tmp)
+        os.replace(tmp, out_dir / name)
+
+    replace("correlation_matrix.csv", corr.to_csv)
+    replace("lag_matrix.csv", lags.to_csv)
+
+    def dump(path):
+        with open(path, "w") as f:
+            json.dump(topology, f, indent=2)
+    replace("topology.json", dump)
+    (out_dir / "correlation_state.npz").unlink(missing_ok=True)
+
+
+def load_signals(csv_path: Path, time_col: str = "slot_id", cell_col: str = "cell_id",
+                 value_col: str = "loss_binary") -> pd.DataFrame:
+    """(time x cell) signal matrix from a long-format CSV; missing samples are 0."""
+    df = pd.read_csv(csv_path, usecols=[time_col, cell_col, value_col])
+    return df.pivot_table(index=time_col, columns=cell_col, values=value_col, fill_value=0)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from config import OUT_DIR
+
+    parser = argparse.ArgumentParser(description="Infer link topology from per-cell signals.")
+    parser.add_argument("csv", help="long-format CSV (auto/knn: or columnar store) with time, cell and value columns")
+    parser.add_argument("--time-col", default="slot_id")
+    parser.add_argument("--cell-col", default="cell_id")
+    parser.add_argument("--value-col", default="loss_binary")
+    parser.add_argument("--links", type=int, default=N_EXPECTED_LINKS)
+    parser.add_argument("--max-lag", type=int, default=MAX_ALIGNMENT_LAG)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all CPUs)")
+    parser.add_argument("--method", choices=("auto", "dense", "knn"), default="auto",
+                        help=f"knn: sparse neighbour graph (auto: from {KNN_MIN_CELLS} cells)")
+    parser.add_argument("--out", default=OUT_DIR)
+    args = parser.parse_args()
+
+    table = None
+    if args.method != "dense":
+        from src.topology_knn import LongSignals, infer_topology_knn, write_knn_outputs
+
+        # auto: the axes scan that counts the cells is reused by either method
+        table = LongSignals(args.csv, args.time_col, args.cell_col, args.value_col)
+    if args.method == "knn" or (args.method == "auto" and len(table.cells) >= KNN_MIN_CELLS):
+        topology, graph = infer_topology_knn(table, args.links, args.max_lag, workers=args.workers)
+        write_knn_outputs(topology, graph, Path(args.out))
+    else:
+        if table is not None:
+            signals = table.frame()
+        else:
+            signals = load_signals(args.csv, args.time_col, args.cell_col, args.value_col)
+        topology, corr, lags = infer_topology(signals, args.links, args.max_lag, args.workers)
+        write_outputs(topology, corr, lags, Path(args.out))
+    for name, link in topology["links"].items():
+        print(f"{name}: {link['cells']}")
@@ -0,0 +1,425 @@
+"""
+Topology inference for thousands of cells, on a sparse k-nearest-neighbour
+correlation graph instead of the dense N x N matrix.
+
+1. Signals are summed into bins of 2 * max_lag + 1 samples and
+   standardized to unit-norm columns. A dot product is then a Pearson
+   correlation, and cells a few samples apart still share most of their
+   bins, which stands in for the per-pair lag search.
+2. Candidate neighbours come from a Gaussian random projection of the
+   binned signals down to SKETCH_DIM rows, which preserves dot products
+   approximately. Traces already shorter than that are searched exactly.
+   The search runs over row blocks, keeping only each cell's best
+   candidates.
+3. Candidates are re-scored exactly on the binned signals, and the best
+   k per cell form the graph.
+4. Average linkage runs on the graph: the similarity of two clusters
+   is the sum of their edge weights over |A| * |B|. Missing edges count
+   as zero correlation.
+5. Only the lags of each cell to its link's first cell are computed
+   exactly. Quality metrics come from the exact lagged correlation of a
+   stratified sample of cells.
+
+Memory is O(N * (k + SKETCH_DIM)) besides the binned signals. Given a
+LongSignals table (a long-format CSV or columnar store) instead of a
+frame, the full-resolution (time x cell) matrix is never built: the bins
+are summed a chunk of rows at a time, the same pass spills the raw
+samples cell-major to a temporary file, and step 5 reads the columns it
+needs from there, at most RAW_BYTES of them at once. topology.json keeps
+the schema infer_topology writes. Instead of the dense correlation and
+lag matrices, the graph is written as knn_graph.csv.
+"""
+import heapq
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import MAX_ALIGNMENT_LAG, N_EXPECTED_LINKS
+from src.artifact_store import open_frame
+from src.topology_inference import (_link_name, _overlap_sums, _plain, _standardize,
+                                    cluster_quality, lagged_correlation)
+
+KNN_K = 16                  # neighbours kept per cell
+CANDIDATES = 4              # approximate candidates per kept neighbour
+SKETCH_DIM = 256            # random-projection rows; exact search below this many bins
+QUALITY_SAMPLE = 256        # cells the quality metrics are computed on
+ROW_BLOCK = 512             # cells per block of the neighbour search
+RAW_BYTES = 256 * 2 ** 20   # raw (time x cell) samples held at once for the lags
+CHUNK_ROWS = 1_000_000      # long-format rows read at a time
+_REFINE_BLOCK = 16
+_T_CHUNK = 4096
+
+
+def _binned(signals: np.ndarray, width: int) -> np.ndarray:
+    """
+    Column sums (NaN as 0) over consecutive bins of `width` samples,
+    zero-mean and unit-norm. Binned a chunk at a time, so no full-size
+    temporary is made.
+    """
+    X = np.asarray(signals, dtype=np.float64)
+    step = width * max(_T_CHUNK // width, 1)
+    parts = []
+    for t0 in range(0, len(X), step):
+        chunk = np.nan_to_num(X[t0:t0 + step])
+        full = len(chunk) - len(chunk) % width
+        parts.append(chunk[:full].reshape(-1, width, X.shape[1]).sum(axis=1))
+        if full < len(chunk):
+            parts.append(chunk[full:].sum(axis=0, keepdims=True))
+    return _unit(np.vstack(parts) if parts else np.zeros((0, X.shape[1])))
+
+
+def _unit(sums: np.ndarray) -> np.ndarray:
+    """Bin sums made zero-mean and unit-norm per column."""
+    Z, _ = _standardize(sums)
+    return Z / np.sqrt(max(len(Z), 1))
+
+
+class _FrameSignals:
+    """A (time x cell) frame already in memory."""
+
+    def __init__(self, frame: pd.DataFrame):
+        self.cells = list(frame.columns)
+        self._X = np.asarray(frame.to_numpy(), dtype=np.float64)     # a view when already float
+        self.n_samples = len(self._X)
+
+    def binned(self, width: int) -> np.ndarray:
+        return _binned(self._X, width)
+
+    def columns(self, idx: np.ndarray) -> np.ndarray:
+        return self._X[:, idx]
+
+
+class LongSignals:
+    """
+    The (time x cell) signals load_signals would pivot out of a long-format
+    table, read a chunk of rows at a time instead. `path` is a CSV file or
+    a columnar store directory (src/artifact_store.py). Samples missing
+    from the table are 0, and each (time, cell) pair is expected once.
+
+    Opening it reads the time and cell columns for the axes. binned()
+    reads the table once more and spills the samples to a temporary
+    cell-major file as it goes; columns() reads from that file (making
+    it in one pass of its own if binned() has not run).
+    """
+
+    def __init__(self, path: Path, time_col: str = "slot_id", cell_col: str = "cell_id",
+                 value_col: str = "loss_binary", chunk_rows: int = CHUNK_ROWS):
+        self.path = Path(path)
+        self.time_col, self.cell_col, self.value_col = time_col, cell_col, value_col
+        self.chunk_rows = chunk_rows
+        times, cells = [], []
+        for chunk in self._read([time_col, cell_col]):
+            times.append(np.asarray(pd.unique(chunk[time_col])))
+            cells.append(np.asarray(pd.unique(chunk[cell_col])))
+        self._times = np.unique(np.concatenate(times)) if times else np.zeros(0)
+        self._cells = pd.Index(np.unique(np.concatenate(cells)) if cells else [])
+        self.cells = list(self._cells)
+        self.n_samples = len(self._times)
+        self._raw = None                # (time x cell) spill, column-major
+
+    def _read(self, columns: list):
+        if not self.path.is_dir():
+            yield from pd.read_csv(self.path, usecols=columns, chunksize=self.chunk_rows)
+            return
+        df = open_frame(self.path)
+        if df is None:
+            raise FileNotFoundError(f"No columnar store at {self.path}")
+        for t0 in range(0, len(df), self.chunk_rows):
+            yield df.iloc[t0:t0 + self.chunk_rows][columns]
+
+    def _samples(self):
+        """(time row, cell column, value) arrays, one triple per chunk"""
+        for chunk in self._read([self.time_col, self.cell_col, self.value_col]):
+            rows = np.searchsorted(self._times, chunk[self.time_col].to_numpy())
+            cols = self._cells.get_indexer(chunk[self.cell_col])
+            yield rows, cols, np.nan_to_num(chunk[self.value_col].to_numpy(dtype=np.float64))
+
+    def _spill_file(self) -> np.ndarray:
+        shape = (self.n_samples, len(self.cells))
+        if not shape[0] * shape[1]:
+            return np.zeros(shape)
+        # unlinked temp file: its space is freed once the map is dropped
+        return np.memmap(tempfile.TemporaryFile(prefix="knn_"), dtype=np.float64, mode="w+",
+                         shape=shape, order="F")
+
+    def binned(self, width: int) -> np.ndarray:
+        sums = np.zeros((-(-self.n_samples // width), len(self.cells)))
+        raw = self._spill_file() if self._raw is None else None
+        for rows, cols, values in self._samples():
+            np.add.at(sums, (rows // width, cols), values)
+            if raw is not None:
+                raw[rows, cols] = values
+        if raw is not None:
+            self._raw = raw
+        return _unit(sums)
+
+    def columns(self, idx: np.ndarray) -> np.ndarray:
+        """Full-resolution columns `idx`, as a (time x len(idx)) array."""
+        if self._raw is None:
+            raw = self._spill_file()
+            for rows, cols, values in self._samples():
+                raw[rows, cols] = values
+            self._raw = raw
+        return np.array(self._raw[:, np.asarray(idx, dtype=np.int64)])
+
+    def frame(self) -> pd.DataFrame:
+        """The whole table pivoted in memory, as load_signals returns it (for the dense method)."""
+        if self._raw is not None:
+            X = np.array(self._raw)
+        else:
+            X = np.zeros((self.n_samples, len(self.cells)))
+            for rows, cols, values in self._samples():
+                X[rows, cols] = values
+        return pd.DataFrame(X, index=pd.Index(self._times, name=self.time_col),
+                            columns=pd.Index(self._cells, name=self.cell_col))
+
+
+def _sketch(Z: np.ndarray, dim: int, seed: int) -> np.ndarray:
+    """Gaussian random projection of Z's rows to `dim`, generated chunk by chunk."""
+    rng = np.random.default_rng(seed)
+    S = np.zeros((dim, Z.shape[1]))
+    for t0 in range(0, len(Z), _T_CHUNK):
+        chunk = Z[t0:t0 + _T_CHUNK]
+        S += rng.standard_normal((dim, len(chunk))) @ chunk / np.sqrt(dim)
+    return S
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest scores per row (unordered)."""
+    k = min(k, scores.shape[1])
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def knn_graph(Z: np.ndarray, k: int = KNN_K, sketch_dim: int = SKETCH_DIM,
+              candidates: int = CANDIDATES, seed: int = 0):
+    """
+    k most correlated other columns of unit-norm Z for every column.
+    Returns (neighbours, correlations), both N x k, best first.
+    """
+    N = Z.shape[1]
+    k = max(0, min(k, N - 1))
+    if k == 0:
+        return np.zeros((N, 0), dtype=np.int64), np.zeros((N, 0))
+
+    approximate = len(Z) > sketch_dim
+    S = _sketch(Z, sketch_dim, seed) if approximate else Z
+    n_cand = min(k * candidates, N - 1) if approximate else k
+    cand = np.zeros((N, n_cand), dtype=np.int64)
+    for lo in range(0, N, ROW_BLOCK):
+        hi = min(lo + ROW_BLOCK, N)
+        scores = S[:, lo:hi].T @ S
+        scores[np.arange(hi - lo), np.arange(lo, hi)] = -np.inf       # not its own neighbour
+        cand[lo:hi] = _top(scores, n_cand)
+
+    exact = np.zeros(cand.shape)
+    for lo in range(0, N, _REFINE_BLOCK):
+        hi = min(lo + _REFINE_BLOCK, N)
+        exact[lo:hi] = np.einsum("tb,tbc->bc", Z[:, lo:hi], Z[:, cand[lo:hi]])
+
+    keep = np.argsort(-exact, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(cand, keep, axis=1), np.take_along_axis(exact, keep, axis=1)
+
+
+def sparse_average_linkage(n: int, neighbours: np.ndarray, weights: np.ndarray,
+                           n_clusters: int) -> np.ndarray:
+    """
+    Flat labels (0..n_clusters-1, by first member) from average linkage
+    on a similarity graph given as per-node neighbour lists. Pairs without
+    an edge have similarity 0. Non-positive edges are ignored.
+
+    Nodes without a positive edge (cells that never saw an event) say
+    nothing about the grouping. They do not count towards n_clusters and
+    are attached afterwards to their first listed neighbour's cluster.
+    If the rest of the graph still has more components than n_clusters,
+    the smallest are merged together.
+    """
+    n_clusters = max(1, min(n_clusters, n))
+    adj = [dict() for _ in range(n)]                    # cluster -> {cluster: weight sum}
+    rows = np.repeat(np.arange(n), neighbours.shape[1])
+    for i, j, w in zip(rows.tolist(), neighbours.ravel().tolist(), weights.ravel().tolist()):
+        if w > 0 and i != j and j not in adj[i]:
+            adj[i][j] = adj[j][i] = w
+
+    size = [1] * n
+    version = [0] * n
+    parent = list(range(n))
+    heap = [(-w, i, j, 0, 0) for i in range(n) for j, w in adj[i].items() if i < j]
+    heapq.heapify(heap)
+    isolated = [i for i in range(n) if not adj[i]]
+    if len(isolated) == n:
+        isolated = []
+    clusters = n - len(isolated)
+
+    def merge(a, b):
+        keep, drop = (a, b) if len(adj[a]) >= len(adj[b]) else (b, a)
+        for c, w in adj[drop].items():
+            del adj[c][drop]
+            if c != keep:
+                adj[keep][c] = adj[c][keep] = adj[keep].get(c, 0.0) + w
+        adj[drop] = {}
+        parent[drop] = keep
+        size[keep] += size[drop]
+        version[keep] += 1
+        for c, w in adj[keep].items():
+            heapq.heappush(heap, (-w / (size[keep] * size[c]), keep, c, version[keep], version[c]))
+
+    while clusters > n_clusters and heap:
+        _, a, b, va, vb = heapq.heappop(heap)
+        if parent[a] != a or parent[b] != b or version[a] != va or version[b] != vb:
+            continue                                    # stale entry
+        merge(a, b)
+        clusters -= 1
+
+    lone = set(isolated)
+    roots = [i for i in range(n) if parent[i] == i and i not in lone]
+    while len(roots) > n_clusters:                      # disconnected: smallest go together
+        roots.sort(key=lambda r: (size[r], r))
+        a, b = roots[0], roots[1]
+        merge(a, b)
+        roots.remove(a if parent[a] != a else b)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    largest = max(roots, key=lambda r: size[r]) if roots else None
+    for i in isolated:
+        near = [j for j in neighbours[i].tolist() if j not in lone]
+        parent[i] = find(near[0]) if near else largest
+    found = np.array([find(i) for i in range(n)])
+    _, first = np.unique(found, return_index=True)
+    order = {root: label for label, root in enumerate(found[np.sort(first)])}
+    return np.array([order[r] for r in found], dtype=np.int64)
+
+
+def lags_to(signals: np.ndarray, members: np.ndarray, ref: int, max_lag: int) -> np.ndarray:
+    """
+    Best lag of each member column of a (time x cell) array against column
+    `ref`, as lagged_correlation would report in lag[member, ref], without
+    the rest of the matrix.
+    """
+    X, valid = _standardize(signals[:, np.append(members, ref)])
+    T = len(X)
+    max_lag = int(max(0, min(max_lag, T - 2)))
+    if T < 2 or not valid[-1]:
+        return np.zeros(len(members), dtype=np.int64)
+    n, sa, saa, sb, sbb = _overlap_sums(X, max_lag)
+    sa, saa = sa[:, :-1], saa[:, :-1]
+    sb, sbb = sb[:, -1:], sbb[:, -1:]
+    n = n[:, None]
+
+    sab = np.empty((2 * max_lag + 1, len(members)))
+    A, b = X[:, :-1], X[:, -1]
+    for d, lag in enumerate(range(-max_lag, max_lag + 1)):
+        if lag >= 0:
+            sab[d] = b[:T - lag] @ A[lag:]
+        else:
+            sab[d] = b[-lag:] @ A[:T + lag]
+    cov = sab - sa * sb / n
+    var = (saa - sa * sa / n) * (sbb - sb * sb / n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var)
+    corr[~np.isfinite(corr) | (var <= 1e-12 * n * n)] = 0.0
+    lag = np.argmax(corr, axis=0) - max_lag
+    lag[~valid[:-1]] = 0
+    lag[members == ref] = 0
+    return lag
+
+
+def _link_lags(source, members: np.ndarray, ref: int, max_lag: int) -> np.ndarray:
+    """lags_to for one link, on at most RAW_BYTES of raw columns at a time."""
+    group = max(1, RAW_BYTES // (8 * max(source.n_samples, 1)) - 1)
+    lags = []
+    for g0 in range(0, len(members), group):
+        part = members[g0:g0 + group]
+        X = source.columns(np.append(part, ref))
+        lags.append(np.where(part == ref, 0, lags_to(X, np.arange(len(part)), len(part), max_lag)))
+    return np.concatenate(lags) if lags else np.zeros(0, dtype=np.int64)
+
+
+def _quality_sample(labels: np.ndarray, size: int, seed: int) -> np.ndarray:
+    """Up to `size` cells, every cluster in proportion and with at least 2 (or all) of its cells."""
+    if len(labels) <= size:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    counts = np.bincount(labels)
+    quota = np.maximum(np.minimum(counts, 2), np.floor(counts * size / len(labels)).astype(np.int64))
+    picked = [rng.choice(np.flatnonzero(labels == c), q, replace=False) for c, q in enumerate(quota)]
+    return np.sort(np.concatenate(picked))
+
+
+def infer_topology_knn(signals, n_links: int = N_EXPECTED_LINKS,
+                       max_lag: int = MAX_ALIGNMENT_LAG, k: int = KNN_K,
+                       sketch_dim: int = SKETCH_DIM, sample: int = QUALITY_SAMPLE,
+                       seed: int = 0, workers: int = 1):
+    """
+    Group cells into links from a (time x cell) frame or a LongSignals
+    table, like infer_topology but in memory linear in the number of cells.
+    `workers` processes score the quality sample (None: one per CPU).
+
+    Returns (topology, graph): the topology.json document and the kNN
+    graph as a (cell, neighbor, correlation) edge list.
+    """
+    source = signals if isinstance(signals, LongSignals) else _FrameSignals(signals)
+    cells = [_plain(c) for c in source.cells]
+    N = len(cells)
+    Z = source.binned(2 * max(int(max_lag), 0) + 1)
+    neighbours, weights = knn_graph(Z, k, sketch_dim, seed=seed)
+    labels = sparse_average_linkage(N, neighbours, weights, n_links)
+    del Z
+
+    links = {}
+    for c in range(labels.max() + 1 if N else 0):
+        members = np.flatnonzero(labels == c)
+        lags = _link_lags(source, members, int(members[0]), max_lag)
+        links[_link_name(c)] = {
+            "cells": [cells[i] for i in members],
+            "cell_count": int(len(members)),
+            "cell_lags": {str(cells[i]): int(d) for i, d in zip(members, lags)},
+        }
+
+    picked = _quality_sample(labels, sample, seed) if N else np.zeros(0, dtype=np.int64)
+    quality = {}
+    if len(picked):
+        peak, _ = lagged_correlation(source.columns(picked), max_lag=max_lag, workers=workers)
+        _, sample_labels = np.unique(labels[picked], return_inverse=True)
+        quality = cluster_quality(peak, sample_labels)
+
+    topology = {
+        "topology_version": "1.0",
+        "inference_method": "lagged_xcorr_knn_average_linkage",
+        "inference_timestamp": datetime.now().isoformat(),
+        "n_cells": N,
+        "n_links": len(links),
+        "max_lag": int(max_lag),
+        "knn_k": int(neighbours.shape[1]),
+        "quality_sample_cells": int(len(picked)),
+        "quality_metrics": quality,
+        "links": links,
+    }
+    graph = pd.DataFrame({
+        "cell": np.repeat(np.array(cells, dtype=object), neighbours.shape[1]),
+        "neighbor": np.array(cells, dtype=object)[neighbours.ravel()] if N else [],
+        "correlation": weights.ravel(),
+    })
+    return topology, graph
+
+
+def write_knn_outputs(topology: dict, graph: pd.DataFrame, out_dir: Path) -> None:
+    """Atomically write topology.json and knn_graph.csv."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / "knn_graph.csv.tmp"
+    graph.to_csv(tmp, index=False)
+    os.replace(tmp, out_dir / "knn_graph.csv")
+    tmp = out_dir / "topology.json.tmp"
+    with open(tmp, "w") as f:
+        json.dump(topology, f, indent=2)
+    os.replace(tmp, out_dir / "topology.json")
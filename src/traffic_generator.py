@@ -0,0 +1,260 @@
+"""
+Synthetic fronthaul traffic with a known topology, for load-testing the
+pipeline at production scale.
+
+Cells are assigned to links at random. Each cell carries a gamma
+background load, its own bursts and, scaled per cell, the bursts of
+its link, seen up to `max_lag` slots late. A link's traffic is the sum of
+its cells. When that sum exceeds the link capacity, the cells that are
+bursting at that slot lose packets. Cells on one link therefore share
+loss events, offset by their lags, which is the signal that topology
+inference looks for. The assignment and lags are returned as the ground
+truth.
+
+Rows are produced in chunks of whole slots with numpy only. Burst state
+and the lag history carry over from one chunk to the next, so memory
+depends on the chunk size and not on the duration. Chunk k draws from
+its own seeded stream, so the output is reproducible for a given seed
+and chunk size.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import MAX_ALIGNMENT_LAG, SLOT_DURATION_S
+from src.artifact_store import ColumnarWriter
+from src.topology_inference import _link_name
+
+BURST_MODELS = ("onoff", "spikes")
+# default capacity margin per model (fraction of a full shared burst above
+# the expected load); lagged single-slot spikes rarely line up, so less
+_CAPACITY_MARGIN = {"onoff": 1.0, "spikes": 0.3}
+CHUNK_CELL_SLOTS = 1_000_000        # cell rows per chunk when chunk_slots is not given
+
+
+def _bursts(rng, n_slots: int, n_units: int, rate: float, mean_slots: float, carry: np.ndarray):
+    """
+    ON/OFF bursts: a burst starts with probability `rate` per slot and lasts
+    a geometric number of slots (mean `mean_slots`). `carry` holds the ON
+    slots left over from the previous chunk. Returns (on, carry for the next chunk).
+    """
+    starts = np.nonzero(rng.random((n_slots, n_units)) < rate)
+    ends = np.zeros((n_slots, n_units), dtype=np.int64)
+    ends[starts] = starts[0] + rng.geometric(1.0 / mean_slots, len(starts[0]))
+    running = np.maximum(np.maximum.accumulate(ends, axis=0), carry[None, :])
+    on = np.arange(n_slots)[:, None] < running
+    return on, np.maximum(running[-1] - n_slots, 0)
+
+
+def _duty(rate: float, mean_slots: float, model: str) -> float:
+    """Expected fraction of slots a unit is bursting."""
+    if model == "spikes":
+        return rate
+    return rate * mean_slots / (1.0 + rate * mean_slots)
+
+
+class TrafficGenerator:
+    """
+    Parameterised traffic model; iterate chunks() or use generate().
+
+    Loads are in Gbps per cell. burst_model is "onoff" (Markov bursts of
+    mean length burst_slots) or "spikes" (independent single-slot spikes).
+    """
+
+    def __init__(self, n_links: int = 3, cells_per_link=8, slot_s: float = SLOT_DURATION_S,
+                 burst_model: str = "onoff", cell_mean_gbps: float = 0.5,
+                 burst_gbps: float = 1.0, burst_rate: float = 0.002, burst_slots: float = 40.0,
+                 shared_burst_gbps: float = 2.0, shared_burst_rate: float = 0.002,
+                 max_lag: int = MAX_ALIGNMENT_LAG, capacity_margin: float = None,
+                 loss_noise: float = 1e-4, seed: int = 0, chunk_slots: int = None):
+        if burst_model not in BURST_MODELS:
+            raise ValueError(f"burst_model must be one of {BURST_MODELS}")
+        self.params = {k: v for k, v in locals().items() if k not in ("self", "__class__")}
+        self.slot_s = slot_s
+        self.burst_model = burst_model
+        self.burst_gbps, self.burst_rate, self.burst_slots = burst_gbps, burst_rate, burst_slots
+        self.shared_burst_gbps, self.shared_burst_rate = shared_burst_gbps, shared_burst_rate
+        self.cell_mean_gbps = cell_mean_gbps
+        self.max_lag = max_lag
+        self.loss_noise = loss_noise
+        self.seed = seed
+
+        rng = np.random.default_rng((seed, 0))
+        if isinstance(cells_per_link, int):
+            sizes = np.full(n_links, cells_per_link)
+        else:
+            sizes = rng.integers(cells_per_link[0], cells_per_link[1] + 1, n_links)
+        self.link_ids = [_link_name(i) for i in range(n_links)]
+        self.n_links = n_links
+        self.n_cells = int(sizes.sum())
+        self.cell_ids = np.arange(1, self.n_cells + 1)
+        self.cell_link = rng.permutation(np.repeat(np.arange(n_links), sizes))
+        self.cell_lag = rng.integers(0, max_lag + 1, self.n_cells)
+        self.cell_scale = rng.uniform(0.5, 1.5, self.n_cells)
+        self._assign = np.zeros((self.n_cells, n_links))
+        self._assign[np.arange(self.n_cells), self.cell_link] = 1.0
+
+        # capacity: expected load plus `capacity_margin` of a full shared burst
+        if capacity_margin is None:
+            capacity_margin = _CAPACITY_MARGIN[burst_model]
+        expected = cell_mean_gbps + self.cell_scale * (
+            burst_gbps * _duty(burst_rate, burst_slots, burst_model)
+            + shared_burst_gbps * _duty(shared_burst_rate, burst_slots, burst_model))
+        self.capacity_gbps = (expected + capacity_margin * shared_burst_gbps * self.cell_scale) @ self._assign
+
+        self.chunk_slots = chunk_slots or max(64, CHUNK_CELL_SLOTS // self.n_cells)
+
+    def ground_truth(self) -> dict:
+        """topology.json-shaped description of the generated network."""
+        links = {}
+        for l, name in enumerate(self.link_ids):
+            cells = self.cell_ids[self.cell_link == l]
+            links[name] = {
+                "cells": cells.tolist(),
+                "cell_count": len(cells),
+                "cell_lags": {str(c): int(self.cell_lag[c - 1]) for c in cells},
+                "capacity_gbps": round(float(self.capacity_gbps[l]), 4),
+            }
+        return {
+            "topology_version": "1.0",
+            "inference_method": "ground_truth",
+            "n_cells": self.n_cells,
+            "n_links": self.n_links,
+            "generator": self.params,
+            "links": links,
+        }
+
+    def _on(self, rng, n_slots, n_units, rate, carry):
+        if self.burst_model == "spikes":
+            return rng.random((n_slots, n_units)) < rate, carry
+        return _bursts(rng, n_slots, n_units, rate, self.burst_slots, carry)
+
+    def chunks(self, duration_s: float, cells: bool = True):
+        """
+        Yield (link rows, cell rows or None) per chunk of whole slots.
+        Link rows: time_seconds, link_id, aggregated_gbps (the upload schema).
+        Cell rows: slot_id, time_seconds, cell_id, throughput_gbps, loss_binary.
+        """
+        n_slots = int(round(duration_s / self.slot_s))
+        N, L, lag = self.n_cells, self.n_links, self.max_lag
+        own_carry = np.zeros(N, dtype=np.int64)
+        link_carry = np.zeros(L, dtype=np.int64)
+        history = np.zeros((lag, L), dtype=bool)            # last `lag` rows of link bursts
+        link_codes = None
+
+        for k, s0 in enumerate(range(0, n_slots, self.chunk_slots)):
+            S = min(self.chunk_slots, n_slots - s0)
+            rng = np.random.default_rng((self.seed, 1, k))
+            own, own_carry = self._on(rng, S, N, self.burst_rate, own_carry)
+            link_on, link_carry = self._on(rng, S, L, self.shared_burst_rate, link_carry)
+            full = np.vstack((history, link_on))
+            history = full[len(full) - lag:]
+            shared = full[lag + np.arange(S)[:, None] - self.cell_lag[None, :], self.cell_link[None, :]]
+
+            gbps = rng.gamma(4.0, self.cell_mean_gbps / 4.0, (S, N))
+            gbps += self.cell_scale * (own * self.burst_gbps + shared * self.shared_burst_gbps)
+            gbps = np.round(gbps, 4)
+            link_gbps = gbps @ self._assign
+
+            slots = np.arange(s0, s0 + S)
+            times = np.round(slots * self.slot_s, 6)
+            if link_codes is None or len(link_codes) != S * L:
+                link_codes = np.tile(np.arange(L), S)
+            links_df = pd.DataFrame({
+                "time_seconds": np.repeat(times, L),
+                "link_id": pd.Categorical.from_codes(link_codes, categories=self.link_ids),
+                "aggregated_gbps": np.round(link_gbps, 4).ravel(),
+            })
+            if not cells:
+                yield links_df, None
+                continue
+
+            overload = (link_gbps > self.capacity_gbps)[:, self.cell_link]
+            loss = (overload & (own | shared)) | (rng.random((S, N)) < self.loss_noise)
+            cells_df = pd.DataFrame({
+                "slot_id": np.repeat(slots, N),
+                "time_seconds": np.repeat(times, N),
+                "cell_id": np.tile(self.cell_ids, S),
+                "throughput_gbps": gbps.ravel(),
+                "loss_binary": loss.ravel().astype(np.int8),
+            })
+            yield links_df, cells_df
+
+
+class _CsvSink:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._f = open(self._tmp, "w", newline="")
+        self._header = True
+
+    def append(self, df: pd.DataFrame) -> None:
+        df.to_csv(self._f, index=False, header=self._header)
+        self._header = False
+
+    def close(self) -> None:
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+def _sink(path: Path, fmt: str):
+    if fmt == "csv":
+        return _CsvSink(path.with_suffix(".csv"))
+    if fmt == "columnar":
+        return ColumnarWriter(path.with_suffix(".cols"))
+    raise ValueError("fmt must be 'csv' or 'columnar'")
+
+
+def generate(out_dir: Path, duration_s: float, fmt: str = "csv", level: str = "both",
+             progress=None, **model) -> dict:
+    """
+    Stream a dataset into `out_dir`: link_traffic (upload schema),
+    cell_traffic (slot_id/cell_id/loss_binary, the topology inference input)
+    and ground_truth_topology.json. level is "links", "cells" or "both".
+    Returns row counts and paths.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    gen = TrafficGenerator(**model)
+    sinks = {}
+    if level in ("links", "both"):
+        sinks["links"] = _sink(out_dir / "link_traffic", fmt)
+    if level in ("cells", "both"):
+        sinks["cells"] = _sink(out_dir / "cell_traffic", fmt)
+    if not sinks:
+        raise ValueError("level must be 'links', 'cells' or 'both'")
+
+    rows = dict.fromkeys(sinks, 0)
+    n_slots = int(round(duration_s / gen.slot_s))
+    done = 0
+    try:
+        for links_df, cells_df in gen.chunks(duration_s, cells="cells" in sinks):
+            for name, df in (("links", links_df), ("cells", cells_df)):
+                if name in sinks:
+                    sinks[name].append(df)
+                    rows[name] += len(df)
+            done += len(links_df) // gen.n_links
+            if progress is not None:
+                progress(done / max(n_slots, 1))
+    except BaseException:
+        for sink in sinks.values():
+            sink.abort()
+        raise
+    for sink in sinks.values():
+        sink.close()
+
+    truth_file = out_dir / "ground_truth_topology.json"
+    with open(truth_file, "w") as f:
+        json.dump(gen.ground_truth(), f, indent=2)
+    return {
+        "rows": rows,
+        "paths": {name: str(getattr(sink, "path", getattr(sink, "directory", None))) for name, sink in sinks.items()},
+        "ground_truth": str(truth_file),
+    }